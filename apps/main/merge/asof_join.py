@@ -0,0 +1,91 @@
+"""
+As-of joins: each left row is matched with the last right row at or before its time
+(or the next one, or the nearest), e.g. the price or slot assignment of a SKU when the order was placed.
+
+pd.merge_asof walks both sorted tables at once instead of joining every pair of rows and filtering them.
+Tables already sorted on their time key (see the index metadata of the stored dataframes) are not sorted again.
+"""
+
+import pandas as pd
+
+INDEX = '(Index)'  # Time key option: the dataframe index
+DIRECTIONS = ['backward', 'forward', 'nearest']
+
+
+def _time_values(dataframe: pd.DataFrame, time_key: str):
+    return dataframe.index if time_key == INDEX else dataframe[time_key]
+
+def _sort_on(dataframe: pd.DataFrame, time_key: str, is_sorted: bool = None):
+    """Sorts the dataframe on its time key, unless it is already sorted. Returns (dataframe, sorted again)."""
+    if is_sorted is None:
+        is_sorted = _time_values(dataframe, time_key).is_monotonic_increasing
+    if is_sorted:
+        return dataframe, False
+    if time_key == INDEX:
+        return dataframe.sort_index(kind='stable'), True
+    return dataframe.sort_values(time_key, kind='stable'), True
+
+def _align_categories(left: pd.DataFrame, right: pd.DataFrame, left_by: list, right_by: list) -> tuple:
+    """Categorical key columns get the same categories on both sides, or their values if the other side
+    is not categorical: pd.merge_asof only matches categoricals with equal categories, where pd.merge converts them."""
+    for left_key, right_key in zip(left_by or [], right_by or []):
+        left_dtype, right_dtype = left[left_key].dtype, right[right_key].dtype
+        left_categorical = isinstance(left_dtype, pd.CategoricalDtype)
+        right_categorical = isinstance(right_dtype, pd.CategoricalDtype)
+        if left_dtype == right_dtype or not (left_categorical or right_categorical):
+            continue
+        left, right = left.copy(deep=False), right.copy(deep=False)
+        if left_categorical and right_categorical:
+            categories = left_dtype.categories.union(right_dtype.categories, sort=False)
+            left[left_key] = left[left_key].cat.set_categories(categories)
+            right[right_key] = right[right_key].cat.set_categories(categories)
+        elif left_categorical:
+            left[left_key] = left[left_key].astype(left_dtype.categories.dtype)
+        else:
+            right[right_key] = right[right_key].astype(right_dtype.categories.dtype)
+    return left, right
+
+def asof_join(
+        left: pd.DataFrame,
+        right: pd.DataFrame,
+        left_time: str,
+        right_time: str,
+        left_by: list = None,
+        right_by: list = None,
+        direction: str = 'backward',
+        tolerance=None,
+        left_sorted: bool = None,
+        right_sorted: bool = None,
+    ):
+    """As-of join of two dataframes on their time keys, optionally by key columns (e.g. SKU).
+
+    Args:
+        left_time, right_time (str): Time column of each side, or INDEX for the dataframe index.
+        left_by, right_by (list, optional): Key columns matched exactly.
+        direction (str): 'backward' (last right row at or before), 'forward' or 'nearest'.
+        tolerance (str | pd.Timedelta, optional): Largest time distance between matched rows, e.g. '7D'.
+        left_sorted, right_sorted (bool, optional): Whether each side is known to be sorted on its time key,
+            e.g. from the index metadata. Checked if None.
+
+    Returns:
+        tuple: (joined dataframe, list of the sides that had to be sorted).
+    """
+    left, left_resorted = _sort_on(left, left_time, left_sorted)
+    right, right_resorted = _sort_on(right, right_time, right_sorted)
+    left, right = _align_categories(left, right, left_by, right_by)
+    if tolerance is not None and pd.api.types.is_datetime64_any_dtype(_time_values(left, left_time).dtype):
+        tolerance = pd.Timedelta(tolerance)
+    merged = pd.merge_asof(
+                    left,
+                    right,
+                    left_on=None if left_time == INDEX else left_time,
+                    right_on=None if right_time == INDEX else right_time,
+                    left_index=left_time == INDEX,
+                    right_index=right_time == INDEX,
+                    left_by=left_by or None,
+                    right_by=right_by or None,
+                    direction=direction,
+                    tolerance=tolerance,
+                )
+    resorted = [side for side, flag in (('left', left_resorted), ('right', right_resorted)) if flag]
+    return merged, resorted
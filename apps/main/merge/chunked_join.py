@@ -0,0 +1,86 @@
+"""
+Out-of-core left / inner join.
+
+The hash index on the (smaller) right keys is built once, then the left dataframe is streamed
+through it in blocks of rows: each block is joined and appended to a parquet file as a row group.
+Only one block of the merged dataframe is ever in memory, next to the left key codes (8 bytes per left row).
+The result has the rows, columns and data types of left.merge(right, how=how), with rows in the left order;
+categorical keys with other categories on each side keep the left categories.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from apps.main.upload.settings import MERGE_CHUNK_ROWS
+from . import join_index
+
+
+def _field(schema: pa.Schema, column, name: str, nullable_ints: bool) -> pa.Field:
+    field = schema.field(str(column)) if str(column) in schema.names else schema.field(column)
+    field_type = field.type
+    # Unmatched left rows leave missing values in right integer columns: pandas stores them as floats
+    if nullable_ints and pa.types.is_integer(field_type):
+        field_type = pa.float64()
+    return pa.field(name, field_type)
+
+def output_schema(left: pd.DataFrame, right: pd.DataFrame, left_columns: list, right_kept: list,
+                  left_names: list, right_names: list, has_unmatched: bool) -> pa.Schema:
+    """Arrow schema of the merged blocks, derived from the input columns
+    so that every block has the same schema, whatever its values (object columns are typed from all their values)."""
+    left_schema = pa.Schema.from_pandas(left[left_columns], preserve_index=False)
+    right_schema = pa.Schema.from_pandas(right[right_kept], preserve_index=False)
+    fields = [_field(left_schema, col, name, False) for col, name in zip(left_columns, left_names)]
+    fields += [_field(right_schema, col, name, has_unmatched) for col, name in zip(right_kept, right_names)]
+    return pa.schema(fields)
+
+def chunked_join(
+        left: pd.DataFrame,
+        right: pd.DataFrame,
+        left_on: list,
+        right_on: list,
+        left_columns: list,
+        right_columns: list,
+        path: str,
+        how: str = 'left',
+        dedupe_right: bool = False,
+        chunk_rows: int = MERGE_CHUNK_ROWS,
+        progress=None,
+        index: join_index.JoinIndex = None,
+    ) -> int:
+    """Joins the dataframes block by block into a parquet file.
+
+    Args:
+        left_on, right_on (list): Key columns of each side.
+        left_columns, right_columns (list): Columns kept in the merged dataframe.
+        path (str): Parquet file written.
+        how (str): 'left' or 'inner'.
+        dedupe_right (bool): Match each left row with the first right row of its key only.
+        chunk_rows (int): Left rows joined per block.
+        progress (callable, optional): Called after each block as progress(left rows done, left rows, rows written).
+        index (JoinIndex, optional): Index already built on the right keys, e.g. a cached one.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if index is None:
+        index = join_index.build_join_index(right[right_on])
+    left_codes = join_index.encode_left(index.encoder, left[left_on])
+    has_unmatched = how == 'left' and bool((left_codes < 0).any())
+    left_names, right_kept, right_names = join_index.output_columns(left_columns, right_columns, left_on, right_on)
+    schema = output_schema(left, right, left_columns, right_kept, left_names, right_names, has_unmatched)
+    n_left = len(left_codes)
+    n_rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, max(n_left, 1), chunk_rows):
+            block = left.iloc[start:start + chunk_rows]
+            left_positions, right_positions = join_index.join_indexer(
+                                                        index, left_codes[start:start + chunk_rows], how, dedupe_right)
+            columns = join_index.take_rows(block, left_columns, left_names, left_positions)
+            columns.update(join_index.take_rows(right, right_kept, right_names, right_positions, allow_fill=has_unmatched))
+            merged = pd.DataFrame(columns, copy=False)
+            writer.write_table(pa.Table.from_pandas(merged, schema=schema, preserve_index=False))
+            n_rows += len(merged)
+            if progress is not None:
+                progress(min(start + chunk_rows, n_left), n_left, n_rows)
+    return n_rows
@@ -0,0 +1,96 @@
+"""
+Pre-join analysis.
+
+Before merging, the join keys are encoded once as integer codes shared by both sides (see join_index):
+counting the right rows per key then gives, in a single pass over each table and without
+allocating the merged dataframe, the exact number of output rows, the match rate
+and the duplicated right keys that would multiply left rows.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from . import join_index
+
+JoinAnalysis = namedtuple(
+    'JoinAnalysis',
+    [
+        'left_rows', 'right_rows',
+        'right_distinct', 'matched_keys',
+        'right_duplicate_keys', 'right_duplicate_rows',
+        'matched_left_rows', 'match_rate',
+        'estimated_rows', 'expansion', 'estimated_bytes',
+    ],
+)
+
+
+def _row_bytes(dataframe: pd.DataFrame) -> float:
+    if dataframe.shape[0] == 0:
+        return 0.0
+    return dataframe.memory_usage(deep=True, index=False).sum() / dataframe.shape[0]
+
+def analyse_join(
+        left_keys: pd.DataFrame,
+        right_keys: pd.DataFrame,
+        left_columns: pd.DataFrame = None,
+        right_columns: pd.DataFrame = None,
+        dedupe_right: bool = False,
+        how: str = 'left',
+        index: join_index.JoinIndex = None,
+    ) -> JoinAnalysis:
+    """Analyses a join without running it.
+
+    Args:
+        left_keys, right_keys (pd.DataFrame): Key column(s) of each side.
+        left_columns, right_columns (pd.DataFrame, optional): Columns kept in the output,
+            used to estimate its memory usage.
+        dedupe_right (bool): Estimate the join after keeping one right row per key.
+        how (str): 'left', 'inner' or 'outer'.
+        index (JoinIndex, optional): Index already built on the right keys, e.g. a cached one.
+
+    Returns:
+        JoinAnalysis: Exact output row count and match statistics, estimated output memory.
+    """
+    if index is None:
+        encoder, right_codes = join_index.build_encoder(right_keys)
+    else:
+        encoder, right_codes = index.encoder, index.right_codes
+    left_codes = join_index.encode_left(encoder, left_keys)
+    n_keys = encoder.n_keys
+    right_counts = np.bincount(right_codes, minlength=n_keys)
+    duplicated = right_counts > 1
+    right_duplicate_rows = int(right_counts[duplicated].sum() - duplicated.sum())
+    matched = left_codes >= 0
+    matched_left_rows = int(matched.sum())
+    used_keys = np.bincount(left_codes[matched], minlength=n_keys) > 0
+    if dedupe_right:
+        right_counts = np.minimum(right_counts, 1)
+    # Each matched left row is repeated once per right row with its key
+    estimated_rows = int(right_counts[left_codes[matched]].sum())
+    if how in ('left', 'outer'):
+        # Unmatched left rows are kept once
+        estimated_rows += len(left_codes) - matched_left_rows
+    if how == 'outer':
+        # Right rows whose key has no left match are kept too
+        estimated_rows += int(right_counts[~used_keys].sum())
+    left_rows = len(left_codes)
+    row_bytes = 0.0
+    if left_columns is not None:
+        row_bytes += _row_bytes(left_columns)
+    if right_columns is not None:
+        row_bytes += _row_bytes(right_columns)
+    return JoinAnalysis(
+        left_rows=left_rows,
+        right_rows=len(right_codes),
+        right_distinct=n_keys,
+        matched_keys=int(used_keys.sum()),
+        right_duplicate_keys=int(duplicated.sum()),
+        right_duplicate_rows=right_duplicate_rows,
+        matched_left_rows=matched_left_rows,
+        match_rate=matched_left_rows / left_rows if left_rows else 0.0,
+        estimated_rows=estimated_rows,
+        expansion=estimated_rows / left_rows if left_rows else 0.0,
+        estimated_bytes=int(estimated_rows * row_bytes),
+    )
@@ -0,0 +1,92 @@
+"""
+Join indexes and join results kept across reruns of the merge page.
+
+Streamlit reruns the page on every widget change: the hash index on the right keys is cached
+per (dataframe, key columns), with the version of the dataframe it was built on.
+Preprocessing (or a new import under the same name) gives the dataframe a new version, and the index is built again.
+
+Merge results keep the row positions of their join: merging the same dataframes on the same keys,
+with the same join type but other columns, only takes the new columns at these positions.
+"""
+
+from collections import namedtuple
+
+import streamlit as st
+
+from apps.main.upload.settings import JOIN_INDEX_CACHE, JOIN_INDEX_CACHE_SIZE, MERGE_RESULTS, MERGE_POSITIONS_CACHE_SIZE
+from apps.main.upload import file_manager as fm
+from . import join_index
+
+# spec: dataframes, keys and join type (None if the merge cannot be re-projected), versions: {dataframe name: version}
+MergeResult = namedtuple('MergeResult', ['spec', 'versions', 'left_positions', 'step_positions'])
+
+
+def get_join_index(df_name: str, dataframe, keys: list) -> join_index.JoinIndex:
+    """Join index on the key columns of a stored dataframe, built once per version of the dataframe."""
+    cache = st.session_state[JOIN_INDEX_CACHE]
+    key = (df_name, tuple(keys))
+    version = fm.get_dataframe_version(df_name)
+    entry = cache.pop(key, None)
+    if entry is None or entry[0] != version:
+        entry = (version, join_index.build_join_index(dataframe[list(keys)]))
+    # Most recently used last
+    cache[key] = entry
+    while len(cache) > JOIN_INDEX_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    return entry[1]
+
+def merge_spec(left_name: str, steps: list, how: str, dedupe_right: bool) -> tuple:
+    """What the row positions of a merge depend on (join_planner.JoinStep columns aside)."""
+    return (
+        left_name, how, dedupe_right,
+        tuple((step.source, step.name, tuple(step.left_on), tuple(step.right_on)) for step in steps),
+    )
+
+def _versions(left_name: str, steps: list) -> dict:
+    return {df_name: fm.get_dataframe_version(df_name) for df_name in [left_name] + [step.source for step in steps]}
+
+def _is_current(result: MergeResult) -> bool:
+    return all(fm.get_dataframe_version(df_name) == version for df_name, version in result.versions.items())
+
+def find_result(spec: tuple):
+    """A stored merge with the same spec, on the current versions of its dataframes. None if there is none."""
+    for result in st.session_state[MERGE_RESULTS].values():
+        if result.spec == spec and _is_current(result):
+            return result
+    return None
+
+def _without_positions(result: MergeResult) -> MergeResult:
+    return MergeResult(None, result.versions, None, None)
+
+def save_result(result_name: str, left_name: str, steps: list = None, spec: tuple = None,
+                left_positions=None, step_positions: dict = None):
+    """Records a merged dataframe, with the row positions of its join if it can be re-projected.
+    Only the latest MERGE_POSITIONS_CACHE_SIZE results keep their positions (8 bytes per row and joined dataframe)."""
+    results = st.session_state[MERGE_RESULTS]
+    versions = _versions(left_name, steps or [])
+    # Most recent last
+    results.pop(result_name, None)
+    results[result_name] = MergeResult(spec, versions, left_positions, step_positions)
+    with_positions = [name for name, result in results.items() if result.spec is not None]
+    for name in with_positions[:-MERGE_POSITIONS_CACHE_SIZE]:
+        results[name] = _without_positions(results[name])
+
+def forget_result(df_name: str):
+    """To call when another dataframe is stored under the name of a merged dataframe."""
+    st.session_state[MERGE_RESULTS].pop(df_name, None)
+
+def is_merge_result(df_name: str) -> bool:
+    return df_name in st.session_state[MERGE_RESULTS]
+
+def merge_result_names() -> list:
+    return list(st.session_state[MERGE_RESULTS])
+
+def prune_results():
+    """Forgets the merged dataframes no longer stored, and drops the row positions of merges
+    whose dataframes have changed since: they cannot be reused."""
+    results = st.session_state[MERGE_RESULTS]
+    for result_name, result in list(results.items()):
+        if fm.get_dataframe(result_name) is None:
+            del results[result_name]
+        elif result.spec is not None and not _is_current(result):
+            results[result_name] = _without_positions(result)
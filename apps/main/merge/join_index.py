@@ -0,0 +1,137 @@
+"""
+Hash index on the join keys of the right dataframe.
+
+The right keys are encoded once as integer codes: the distinct values of each key column
+are kept in a pd.Index, whose hash table is built on the first lookup and reused afterwards.
+Left keys, whole or block by block, are then looked up in these indexes,
+and the right rows of each code are found through the right row positions sorted by code.
+
+A join then comes down to two arrays of row positions (the join indexer),
+the output columns being taken from the input ones.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+KeyEncoder = namedtuple('KeyEncoder', ['column_uniques', 'combined_uniques', 'n_keys'])
+JoinIndex = namedtuple('JoinIndex', ['encoder', 'right_codes', 'order', 'starts', 'counts'])
+
+
+def _factorize(values) -> tuple:
+    # Missing keys are matched with each other, as pd.merge does
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes.astype(np.int64), pd.Index(uniques)
+
+def build_encoder(right_keys: pd.DataFrame) -> tuple:
+    """Encodes the right key column(s) as integer codes of the distinct keys.
+    Multi-column keys are combined column by column and renumbered, so codes stay below the number of rows.
+
+    Returns:
+        tuple: (KeyEncoder, right codes).
+    """
+    column_uniques = []
+    combined_uniques = []
+    right_codes = None
+    n_keys = 1
+    for i in range(right_keys.shape[1]):
+        codes, uniques = _factorize(right_keys.iloc[:, i])
+        column_uniques.append(uniques)
+        if right_codes is None:
+            right_codes, n_keys = codes, len(uniques)
+            continue
+        right_codes, combined = _factorize(right_codes * len(uniques) + codes)
+        combined_uniques.append(combined)
+        n_keys = len(combined)
+    return KeyEncoder(column_uniques, combined_uniques, n_keys), right_codes
+
+def encode_left(encoder: KeyEncoder, left_keys: pd.DataFrame) -> np.ndarray:
+    """Codes of the left keys, -1 for keys absent from the right side."""
+    if left_keys.shape[1] != len(encoder.column_uniques):
+        raise ValueError('Left and right sides must have the same number of key columns.')
+    left_codes = None
+    for i, uniques in enumerate(encoder.column_uniques):
+        codes = uniques.get_indexer(left_keys.iloc[:, i])
+        if left_codes is None:
+            left_codes = codes
+            continue
+        combined = np.where((left_codes >= 0) & (codes >= 0), left_codes * len(uniques) + codes, -1)
+        left_codes = encoder.combined_uniques[i - 1].get_indexer(combined)
+    return left_codes.astype(np.int64)
+
+def build_join_index(right_keys: pd.DataFrame) -> JoinIndex:
+    """Builds the hash index on the right keys, to be reused by every lookup."""
+    encoder, right_codes = build_encoder(right_keys)
+    counts = np.bincount(right_codes, minlength=encoder.n_keys)
+    # Stable sort: the right rows of a key keep their order, as in pd.merge
+    order = np.argsort(right_codes, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    return JoinIndex(encoder, right_codes, order, starts, counts)
+
+def join_indexer(join_index: JoinIndex, left_codes: np.ndarray, how: str = 'left', dedupe_right: bool = False) -> tuple:
+    """Row positions of a left or inner join, in the left order.
+
+    Args:
+        left_codes (np.ndarray): Codes of the left keys, from encode_left.
+        how (str): 'left' keeps unmatched left rows, 'inner' drops them.
+        dedupe_right (bool): Match each left row with the first right row of its key only.
+
+    Returns:
+        tuple: (left positions, right positions). Right positions are -1 for unmatched left rows.
+    """
+    matched = left_codes >= 0
+    if how == 'inner':
+        left_rows = np.flatnonzero(matched)
+        left_codes = left_codes[left_rows]
+        matched = np.ones(len(left_rows), dtype=bool)
+    else:
+        left_rows = np.arange(len(left_codes))
+    if len(join_index.order) == 0:
+        return left_rows, np.full(len(left_rows), -1, dtype=np.int64)
+    safe_codes = np.where(matched, left_codes, 0)
+    if dedupe_right:
+        right_positions = np.where(matched, join_index.order[join_index.starts[safe_codes]], -1)
+        return left_rows, right_positions
+    # Each matched left row is repeated once per right row with its key
+    repeats = np.where(matched, join_index.counts[safe_codes], 1)
+    left_positions = np.repeat(left_rows, repeats)
+    first_output_row = np.cumsum(repeats) - repeats
+    within_key = np.arange(len(left_positions)) - np.repeat(first_output_row, repeats)
+    output_matched = np.repeat(matched, repeats)
+    output_codes = np.repeat(safe_codes, repeats)
+    right_positions = np.where(
+        output_matched,
+        # Unmatched rows have a count of 1 but no right row: clip their position, it is replaced by -1
+        join_index.order[np.minimum(join_index.starts[output_codes] + within_key, len(join_index.order) - 1)],
+        -1,
+    )
+    return left_positions, right_positions
+
+def output_columns(left_columns: list, right_columns: list, left_on: list, right_on: list, suffixes: tuple = ('_x', '_y')) -> tuple:
+    """Names of the merged columns, following pd.merge: a right key with the same name as its left key is
+    not repeated, other overlapping names get suffixes.
+
+    Returns:
+        tuple: (left column names, right columns kept, their output names).
+    """
+    shared_keys = {r for l, r in zip(left_on, right_on) if l == r}
+    right_kept = [col for col in right_columns if col not in shared_keys or col not in left_columns]
+    overlap = set(left_columns) & set(right_kept)
+    left_names = [f'{col}{suffixes[0]}' if col in overlap else col for col in left_columns]
+    right_names = [f'{col}{suffixes[1]}' if col in overlap else col for col in right_kept]
+    return left_names, right_kept, right_names
+
+def take_column(series: pd.Series, positions: np.ndarray, allow_fill: bool):
+    """Values of a column at the given row positions. Positions -1 are missing values (needs allow_fill)."""
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        return series.array.take(positions, allow_fill=allow_fill)
+    # Numpy columns are upcast when missing values are filled in (e.g. int to float), as in pd.merge
+    return pd.api.extensions.take(series.to_numpy(), positions, allow_fill=allow_fill)
+
+def take_rows(dataframe: pd.DataFrame, columns: list, names: list, positions: np.ndarray, allow_fill: bool = False) -> dict:
+    """Output columns {name: values} taken from the dataframe at the given row positions."""
+    return {
+        name: take_column(dataframe[col], positions, allow_fill)
+        for col, name in zip(columns, names)
+    }
@@ -0,0 +1,112 @@
+"""
+Multi-frame joins.
+
+A left dataframe (e.g. orderlines) is joined with several others (SKU master, customers, ...),
+each on columns of the left dataframe (star schema).
+The planner analyses every join on the left keys and runs the most selective first:
+joins dropping the most rows (inner) or duplicating the fewest (left) come first,
+so the intermediate results stay as small as possible.
+
+Joins are run on row positions only: each join maps the current rows to rows of the left dataframe
+and of every joined dataframe, and the output columns are taken once, at the end.
+The output rows and columns do not depend on the join order: rows are in the order of successive left joins
+with pd.merge (left rows, then the rows of each joined dataframe, in the steps order).
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from . import join_analysis
+from . import join_index
+
+# source: name of the stored dataframe joined, index: JoinIndex on its keys if already built (e.g. cached)
+JoinStep = namedtuple('JoinStep', ['name', 'dataframe', 'left_on', 'right_on', 'columns', 'source', 'index'], defaults=(None, None))
+# position: position of the step in the steps list, i.e. in the output
+PlannedStep = namedtuple('PlannedStep', ['step', 'analysis', 'position'], defaults=(0,))
+
+
+def plan_joins(left: pd.DataFrame, steps: list, how: str = 'left', dedupe_right: bool = False) -> list:
+    """Orders the joins, most selective first.
+
+    Returns:
+        list: PlannedStep tuples, in execution order.
+    """
+    planned = [
+        PlannedStep(step, join_analysis.analyse_join(
+                                left[step.left_on], step.dataframe[step.right_on],
+                                dedupe_right=dedupe_right, how=how, index=step.index), position)
+        for position, step in enumerate(steps)
+    ]
+    # Stable sort: joins as selective as each other keep their order
+    return sorted(planned, key=lambda planned_step: planned_step.analysis.expansion)
+
+def estimated_rows(left_rows: int, planned: list) -> list:
+    """Estimated rows after each planned join, assuming the keys of different joins are independent."""
+    rows = []
+    n_rows = float(left_rows)
+    for planned_step in planned:
+        n_rows *= planned_step.analysis.expansion
+        rows.append(int(round(n_rows)))
+    return rows
+
+def join_positions(left: pd.DataFrame, planned: list, how: str = 'left', dedupe_right: bool = False) -> tuple:
+    """Runs the planned joins on row positions.
+
+    Returns:
+        tuple: (left row positions, {step name: row positions}), one position per output row.
+               Positions -1 are unmatched rows (left joins).
+    """
+    left_positions = np.arange(len(left))
+    step_positions = dict()
+    for planned_step in planned:
+        step = planned_step.step
+        index = step.index if step.index is not None else join_index.build_join_index(step.dataframe[step.right_on])
+        # Star joins: the keys are left columns, encoded once and followed through the previous joins
+        codes = join_index.encode_left(index.encoder, left[step.left_on])[left_positions]
+        current, right_positions = join_index.join_indexer(index, codes, how, dedupe_right)
+        left_positions = left_positions[current]
+        step_positions = {name: positions[current] for name, positions in step_positions.items()}
+        step_positions[step.name] = right_positions
+    execution_order = [planned_step.position for planned_step in planned]
+    if execution_order != sorted(execution_order):
+        # The rows of a left row come out grouped by the first joins run: sort them back in the steps order
+        # (the right rows of a key are in their dataframe order, as in pd.merge)
+        in_steps_order = sorted(planned, key=lambda planned_step: planned_step.position)
+        sort_keys = [step_positions[planned_step.step.name] for planned_step in reversed(in_steps_order)]
+        rows = np.lexsort(sort_keys + [left_positions])
+        left_positions = left_positions[rows]
+        step_positions = {name: positions[rows] for name, positions in step_positions.items()}
+    return left_positions, step_positions
+
+def output_size(left: pd.DataFrame, left_columns: list, steps: list, n_rows: int) -> int:
+    """Estimated memory of the joined dataframe, in bytes."""
+    frames = [left[left_columns]] + [step.dataframe[step.columns] for step in steps]
+    row_bytes = sum(frame.memory_usage(deep=True, index=False).sum() / max(len(frame), 1) for frame in frames)
+    return int(n_rows * row_bytes)
+
+def assemble(left: pd.DataFrame, left_columns: list, steps: list, left_positions: np.ndarray, step_positions: dict) -> pd.DataFrame:
+    """Takes the output columns at the joined row positions.
+    Columns are in the steps order (not the execution one): the left columns, then those of each joined dataframe.
+    A single joined dataframe gives the columns of pd.merge (suffixes _x and _y);
+    with more, a joined column whose name is already taken gets the name of its dataframe as suffix."""
+    names = list(left_columns)
+    joined = []
+    if len(steps) == 1:
+        step = steps[0]
+        names, kept, kept_names = join_index.output_columns(left_columns, step.columns, step.left_on, step.right_on)
+        joined.append((step, kept, kept_names))
+    else:
+        taken = list(names)
+        for step in steps:
+            _, kept, kept_names = join_index.output_columns(
+                                        taken, step.columns, step.left_on, step.right_on, suffixes=('', f'_{step.name}'))
+            joined.append((step, kept, kept_names))
+            taken += kept_names
+    columns = join_index.take_rows(left, left_columns, names, left_positions)
+    for step, kept, kept_names in joined:
+        positions = step_positions[step.name]
+        allow_fill = bool((positions < 0).any())
+        columns.update(join_index.take_rows(step.dataframe, kept, kept_names, positions, allow_fill))
+    return pd.DataFrame(columns, copy=False)
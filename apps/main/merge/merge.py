@@ -1,19 +1,31 @@
+import os
+
 import streamlit as st
 import pandas as pd
 
 from apps.main.upload.settings import *
 from apps.widgets import dataframe as dtframe
+from apps.main.upload import file_manager as fm
+from . import join_analysis
+from . import chunked_join
+from . import join_planner
+from . import asof_join
+from . import join_cache
 
 def page_intro():
     st.markdown('## Merge Dataframes')
     with st.expander('More Info'):
         text = """
-        **Currently, only left joins are supported.**
-
         *A left merge (left join) combines two tables based on a common key, including all rows from the left table and matching rows from the right table. 
         Unmatched rows from the right table have null values. 
         It preserves all rows from the left table while combining information from both tables.*
 
+        Other join types:
+        - **Inner**: only the rows whose key is found in both tables.
+        - **Outer**: all the rows of both tables, matched where possible.
+        - **As-of**: each left row is matched with the last right row at or before its time (or the next / nearest one), 
+          optionally by key, e.g. the price or slot assignment of a SKU when the order was placed.
+
         1. Select the dataframe on the left.
         2. Select the columns you want to keep in the merged dataframe (you can discard irrelevant columns).
         3. Select the column(s) you want to merge on.
@@ -21,6 +33,20 @@ def page_intro():
         5. Click on the merge button.
 
         *Make sure the selected right column(s) to merge on is a primary key, i.e.: it contains unique values, to avoid duplicating recods on the left dataframe.*
+
+        Before merging, the join keys are analysed: match rate, duplicated right keys and the exact number of merged rows.
+        Merges whose result would not fit in memory are blocked. 
+        Tick *Deduplicate right side first* to keep a single right row per key.
+
+        Merges too large for memory can run *Chunked To Disk* (left and inner joins): the left dataframe is joined block by block
+        and the result is written to a parquet file, listed in the *Upload* section to import it (or some of its columns).
+
+        More dataframes can be joined to the left one in the same operation (left and inner joins), each on columns of the left dataframe.
+        The most selective joins run first, to keep intermediate results small.
+
+        Each merged dataframe is saved under its own name, so several merges can be kept. 
+        Merging again the same dataframes on the same keys (left and inner joins), only with other columns to keep, 
+        does not join them again: the new columns are taken at the rows of the previous merge.
         """
         st.markdown(text)
 
@@ -29,6 +55,7 @@ def select_dataframe():
     global left_df, right_df
     global left_col_selection, right_col_selection
     global left_index, right_index
+    global left_name, right_name
     # Select left dataframe
     file_name, left_df = dtframe.select_dataframe('Select Left Dataframe')
     st.markdown('#### Left Columns to Keep:')
@@ -45,6 +72,7 @@ def select_dataframe():
                                     )
     # Preview left dataframe
     dtframe.display_dataframe(left_df, file_name)
+    left_name = file_name
     st.markdown('---')
 
     # Select right dataframe
@@ -63,23 +91,356 @@ def select_dataframe():
                                     )
     # Preview right dataframe
     dtframe.display_dataframe(right_df, file_name)
+    right_name = file_name
+    st.markdown('---')
+
+def select_additional_dataframes():
+    """Dataframes joined to the left one in the same operation. Returns a list of join_planner.JoinStep."""
+    st.markdown('#### Additional Dataframes')
+    _help = """
+    Joins more dataframes to the left one, each on columns of the left dataframe (e.g. SKU master, customers, warehouses).
+    """
+    n_frames = st.number_input('Additional dataframes to join:', min_value=0, max_value=MAX_ADDITIONAL_JOINS, value=0, help=_help)
+    steps = []
+    names = [right_name]
+    for i in range(int(n_frames)):
+        file_name, df = dtframe.select_dataframe(f'Select Dataframe {i + 3}')
+        columns = dtframe.select_dataframe_columns(
+                                        df,
+                                        label='Select columns to keep in the merged dataframe:',
+                                        key=f'join_{i}')
+        left_on = st.multiselect('Select left column(s) to merge on:', list(left_df.columns), key=f'join_{i}_left_on')
+        right_on = dtframe.select_dataframe_columns(
+                                        df,
+                                        label='Select column(s) to merge on:',
+                                        default='first',
+                                        key=f'join_{i}_right_on')
+        # Step names identify the joined dataframes: a dataframe joined twice gets a numbered name
+        name = file_name if file_name not in names else f'{file_name}_{i + 3}'
+        names.append(name)
+        steps.append(join_planner.JoinStep(name, df, left_on, right_on, columns, source=file_name))
     st.markdown('---')
+    return steps
+
+
+def time_key_options(df: pd.DataFrame) -> list:
+    """Time keys of an as-of join: the index, then the datetime columns, then the other ones."""
+    datetime_cols = [col for col, dtype in df.dtypes.items() if pd.api.types.is_datetime64_any_dtype(dtype)]
+    other_cols = [col for col in df.columns if col not in datetime_cols]
+    return [asof_join.INDEX] + datetime_cols + other_cols
+
+def asof_options() -> dict:
+    _help = """
+    Each left row is matched with the right row whose time is the last one at or before the left time (backward), 
+    the first one at or after (forward) or the closest (nearest). 
+    The selected merge on columns (e.g. SKU) must match exactly: leave them empty to match on time only.
+    """
+    col1, col2 = st.columns(2)
+    left_time = col1.selectbox('Left Time Key:', time_key_options(left_df), help=_help)
+    right_time = col2.selectbox('Right Time Key:', time_key_options(right_df), help=_help)
+    direction = col1.selectbox('Direction:', asof_join.DIRECTIONS)
+    tolerance = col2.text_input('Tolerance (optional):', help='Largest time distance between matched rows, e.g. 7D, 12h.')
+    return {
+        'left_time': left_time,
+        'right_time': right_time,
+        'direction': direction,
+        'tolerance': tolerance.strip() or None,
+    }
+
+def join_options() -> dict:
+    st.markdown('#### Join Options')
+    join_type = st.radio('Join Type:', list(JOIN_TYPES), horizontal=True)
+    options = {'how': JOIN_TYPES[join_type], 'dedupe_right': False, 'mode': MERGE_IN_MEMORY}
+    if join_type == JOIN_ASOF:
+        options['asof'] = asof_options()
+        return options
+    _help = """
+    Keeps only the first right row of each key, so that every left row is matched at most once
+    and the merged dataframe has exactly as many rows as the left one.
+    """
+    options['dedupe_right'] = st.checkbox('Deduplicate right side first', help=_help)
+    _help = """
+    In Memory: the merged dataframe is kept in memory, as any other dataframe.
+
+    Chunked To Disk: for merges too large for memory (left and inner joins of two dataframes). 
+    The right keys are indexed once, the left dataframe is joined block by block and each block is written to a parquet file. 
+    Peak memory stays bounded whatever the size of the result.
+    """
+    options['mode'] = st.radio('Merge Mode:', MERGE_MODES, horizontal=True, help=_help)
+    return options
+
+def merged_dataframe_name() -> str:
+    _help = """
+    The merged dataframe is saved under this name: merging under another name keeps the previous merges.
+    """
+    return st.text_input('Merged Dataframe Name:', value=f'{MERGED}_{left_name}_{right_name}', help=_help).strip()
+
+def is_name_allowed(result_name: str, steps: list) -> bool:
+    """Merged dataframes may replace previous merges, not the other dataframes."""
+    if not result_name:
+        st.error('Please name the merged dataframe.')
+        return False
+    if result_name in [left_name, right_name] + [step.source for step in steps]:
+        st.error(f'{result_name} is one of the merged dataframes: please choose another name.')
+        return False
+    if result_name in fm.session_dataframe_keys() and not join_cache.is_merge_result(result_name):
+        st.error(f'A dataframe named {result_name} already exists: please choose another name.')
+        return False
+    return True
 
+def run_join_analysis(options: dict, index=None):
+    """Analyses the join keys. Returns None if the keys cannot be joined."""
+    try:
+        if index is None:
+            index = join_cache.get_join_index(right_name, right_df, right_index)
+        return join_analysis.analyse_join(
+                                left_df[left_index],
+                                right_df[right_index],
+                                left_df[left_col_selection],
+                                right_df[[col for col in right_col_selection if col not in right_index]],
+                                dedupe_right=options['dedupe_right'],
+                                how=options['how'],
+                                index=index,
+                            )
+    except (KeyError, ValueError, TypeError) as e:
+        st.error(f'The selected keys cannot be joined: {e}')
+        return None
 
-def merge_dataframes():
-    merge = st.button('Merge Dataframes', type='primary')
-    if merge:
+def display_join_analysis(analysis: join_analysis.JoinAnalysis):
+    st.markdown('#### Join Analysis')
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('Match Rate', f'{analysis.match_rate:.1%}')
+    col2.metric('Right Distinct Keys', f'{analysis.right_distinct:,}')
+    col3.metric('Duplicated Right Keys', f'{analysis.right_duplicate_keys:,}')
+    col4.metric('Merged Rows (Exact)', f'{analysis.estimated_rows:,}', 
+                delta=f'{analysis.estimated_rows - analysis.left_rows:,} vs left', delta_color='inverse')
+    st.caption(
+        f'{analysis.matched_left_rows:,} of {analysis.left_rows:,} left rows matched, '
+        f'{analysis.matched_keys:,} right keys used - estimated merged size {analysis.estimated_bytes / 1e6:,.1f} MB.'
+    )
+
+def is_join_allowed(analysis: join_analysis.JoinAnalysis, options: dict) -> bool:
+    """Blocks in-memory joins whose result would not fit in memory, warns about risky ones."""
+    if analysis.estimated_bytes > MERGE_MAX_BYTES and options['mode'] == MERGE_IN_MEMORY:
+        st.error(
+            f'Merge blocked: the merged dataframe would have {analysis.estimated_rows:,} rows '
+            f'(x{analysis.expansion:,.1f} the left dataframe), about {analysis.estimated_bytes / 1e9:,.1f} GB. '
+            'Check the selected keys, deduplicate the right side first or merge chunked to disk.'
+        )
+        return False
+    if analysis.right_duplicate_keys and not options['dedupe_right']:
+        st.warning(
+            f'{analysis.right_duplicate_keys:,} right key(s) are not unique: '
+            'left rows matching them will be duplicated.'
+        )
+    if analysis.matched_left_rows == 0:
+        st.warning('No left key matches the right side. Check the selected columns and their data types.')
+    return True
+
+def save_merged_dataframe(result_name: str, df: pd.DataFrame):
+    fm.save_dataframe_to_session_state(result_name, df)
+    st.success(f'Dataframes merged and saved as {result_name}!')
+    dtframe.display_dataframe(df, result_name)
+
+def merge_in_memory(options: dict, result_name: str):
+    with st.spinner('Merging dataframes...'):
+        right = right_df
+        if options['dedupe_right']:
+            right = right_df[~right_df.duplicated(subset=right_index, keep='first')]
+        try:
+            df = left_df[left_col_selection].merge(right[right_col_selection], how=options['how'], left_on=left_index, right_on=right_index)
+        except (KeyError, ValueError) as e:
+            st.error(f'Merge failed: {e}')
+            return
+    save_merged_dataframe(result_name, df)
+    join_cache.save_result(result_name, left_name)
+
+def merge_to_disk(options: dict, result_name: str):
+    if options['how'] not in ('left', 'inner'):
+        st.error('Chunked merges to disk support left and inner joins only.')
+        return
+    file_name = f'{result_name}.parquet'
+    path = fm.new_spill_path(file_name)
+    progress_bar = st.progress(0.0, text='Merging dataframes...')
+
+    def progress(n_done, n_left, n_rows):
+        progress_bar.progress(n_done / max(n_left, 1), text=f'Merging dataframes... {n_rows:,} rows written')
+
+    try:
+        index = join_cache.get_join_index(right_name, right_df, right_index)
+        n_rows = chunked_join.chunked_join(
+                            left_df, right_df, left_index, right_index, left_col_selection, right_col_selection,
+                            path, how=options['how'], dedupe_right=options['dedupe_right'], progress=progress, index=index)
+    except (KeyError, ValueError, TypeError) as e:
+        progress_bar.empty()
+        st.error(f'Merge failed: {e}')
+        return
+    progress_bar.empty()
+    fm.save_spilled_file_to_session_state(file_name, path)
+    st.success(
+        f'Dataframes merged: {n_rows:,} rows written to {file_name} ({os.path.getsize(path) / 1e6:,.1f} MB). '
+        'Go to the *Upload* section to import it.'
+    )
+
+def is_sorted(df_name: str, df: pd.DataFrame, time_key: str):
+    """Whether the time key is known to be sorted, from the stored index metadata. None if unknown."""
+    if time_key == asof_join.INDEX:
+        return fm.get_index_info(df_name, df).monotonic_increasing
+    return None
+
+def display_asof_analysis(options: dict):
+    asof = options['asof']
+    status = []
+    for side, df_name, df, time_key in (('Left', left_name, left_df, asof['left_time']), ('Right', right_name, right_df, asof['right_time'])):
+        known = is_sorted(df_name, df, time_key)
+        sorted_text = 'sorted' if known else 'to be checked / sorted' if known is None else 'not sorted, will be sorted'
+        status.append(f'{side} time key {time_key}: {sorted_text}')
+    st.caption(f'As-of joins keep each left row once ({left_df.shape[0]:,} rows). ' + ' - '.join(status) + '.')
+
+def merge_asof(options: dict, result_name: str):
+    asof = options['asof']
+    right_columns = list(dict.fromkeys(right_col_selection + right_index))
+    if asof['right_time'] != asof_join.INDEX and asof['right_time'] not in right_columns:
+        right_columns.append(asof['right_time'])
+    left_columns = list(dict.fromkeys(left_col_selection + left_index))
+    if asof['left_time'] != asof_join.INDEX and asof['left_time'] not in left_columns:
+        left_columns.append(asof['left_time'])
+    with st.spinner('Merging dataframes...'):
+        try:
+            df, resorted = asof_join.asof_join(
+                                left_df[left_columns],
+                                right_df[right_columns],
+                                asof['left_time'],
+                                asof['right_time'],
+                                left_by=left_index,
+                                right_by=right_index,
+                                direction=asof['direction'],
+                                tolerance=asof['tolerance'],
+                                left_sorted=is_sorted(left_name, left_df, asof['left_time']),
+                                right_sorted=is_sorted(right_name, right_df, asof['right_time']),
+                            )
+        except (KeyError, ValueError, TypeError) as e:
+            st.error(f'Merge failed: {e}')
+            return
+    if resorted:
+        st.caption(f'Sorted on the time key before joining: {", ".join(resorted)} dataframe. Set a sorted datetime index to skip it.')
+    save_merged_dataframe(result_name, df)
+    join_cache.save_result(result_name, left_name)
+
+def display_join_plan(planned: list):
+    st.markdown('#### Join Plan')
+    rows = join_planner.estimated_rows(left_df.shape[0], planned)
+    plan = pd.DataFrame([
+        {
+            'Dataframe': planned_step.step.name,
+            'Keys': ', '.join(f'{l} = {r}' for l, r in zip(planned_step.step.left_on, planned_step.step.right_on)),
+            'Match Rate': f'{planned_step.analysis.match_rate:.1%}',
+            'Duplicated Right Keys': planned_step.analysis.right_duplicate_keys,
+            'Rows After Join (Est.)': n_rows,
+        }
+        for planned_step, n_rows in zip(planned, rows)
+    ])
+    plan.index = range(1, len(plan) + 1)
+    st.dataframe(plan)
+
+def plan_joins(steps: list, options: dict):
+    """Analyses the joins: a single one as in display_join_analysis, more as a join plan. Returns None if they cannot run."""
+    if len(steps) == 1:
+        analysis = run_join_analysis(options, steps[0].index)
+        if analysis is None:
+            return None
+        display_join_analysis(analysis)
+        if not is_join_allowed(analysis, options):
+            return None
+        return [join_planner.PlannedStep(steps[0], analysis)]
+    try:
+        planned = join_planner.plan_joins(left_df, steps, options['how'], options['dedupe_right'])
+    except (KeyError, ValueError, TypeError) as e:
+        st.error(f'The selected keys cannot be joined: {e}')
+        return None
+    display_join_plan(planned)
+    return planned
+
+def merge_on_positions(steps: list, options: dict, merge: bool, result_name: str):
+    """Left and inner joins in memory, on row positions. A merge with the same spec as a stored one
+    (other columns to keep only) takes the columns at the stored positions instead of joining again."""
+    try:
+        steps = [step._replace(index=join_cache.get_join_index(step.source, step.dataframe, step.right_on)) for step in steps]
+    except (KeyError, ValueError, TypeError) as e:
+        st.error(f'The selected keys cannot be joined: {e}')
+        return
+    spec = join_cache.merge_spec(left_name, steps, options['how'], options['dedupe_right'])
+    result = join_cache.find_result(spec) if merge else None
+    if result is not None:
+        left_positions, step_positions = result.left_positions, result.step_positions
+        st.caption('Same dataframes, keys and join type as a previous merge: the columns are taken at its rows, without joining again.')
+    else:
+        planned = plan_joins(steps, options)
+        if planned is None or not merge:
+            return
         with st.spinner('Merging dataframes...'):
-            df = left_df[left_col_selection].merge(right_df[right_col_selection], how='left', left_on=left_index, right_on=right_index)
-            st.session_state[DATAFRAME][MERGED] = df
-        st.success('Dataframes merged and saved!')
-        dtframe.display_dataframe(df, 'Merged Dataframe')
+            left_positions, step_positions = join_planner.join_positions(left_df, planned, options['how'], options['dedupe_right'])
+    n_bytes = join_planner.output_size(left_df, left_col_selection, steps, len(left_positions))
+    if n_bytes > MERGE_MAX_BYTES:
+        st.error(
+            f'Merge blocked: the merged dataframe would have {len(left_positions):,} rows, '
+            f'about {n_bytes / 1e9:,.1f} GB. Check the selected keys or deduplicate the joined dataframes first.'
+        )
+        return
+    with st.spinner('Merging dataframes...'):
+        df = join_planner.assemble(left_df, left_col_selection, steps, left_positions, step_positions)
+    save_merged_dataframe(result_name, df)
+    join_cache.save_result(result_name, left_name, steps, spec, left_positions, step_positions)
+
+def merge_dataframes(steps: list):
+    options = join_options()
+    result_name = merged_dataframe_name()
+    col1, col2 = st.columns(2)
+    analyse = col1.button('Analyse Join')
+    merge = col2.button('Merge Dataframes', type='primary')
+    if not (analyse or merge):
+        return
+    if merge and not is_name_allowed(result_name, steps):
+        return
+    if options['how'] == 'asof':
+        if steps:
+            st.error('As-of joins are between two dataframes.')
+            return
+        display_asof_analysis(options)
+        if merge:
+            merge_asof(options, result_name)
+        return
+    if options['how'] in ('left', 'inner') and options['mode'] == MERGE_IN_MEMORY:
+        right_step = join_planner.JoinStep(right_name, right_df, left_index, right_index, right_col_selection, source=right_name)
+        merge_on_positions([right_step] + steps, options, merge, result_name)
+        return
+    if steps:
+        st.error('Joining more than two dataframes supports left and inner joins, in memory.')
+        return
+    analysis = run_join_analysis(options)
+    if analysis is None:
+        return
+    display_join_analysis(analysis)
+    if not is_join_allowed(analysis, options) or not merge:
+        return
+    if options['mode'] == MERGE_IN_MEMORY:
+        merge_in_memory(options, result_name)
+    else:
+        merge_to_disk(options, result_name)
+
+def display_merge_results():
+    names = join_cache.merge_result_names()
+    if names:
+        st.caption('Merged dataframes: ' + ', '.join(names))
 
 def merge_page():
     page_intro()
 
     if dtframe.are_there_dataframes():
         select_dataframe()
-        merge_dataframes()
+        steps = select_additional_dataframes()
+        join_cache.prune_results()
+        merge_dataframes(steps)
+        display_merge_results()
     else:
         dtframe.no_dataframe_yet()
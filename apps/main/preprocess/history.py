@@ -0,0 +1,33 @@
+"""
+Undo history of the preprocessed dataframes.
+
+Operations never modify a dataframe in place: they run on a shallow copy,
+which shares every column with the previous version, and only replace the columns they change.
+Keeping the previous version for undo therefore only holds the replaced or dropped columns in memory,
+and rolling back is just swapping the dataframe back.
+"""
+
+from collections import namedtuple
+
+import pandas as pd
+
+from apps.main.upload.dtypes import memory_usage
+
+Version = namedtuple('Version', ['label', 'dataframe', 'n_steps', 'held_bytes'])
+
+
+def held_bytes(previous: pd.DataFrame, columns: list = None) -> int:
+    """Memory kept alive by a previous version: the columns replaced or dropped by the operation.
+    Operations rebuilding the whole dataframe (e.g. sorting by a new index) hold all of it."""
+    if columns is None:
+        return memory_usage(previous)
+    columns = [col for col in columns if col in previous.columns]
+    return int(previous[columns].memory_usage(deep=True, index=False).sum()) if columns else 0
+
+def push(history: list, version: Version, max_versions: int):
+    """Adds a version, dropping the oldest ones beyond max_versions."""
+    history.append(version)
+    del history[:-max_versions]
+
+def total_held_bytes(history: list) -> int:
+    return sum(version.held_bytes for version in history)
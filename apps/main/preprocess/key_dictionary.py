@@ -0,0 +1,91 @@
+"""
+Shared dictionary encoding of key columns (SKU, order ids, ...) across dataframes.
+
+Each key has a single dictionary: a CategoricalDtype whose categories are every label seen so far.
+Encoded columns of every dataframe share that dtype, so the same label has the same integer code everywhere:
+grouping and joins run on the codes, and labels are only looked up when displaying or exporting.
+
+New labels are appended at the end of the dictionary, existing codes never change.
+Labels are stored as text so that e.g. SKU 123 read as a number in one file matches '123' in another.
+"""
+
+import numpy as np
+import pandas as pd
+
+from apps.main.upload.dtypes import MAX_EXACT_FLOAT_INT
+
+
+def _normalise_labels(values: pd.Index) -> pd.Index:
+    """Returns the labels as text. Whole number floats (integers read with missing values) lose their '.0',
+    as long as they are exact integers: larger ones and infinities keep their float text (e.g. '1e+20', 'inf')."""
+    if not pd.api.types.is_float_dtype(values.dtype):
+        return values.astype(str)
+    numbers = values.to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        whole = np.isfinite(numbers) & (numbers == np.round(numbers)) & (np.abs(numbers) < MAX_EXACT_FLOAT_INT)
+    labels = values.astype(str).to_numpy(dtype=object)
+    labels[whole] = numbers[whole].astype(np.int64).astype(str)
+    return pd.Index(labels).astype(str)
+
+def encode(series: pd.Series, dtype: pd.CategoricalDtype = None):
+    """Encodes a column with a key dictionary, extending the dictionary with the new labels.
+
+    Args:
+        series (pd.Series): Column to encode.
+        dtype (pd.CategoricalDtype, optional): Current dictionary of the key. None for a new key.
+
+    Returns:
+        tuple: (encoded series, dictionary dtype including the new labels).
+    """
+    # Each distinct value is looked up once
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    labels = _normalise_labels(pd.Index(uniques))
+    categories = dtype.categories if dtype is not None else pd.Index([], dtype=labels.dtype)
+    positions = categories.get_indexer(labels)
+    new_labels = labels[positions == -1].unique()
+    if len(new_labels) or dtype is None:
+        categories = categories.append(new_labels)
+        dtype = pd.CategoricalDtype(categories, ordered=False)
+        positions = categories.get_indexer(labels)
+    # Missing values keep the -1 code
+    positions = np.append(positions, -1).astype(np.int64)
+    category_codes = positions[codes]
+    encoded = pd.Categorical.from_codes(category_codes, dtype=dtype)
+    return pd.Series(encoded, index=series.index, name=series.name), dtype
+
+def is_encoded_with(col_dtype, dtype: pd.CategoricalDtype) -> bool:
+    """Whether a column dtype is the dictionary: same categories in the same order, so codes mean the same labels.
+    (Unordered CategoricalDtype equality ignores the order of the categories.)"""
+    return isinstance(col_dtype, pd.CategoricalDtype) and col_dtype.categories.equals(dtype.categories)
+
+def encoded_columns(dataframe: pd.DataFrame, dtype: pd.CategoricalDtype) -> list:
+    """Columns of the dataframe encoded with the dictionary."""
+    return [col for col, col_dtype in dataframe.dtypes.items() if is_encoded_with(col_dtype, dtype)]
+
+def extend_encoded_columns(dataframes: dict, old_dtype: pd.CategoricalDtype, new_dtype: pd.CategoricalDtype):
+    """Moves the columns encoded with a previous version of a dictionary to the extended one, in place.
+    New labels are appended, so codes are unchanged and only the dtype is swapped.
+
+    Returns:
+        list: (dataframe name, column) updated.
+    """
+    updated = []
+    for df_name, dataframe in dataframes.items():
+        for i, col_dtype in enumerate(dataframe.dtypes):
+            if is_encoded_with(col_dtype, old_dtype):
+                codes = dataframe.iloc[:, i].cat.codes.to_numpy()
+                extended = pd.Categorical.from_codes(codes, dtype=new_dtype)
+                dataframe.isetitem(i, extended)
+                updated.append((df_name, dataframe.columns[i]))
+    return updated
+
+def dictionary_summary(dictionaries: dict, dataframes: dict) -> pd.DataFrame:
+    rows = []
+    for key, dtype in dictionaries.items():
+        columns = [
+            f'{df_name}: {col}'
+            for df_name, dataframe in dataframes.items()
+            for col in encoded_columns(dataframe, dtype)
+        ]
+        rows.append({'Key': key, 'Labels': len(dtype.categories), 'Encoded Columns': ', '.join(map(str, columns))})
+    return pd.DataFrame(rows)
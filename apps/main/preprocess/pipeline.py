@@ -0,0 +1,289 @@
+"""
+Recorded preprocessing pipeline.
+
+Each preprocess operation is recorded as a step, a JSON serialisable dict:
+ - {'op': 'drop_columns', 'columns': [...]}
+ - {'op': 'convert', 'column': ..., 'to': 'Integer' | 'Float' | 'String' | 'Datetime', 'params': {...}}
+ - {'op': 'set_index', 'column': ...}
+ - {'op': 'reset_index'}
+ - {'op': 'encode', 'column': ..., 'key': ...}
+
+Encode steps map the column to the integer codes of the key dictionary, shared by every dataframe.
+A pipeline (list of steps) can be saved as JSON and replayed on another dataframe.
+On replay, consecutive column steps (drops and conversions) are fused into a single pass:
+dropped columns are never converted, each converted column is computed once,
+and the output frame is assembled once instead of being mutated step by step.
+A step on a column dropped earlier raises a KeyError, as it would when the steps are applied one by one.
+"""
+
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from apps.main.upload import datetime_parser
+from . import key_dictionary
+
+PIPELINE_VERSION = 1
+DROP_COLUMNS = 'drop_columns'
+CONVERT = 'convert'
+SET_INDEX = 'set_index'
+RESET_INDEX = 'reset_index'
+ENCODE = 'encode'
+COLUMN_OPS = (DROP_COLUMNS, CONVERT)
+INDEX_OPS = (SET_INDEX, RESET_INDEX)
+CONVERSION_TYPES = ['Integer', 'Float', 'String', 'Datetime']
+
+ColumnResult = namedtuple(
+    'ColumnResult', 
+    ['column', 'series', 'chain', 'seconds', 'memory_before', 'memory_after', 'error'],
+)
+
+
+def drop_columns_step(columns: list) -> dict:
+    return {'op': DROP_COLUMNS, 'columns': list(columns)}
+
+def convert_step(column: str, to: str, params: dict = None) -> dict:
+    return {'op': CONVERT, 'column': column, 'to': to, 'params': dict(params or {})}
+
+def set_index_step(column: str) -> dict:
+    return {'op': SET_INDEX, 'column': column}
+
+def reset_index_step() -> dict:
+    return {'op': RESET_INDEX}
+
+def encode_step(column: str, key: str) -> dict:
+    return {'op': ENCODE, 'column': column, 'key': key}
+
+def convert_series(series: pd.Series, to: str, params: dict = None) -> pd.Series:
+    """Converts a column to the target data type."""
+    params = params or {}
+    if to == 'Integer':
+        return series.astype(int)
+    elif to == 'Float':
+        return series.astype(float)
+    elif to == 'String':
+        return series.astype(str)
+    elif to == 'Datetime':
+        converted, _ = datetime_parser.parse_datetime(series, **params)
+        return converted
+    raise ValueError(f'Unknown data type: {to}')
+
+def _convert_chain(column, series: pd.Series, chain: list) -> ColumnResult:
+    """Runs the conversions of a column. Datetime conversions record the format they locked, 
+    so the returned chain replays without format inference."""
+    start = time.perf_counter()
+    memory_before = int(series.memory_usage(deep=True, index=False))
+    effective_chain = []
+    try:
+        for to, params in chain:
+            if to == 'Datetime':
+                series, report = datetime_parser.parse_datetime(series, **params)
+                if report.format:
+                    params = {'format': report.format}
+            else:
+                series = convert_series(series, to, params)
+            effective_chain.append((to, params))
+    except (ValueError, TypeError, OverflowError) as e:
+        return ColumnResult(column, None, chain, time.perf_counter() - start, memory_before, None, str(e))
+    memory_after = int(series.memory_usage(deep=True, index=False))
+    return ColumnResult(column, series, effective_chain, time.perf_counter() - start, memory_before, memory_after, None)
+
+def convert_columns(dataframe: pd.DataFrame, conversions: dict, max_workers: int = 1) -> dict:
+    """Converts independent columns concurrently.
+
+    Args:
+        conversions (dict): {column: [(to, params), ...]}.
+        max_workers (int): Worker threads. Numpy casts and datetime parsing release the GIL.
+
+    Returns:
+        dict: {column: ColumnResult}. Failed conversions have an error message and no series.
+    """
+    tasks = [(column, dataframe[column], chain) for column, chain in conversions.items()]
+    return {result.column: result for result in _run_conversions(tasks, max_workers)}
+
+def _run_conversions(tasks: list, max_workers: int = 1) -> list:
+    """Runs the (column, series, chain) conversion tasks, concurrently if max_workers > 1."""
+    if max_workers <= 1 or len(tasks) <= 1:
+        return [_convert_chain(*task) for task in tasks]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        return list(executor.map(lambda task: _convert_chain(*task), tasks))
+
+def _remove_row_index_column(dataframe: pd.DataFrame):
+    if 'index' in dataframe.columns:
+        dataframe.drop(columns=['index'], inplace=True)
+
+def set_index(dataframe: pd.DataFrame, column: str):
+    # Reset current index first to avoid losing that column
+    dataframe.reset_index(inplace=True)
+    dataframe.set_index(column, inplace=True)
+    # Checking the order is a single pass, sorting an already sorted index would copy every column
+    if not dataframe.index.is_monotonic_increasing:
+        dataframe.sort_index(inplace=True)
+    _remove_row_index_column(dataframe)
+
+def encode_column(dataframe: pd.DataFrame, column: str, key: str, dictionaries: dict):
+    """Encodes a column with the key dictionary, in place. The extended dictionary is saved in dictionaries,
+    and the other columns of the dataframe encoded with its previous version are moved to it."""
+    if dictionaries is None:
+        raise ValueError(f'Encoding {column} as {key} needs the key dictionaries')
+    old_dtype = dictionaries.get(key)
+    encoded, new_dtype = key_dictionary.encode(dataframe[column], old_dtype)
+    if old_dtype is not None and new_dtype is not old_dtype:
+        key_dictionary.extend_encoded_columns({None: dataframe}, old_dtype, new_dtype)
+    dataframe[column] = encoded
+    dictionaries[key] = new_dtype
+
+def apply_step(dataframe: pd.DataFrame, step: dict, dictionaries: dict = None):
+    """Applies a single step to the dataframe, in place.
+
+    Args:
+        dictionaries (dict, optional): Key dictionaries {key: pd.CategoricalDtype} used by encode steps, extended in place.
+    """
+    op = step['op']
+    if op == DROP_COLUMNS:
+        dataframe.drop(columns=step['columns'], inplace=True)
+    elif op == CONVERT:
+        column = step['column']
+        dataframe[column] = convert_series(dataframe[column], step['to'], step.get('params'))
+    elif op == SET_INDEX:
+        set_index(dataframe, step['column'])
+    elif op == RESET_INDEX:
+        dataframe.reset_index(inplace=True)
+    elif op == ENCODE:
+        encode_column(dataframe, step['column'], step['key'], dictionaries)
+    else:
+        raise ValueError(f'Unknown pipeline step: {op}')
+
+def _fuse_column_steps(steps: list):
+    """Reduces consecutive column steps to the set of dropped columns
+    and the conversions to run on each remaining column.
+    Raises a KeyError, as replaying the steps one by one would, if a step uses a column dropped before.
+
+    Returns:
+        tuple: (dropped columns, {column: [(to, params), ...]}).
+    """
+    dropped = []
+    conversions = dict()
+    for step in steps:
+        columns = step['columns'] if step['op'] == DROP_COLUMNS else [step['column']]
+        missing = [column for column in columns if column in dropped]
+        if missing:
+            raise KeyError(f'Column(s) not found in dataframe: {missing}')
+        if step['op'] == DROP_COLUMNS:
+            for column in columns:
+                # Converting a column that is dropped afterwards is wasted work
+                conversions.pop(column, None)
+                if column not in dropped:
+                    dropped.append(column)
+        else:
+            chain = conversions.setdefault(step['column'], [])
+            conversion = (step['to'], step.get('params') or {})
+            # Converting twice in a row to the same type is a no-op
+            if not chain or chain[-1] != conversion:
+                chain.append(conversion)
+    return dropped, conversions
+
+def _run_column_steps(dataframe: pd.DataFrame, steps: list, max_workers: int = 1) -> pd.DataFrame:
+    dropped, conversions = _fuse_column_steps(steps)
+    missing = [col for col in list(dropped) + list(conversions) if col not in dataframe.columns]
+    if missing:
+        raise KeyError(f'Column(s) not found in dataframe: {missing}')
+    # Columns are handled by position: a step on a duplicated column name applies to every column with that name
+    names = list(dataframe.columns)
+    keep = [i for i, column in enumerate(names) if column not in dropped]
+    tasks = [(i, dataframe.iloc[:, i], conversions[names[i]]) for i in keep if names[i] in conversions]
+    results = _run_conversions(tasks, max_workers)
+    errors = [f'{names[result.column]}: {result.error}' for result in results if result.error]
+    if errors:
+        raise ValueError('; '.join(errors))
+    # Unchanged columns are shared with the input dataframe, not copied (columns name and attrs are kept too)
+    output = dataframe.iloc[:, keep]
+    new_positions = {i: j for j, i in enumerate(keep)}
+    for result in results:
+        output.isetitem(new_positions[result.column], result.series)
+    return output
+
+def plan_pipeline(steps: list) -> list:
+    """Groups the steps into stages: runs of column steps, fused into one pass each,
+    and index and encode steps, applied one at a time.
+
+    Returns:
+        list: (kind, steps) tuples, kind being 'columns', 'index' or 'keys'.
+    """
+    stages = []
+    for step in steps:
+        kind = 'columns' if step['op'] in COLUMN_OPS else 'index' if step['op'] in INDEX_OPS else 'keys'
+        if kind == 'columns' and stages and stages[-1][0] == 'columns':
+            stages[-1][1].append(step)
+        else:
+            stages.append((kind, [step]))
+    return stages
+
+def run_pipeline(dataframe: pd.DataFrame, steps: list, max_workers: int = 1, dictionaries: dict = None) -> pd.DataFrame:
+    """Replays the pipeline on a dataframe, fusing consecutive column steps.
+    The columns converted by a fused pass are processed concurrently by max_workers threads.
+
+    Args:
+        dictionaries (dict, optional): Key dictionaries {key: pd.CategoricalDtype} used by encode steps, extended in place.
+
+    Returns:
+        pd.DataFrame: The processed dataframe. The input dataframe is left untouched.
+    """
+    validate_steps(steps)
+    df = dataframe
+    for kind, stage_steps in plan_pipeline(steps):
+        if kind == 'columns':
+            df = _run_column_steps(df, stage_steps, max_workers)
+        else:
+            if df is dataframe:
+                df = dataframe.copy(deep=False)
+            for step in stage_steps:
+                apply_step(df, step, dictionaries)
+    if df is dataframe:
+        df = dataframe.copy(deep=False)
+    return df
+
+def changed_columns(steps: list):
+    """Columns replaced or dropped by the steps. None if an index step rebuilds the whole dataframe."""
+    columns = []
+    for step in steps:
+        if step['op'] in INDEX_OPS:
+            return None
+        for column in step['columns'] if step['op'] == DROP_COLUMNS else [step['column']]:
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+def validate_steps(steps: list):
+    """Raises a ValueError if the steps are not a valid pipeline."""
+    if not isinstance(steps, list):
+        raise ValueError('A pipeline must be a list of steps.')
+    required = {
+        DROP_COLUMNS: ('columns',),
+        CONVERT: ('column', 'to'),
+        SET_INDEX: ('column',),
+        RESET_INDEX: (),
+        ENCODE: ('column', 'key'),
+    }
+    for i, step in enumerate(steps, 1):
+        if not isinstance(step, dict) or step.get('op') not in required:
+            raise ValueError(f'Step {i} is not a known operation: {step}')
+        missing = [key for key in required[step['op']] if key not in step]
+        if missing:
+            raise ValueError(f'Step {i} ({step["op"]}) misses {missing}')
+
+def pipeline_to_json(steps: list) -> str:
+    return json.dumps({'version': PIPELINE_VERSION, 'steps': steps}, indent=2, default=str)
+
+def pipeline_from_json(text) -> list:
+    """Reads a pipeline saved with pipeline_to_json. Raises a ValueError if it is not valid."""
+    try:
+        content = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'Not a valid JSON file: {e}')
+    steps = content.get('steps') if isinstance(content, dict) else content
+    validate_steps(steps)
+    return steps
@@ -1,13 +1,26 @@
+import time
+
 import pandas as pd
 import streamlit as st
 
 from apps.main.upload import file_manager as fm
+from apps.main.upload import datetime_parser
+from apps.main.upload import exporter
+from apps.main.upload import index_info
+from apps.main.upload.settings import (
+    PIPELINE, HISTORY, HISTORY_MAX_VERSIONS, CONVERSION_MAX_WORKERS,
+    DATAFRAME, KEY_DICTIONARY,
+)
 from apps.widgets import dtframe
+from . import pipeline
+from . import history
+from . import key_dictionary
 
 """
 List of global variables
  - df: pd.DataFrame
  - preview_container: st.empty
+ - index_container: st.empty
  - dtype_container: st.empty
 """
 
@@ -22,7 +35,10 @@ def page_intro():
         - **Drop unnecessary columns**: Remove columns that are not needed for your analysis to keep your data clean and focused.
         - **Set the Pandas index**: Define a specific column as the index of your dataframe to facilitate time series analysis and other operations.
         - **Reset the index**: Revert your dataframe to use the default integer index if needed.
-        - **Download the processed dataframe**: Export your cleaned and preprocessed dataframe to a CSV file for further analysis or sharing.
+        - **Download the processed dataframe**: Export your cleaned and preprocessed dataframe to a CSV, Parquet or Feather file for further analysis or sharing.
+        - **Encode keys**: Map SKU and order ids to integer codes shared by every dataframe, for faster grouping and merging.
+        - **Undo**: Roll back the last operations instantly. Previous versions only keep the columns an operation replaced or dropped.
+        - **Replay a pipeline**: Every operation is recorded. Save the pipeline as JSON and replay it on next week's file in a single pass.
 
         By using this tool, you can ensure that your data is clean, well-structured, and ready for use in various analytical tools and processes.
         """
@@ -45,6 +61,9 @@ def dataframe_info():
     global preview_container 
     preview_container = st.empty()
     preview_container.dataframe(df.iloc[:300])
+    global index_container
+    index_container = st.empty()
+    update_index_info()
     st.markdown('---')
 
 def get_dataframe_datatypes():
@@ -52,22 +71,82 @@ def get_dataframe_datatypes():
     dtypes.name = 'Data Type'
     return dtypes
 
+def update_index_info():
+    info = fm.get_index_info(file_name, df)
+    index_container.caption(index_info.describe_info(info))
+
 def update_dataframe_table():
     preview_container.dataframe(df.iloc[:300])
+    update_index_info()
 
 def update_dtype_table():
     dtypes = get_dataframe_datatypes()
     dtype_container.table(dtypes.astype(str))
 
+def get_recorded_steps():
+    return st.session_state[PIPELINE].setdefault(file_name, [])
+
+def get_history():
+    """Returns the previous versions of the selected dataframe. 
+    The history is dropped if the dataframe was replaced outside this page, e.g. imported again."""
+    entry = st.session_state[HISTORY].get(file_name)
+    if entry is None or entry['head'] is not df:
+        entry = {'versions': [], 'head': df}
+        st.session_state[HISTORY][file_name] = entry
+    return entry['versions']
+
+def commit_version(new_df: pd.DataFrame, steps: list, label: str, changed_columns: list = None):
+    """Makes new_df the current version of the dataframe and records its steps. 
+    The previous version is kept for undo: it shares all but the changed columns with new_df.
+
+    Args:
+        changed_columns (list, optional): Columns replaced or dropped. None if the whole dataframe was rebuilt.
+    """
+    global df
+    recorded = get_recorded_steps()
+    version = history.Version(label, df, len(recorded), history.held_bytes(df, changed_columns))
+    history.push(get_history(), version, HISTORY_MAX_VERSIONS)
+    df = new_df
+    st.session_state[HISTORY][file_name]['head'] = df
+    fm.save_dataframe_to_session_state(file_name, df)
+    recorded.extend(steps)
+
+def apply_and_record(step: dict, label: str, changed_columns: list = None):
+    """Applies a preprocessing step on a shallow copy of the dataframe and records it in its pipeline."""
+    new_df = df.copy(deep=False)
+    pipeline.apply_step(new_df, step)
+    commit_version(new_df, [step], label, changed_columns)
+
+def undo_section(container):
+    """Rendered in the container once the operations of this run are applied, so it shows the latest version."""
+    versions = get_history()
+    if not versions:
+        return
+    _help = """
+    Previous versions share their unchanged columns with the current dataframe: 
+    only the replaced or dropped columns are kept in memory.
+    """
+    held = history.total_held_bytes(versions)
+    with container.container():
+        st.caption(f'{len(versions)} previous version(s) kept for undo - {held / 1e6:,.1f} MB held.')
+        if st.button(f'Undo: {versions[-1].label}', help=_help, key='undo_button'):
+            version = versions.pop()
+            st.session_state[HISTORY][file_name]['head'] = version.dataframe
+            fm.save_dataframe_to_session_state(file_name, version.dataframe)
+            del get_recorded_steps()[version.n_steps:]
+            st.rerun()
+
 def drop_columns():
     st.markdown('##### Remove columns by specifying label names.')
     label = 'Select Column(s) To Drop'
     options = df.columns
     cols_to_drop = st.multiselect(label, options)
-    st.warning('This operation cannot be undone!')
     if st.button('Remove Col(s)'):
         with st.spinner('Removing Selected Column(s)'):
-            df.drop(columns=cols_to_drop, inplace=True)
+            apply_and_record(
+                pipeline.drop_columns_step(cols_to_drop), 
+                f"Drop {', '.join(map(str, cols_to_drop))}", 
+                cols_to_drop)
         st.success('Done!')
         update_dataframe_table()
         update_dtype_table()
@@ -84,7 +163,11 @@ def to_datetime_simple():
     """
     with st.expander('More Info'):
         text = """
-        Brief Explanation Here
+        The date-time format is inferred from a sample of the column values, then locked: 
+        each distinct value is parsed once and the result is mapped back to the rows. 
+        Values not matching the format are set to NaT and reported.
+
+        Dayfirst tells how ambiguous dates such as 10/11/12 are read.
         """
         st.markdown(text)
     # Set pd.to_datetime parameters
@@ -157,8 +240,19 @@ def convert_to_datetime(col_to_convert):
         params = to_datetime_advanced()
     if st.button('Convert To Datetime'):
         with st.spinner(f'Converting {col_to_convert} to datetime...'):
-            df[col_to_convert] = pd.to_datetime(df[col_to_convert], **params)
-        st.success(f'Done! {col_to_convert} successfully converted!')
+            converted, report = datetime_parser.parse_datetime(df[col_to_convert], **params)
+            new_df = df.copy(deep=False)
+            new_df[col_to_convert] = converted
+            if report.format:
+                # Record the locked format, replays then skip format inference
+                params = {'format': report.format}
+            step = pipeline.convert_step(col_to_convert, 'Datetime', params)
+            commit_version(new_df, [step], f'Convert {col_to_convert} to Datetime', [col_to_convert])
+        text = datetime_parser.describe_report(col_to_convert, report)
+        if report.n_unparseable:
+            st.warning(f'Done with unparseable values! {text}')
+        else:
+            st.success(f'Done! {text}')
         update_dtype_table()
         update_dataframe_table()
 
@@ -167,7 +261,7 @@ def convert_to_datetime(col_to_convert):
 def convert_to_string(col_to_convert: str):
     if st.button('Convert To String'):
         with st.spinner(f'Converting {col_to_convert} to string...'):
-            df[col_to_convert] = df[col_to_convert].astype(str)
+            apply_and_record(pipeline.convert_step(col_to_convert, 'String'), f'Convert {col_to_convert} to String', [col_to_convert])
         st.success(f'Done! \n{col_to_convert} successfully converted!')
     update_dataframe_table()
     update_dtype_table()
@@ -176,7 +270,7 @@ def convert_to_string(col_to_convert: str):
 def convert_to_integer(col_to_convert: str):
     if st.button('Convert To Int'):
         with st.spinner(f'Converting {col_to_convert} to integer...'):
-            df[col_to_convert] = df[col_to_convert].astype(int)
+            apply_and_record(pipeline.convert_step(col_to_convert, 'Integer'), f'Convert {col_to_convert} to Integer', [col_to_convert])
         st.success(f'Done! \n{col_to_convert} successfully converted!')
     update_dataframe_table()
     update_dtype_table()
@@ -184,7 +278,7 @@ def convert_to_integer(col_to_convert: str):
 def convert_to_float(col_to_convert: str):
     if st.button('Convert To Float'):
         with st.spinner(f'Converting {col_to_convert} to float...'):
-            df[col_to_convert] = df[col_to_convert].astype(float)
+            apply_and_record(pipeline.convert_step(col_to_convert, 'Float'), f'Convert {col_to_convert} to Float', [col_to_convert])
         st.success(f'Done! \n{col_to_convert} successfully converted!')
     update_dataframe_table()
     update_dtype_table()
@@ -259,16 +353,99 @@ def datatype_conversion():
     elif convert_to_type == 'Datetime':
         convert_to_datetime(col_to_convert)
 
-def _remove_row_index_column():
-    if 'index' in df.columns:
-        df.drop(columns=['index'], inplace=True)
+def _batch_datetime_params():
+    """Datetime options of the batch conversion. The format is inferred per column if left empty."""
+    col1, col2 = st.columns(2)
+    format_tip = """
+    strftime format applied to every column converted to Datetime, e.g. "%d/%m/%Y %H:%M". 
+    Leave empty to infer the format of each column from its values.
+    """
+    format_dt = col1.text_input('Datetime Format (Optional)', placeholder='E.g.: %d/%m/%Y', help=format_tip, key='batch_format')
+    dayfirst = col2.checkbox('Dayfirst', value=False, help='Read ambiguous dates such as 10/11/12 day first.', key='batch_dayfirst')
+    if format_dt:
+        return {'format': format_dt}
+    return {'dayfirst': dayfirst}
+
+def _conversion_summary(results: dict, conversions: dict):
+    rows = []
+    for column, result in results.items():
+        to = conversions[column][-1][0]
+        change = None
+        if result.error is None:
+            change = (result.memory_after - result.memory_before) / 1e6
+        rows.append({
+            'Column': str(column),
+            'Converted To': to,
+            'Time (s)': round(result.seconds, 3),
+            'Memory Before (MB)': round(result.memory_before / 1e6, 2),
+            'Memory After (MB)': None if result.error else round(result.memory_after / 1e6, 2),
+            'Memory Change (MB)': None if change is None else round(change, 2),
+            'Error': result.error or '',
+        })
+    return pd.DataFrame(rows)
+
+def batch_datatype_conversion():
+    st.markdown('##### Convert Several Columns')
+    with st.expander('More Info'):
+        text = """
+        Pick a target data type for as many columns as needed, then convert them all in one go. 
+        Columns are converted concurrently and the dataframe is updated once. 
+        A column failing to convert is left unchanged and reported in the summary.
+        """
+        st.markdown(text)
+    dtypes = get_dataframe_datatypes()
+    table = pd.DataFrame({
+        'Column': [str(col) for col in df.columns],
+        'Data Type': dtypes.astype(str).to_numpy(),
+        'Convert To': pd.Series([None] * df.shape[1], dtype=object),
+    })
+    edited = st.data_editor(
+                    table,
+                    column_config={
+                        'Convert To': st.column_config.SelectboxColumn(options=pipeline.CONVERSION_TYPES),
+                    },
+                    disabled=['Column', 'Data Type'],
+                    hide_index=True,
+                    key=f'{file_name}_batch_conversion',
+                )
+    datetime_params = _batch_datetime_params()
+    # Rows of the editor follow the dataframe column positions
+    targets = edited['Convert To']
+    conversions = {
+        df.columns[i]: [(to, datetime_params if to == 'Datetime' else {})]
+        for i, to in enumerate(targets) if to in pipeline.CONVERSION_TYPES
+    }
+    if st.button('Convert Selected Columns', disabled=not conversions):
+        with st.spinner(f'Converting {len(conversions)} column(s)...'):
+            results = pipeline.convert_columns(df, conversions, CONVERSION_MAX_WORKERS)
+            new_df = df.copy(deep=False)
+            steps = []
+            for column, result in results.items():
+                if result.error is not None:
+                    continue
+                new_df[column] = result.series
+                for to, params in result.chain:
+                    steps.append(pipeline.convert_step(column, to, params))
+            converted = [column for column, result in results.items() if result.error is None]
+            if converted:
+                commit_version(new_df, steps, f'Convert {len(converted)} column(s)', converted)
+        summary = _conversion_summary(results, conversions)
+        failed = summary['Error'] != ''
+        if failed.any():
+            st.error(f'{failed.sum()} column(s) could not be converted and were left unchanged.')
+        if converted:
+            st.success(f'Done! {len(converted)} column(s) converted.')
+        st.dataframe(summary, hide_index=True)
+        update_dataframe_table()
+        update_dtype_table()
 
 def set_index():
     st.markdown('##### Set Index')
     with st.expander('More Info'):
         text = """
         It sets a column into the index. 
-        The dataframe will be sorted afterwards.
+        The dataframe will be sorted afterwards, unless the column is already sorted (e.g. timestamps in chronological order).
+        Tools slicing a time range on a sorted index find its bounds by binary search.
         """
         st.markdown(text)
 
@@ -279,11 +456,7 @@ def set_index():
     # Set index
     if st.button('Set Index'):
         with st.spinner(f'Setting {new_index} as new index...'):
-            # Reset current index first to avoid losing that column
-            df.reset_index(inplace=True)
-            df.set_index(new_index, inplace=True)
-            df.sort_index(inplace=True)
-            _remove_row_index_column()
+            apply_and_record(pipeline.set_index_step(new_index), f'Set {new_index} as index')
         st.success('Done!')
         update_dataframe_table()
         update_dtype_table()
@@ -297,39 +470,175 @@ def reset_index():
         st.markdown(text)
     if st.button('Reset Index'):
         with st.spinner('Resetting Index...'):
-            df.reset_index(inplace=True)
+            apply_and_record(pipeline.reset_index_step(), 'Reset index')
         st.success('Done!')
         update_dataframe_table()
         update_dtype_table()
 
-def download_section():
-    st.markdown('##### Download Dataframe To Csv')
-    if st.button('Prepare File'):
-        with st.spinner('Preparing Data For Download...'):
-            csv = fm.dataframe_to_csv(df)
-        st.success('Done!')
+def save_dictionaries(extended: dict) -> list:
+    """Saves the key dictionaries extended by encode steps. The columns of every dataframe 
+    encoded with a previous version of a dictionary are moved to the extended one.
+
+    Returns:
+        list: (dataframe name, column) updated.
+    """
+    dictionaries = st.session_state[KEY_DICTIONARY]
+    updated = []
+    for key, new_dtype in extended.items():
+        old_dtype = dictionaries.get(key)
+        dictionaries[key] = new_dtype
+        if old_dtype is not None and new_dtype is not old_dtype:
+            updated += key_dictionary.extend_encoded_columns(st.session_state[DATAFRAME], old_dtype, new_dtype)
+    # Changed in place: the dataframes get a new version all the same
+    for df_name in dict.fromkeys(name for name, _ in updated):
+        fm.bump_dataframe_version(df_name)
+    return updated
+
+def encode_keys():
+    st.markdown('##### Encode Key Columns')
+    with st.expander('More Info'):
+        text = """
+        Maps the values of key columns (SKU codes, order ids, ...) to integer codes, 
+        using one dictionary per key shared by every dataframe.
+
+        The same SKU gets the same code in every dataset, merged ones included, 
+        so grouping and merging run on integers instead of text. 
+        Labels are still shown in previews and written on export.
+
+        Encode the matching column of each dataframe with the same key name.
+        """
+        st.markdown(text)
+    dictionaries = st.session_state[KEY_DICTIONARY]
+    col1, col2 = st.columns(2)
+    key_name = col1.text_input('Key Name', value='SKU', help='Columns encoded with the same key name share their codes.')
+    column = col2.selectbox('Column To Encode', df.columns, key='encode_keys_column')
+    if st.button('Encode Column') and key_name:
+        with st.spinner(f'Encoding {column}...'):
+            old_dtype = dictionaries.get(key_name)
+            step = pipeline.encode_step(column, key_name)
+            extended = dict(dictionaries)
+            new_df = df.copy(deep=False)
+            pipeline.apply_step(new_df, step, extended)
+            commit_version(new_df, [step], f'Encode {column} as {key_name}', [column])
+            updated = save_dictionaries(extended)
+            new_dtype = dictionaries[key_name]
+        n_new = len(new_dtype.categories) - (len(old_dtype.categories) if old_dtype is not None else 0)
+        st.success(f'Done! {column} encoded with {key_name} dictionary: {n_new:,} new label(s).')
+        if updated:
+            st.caption('Dictionary extended on: ' + ', '.join(f'{name}: {col}' for name, col in updated))
+        update_dataframe_table()
+        update_dtype_table()
+    if dictionaries:
+        st.markdown('###### Key Dictionaries')
+        st.dataframe(key_dictionary.dictionary_summary(dictionaries, st.session_state[DATAFRAME]), hide_index=True)
+
+def _describe_step(step: dict):
+    if step['op'] == pipeline.DROP_COLUMNS:
+        return f"Drop column(s) {', '.join(map(str, step['columns']))}"
+    elif step['op'] == pipeline.CONVERT:
+        params = f" {step['params']}" if step.get('params') else ''
+        return f"Convert {step['column']} to {step['to']}{params}"
+    elif step['op'] == pipeline.SET_INDEX:
+        return f"Set {step['column']} as index"
+    elif step['op'] == pipeline.ENCODE:
+        return f"Encode {step['column']} as {step['key']}"
+    return 'Reset index'
+
+def pipeline_section():
+    global df
+    st.markdown('##### Preprocessing Pipeline')
+    with st.expander('More Info'):
+        text = """
+        Every operation applied to the dataframe is recorded. 
+        Save the pipeline as a JSON file to apply the same cleaning to the next file.
+
+        When a pipeline is replayed, consecutive column operations (conversions and drops) 
+        are fused into a single pass: dropped columns are never converted 
+        and the dataframe is rebuilt once instead of once per operation.
+        Encoded keys use the key dictionaries of this session, extended with the new labels.
+        """
+        st.markdown(text)
+    # Recorded steps
+    steps = get_recorded_steps()
+    st.markdown(f'###### Recorded On {file_name}')
+    if steps:
+        st.markdown('\n'.join(f'{i}. {_describe_step(step)}' for i, step in enumerate(steps, 1)))
         st.download_button(
-            label="Download CSV",
-            data=csv,
-            file_name=f'{file_name}.csv',
-            mime='text/csv',
+            label='Save Pipeline As JSON',
+            data=pipeline.pipeline_to_json(steps),
+            file_name=f'{file_name}_pipeline.json',
+            mime='application/json',
         )
+        if st.button('Clear Recorded Steps'):
+            steps.clear()
+            st.rerun()
+    else:
+        st.caption('No operation recorded yet.')
+
+    # Replay a saved pipeline
+    st.markdown(f'###### Replay A Pipeline On {file_name}')
+    uploaded = st.file_uploader('Load Pipeline JSON', type=['json'], key='pipeline_uploader')
+    if uploaded is None:
+        return
+    try:
+        loaded_steps = pipeline.pipeline_from_json(uploaded.getvalue())
+    except ValueError as e:
+        st.error(f'Invalid pipeline: {e}')
+        return
+    stages = pipeline.plan_pipeline(loaded_steps)
+    text = f'{len(loaded_steps)} step(s) executed in {len(stages)} pass(es):\n'
+    for i, (kind, stage_steps) in enumerate(stages, 1):
+        text += f"\n{i}. {'; '.join(_describe_step(step) for step in stage_steps)}"
+    st.markdown(text)
+    if st.button('Apply Pipeline', type='primary'):
+        with st.spinner('Running pipeline...'):
+            start = time.perf_counter()
+            # Dictionaries are only saved if the whole pipeline succeeds
+            extended = dict(st.session_state[KEY_DICTIONARY])
+            try:
+                new_df = pipeline.run_pipeline(df, loaded_steps, CONVERSION_MAX_WORKERS, extended)
+            except (KeyError, ValueError, TypeError) as e:
+                st.error(f'Pipeline failed, dataframe left unchanged: {e}')
+                return
+            elapsed = time.perf_counter() - start
+        commit_version(new_df, loaded_steps, 'Pipeline', pipeline.changed_columns(loaded_steps))
+        save_dictionaries(extended)
+        st.success(f'Done! Pipeline applied in {elapsed:,.2f} s.')
+        update_dataframe_table()
+        update_dtype_table()
+
+def download_section():
+    st.markdown('##### Download Dataframe')
+    export_format = dtframe.select_export_format('preprocess')
+    # With deferred downloads the file is written in chunks when the button is clicked, not on every rerun
+    if not exporter.DEFERRED_DOWNLOADS and not st.button('Prepare File'):
+        return
+    st.download_button(
+        label=f"Download {export_format}",
+        data=exporter.download_data(df, export_format, index=False),
+        file_name=fm.export_file_name(file_name, export_format),
+        mime=fm.export_mime_type(export_format),
+    )
 
 
 def custom_preprocessing():
     st.markdown('### Dataframe Operations')
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
         [
             'Convert Datatype', 
             'Drop Column(s)', 
             'Set Index', 
             'Reset Index',
+            'Encode Keys',
+            'Pipeline',
             'Download'
         ]
     )
 
     with tab1:
         datatype_conversion()
+        st.markdown('---')
+        batch_datatype_conversion()
 
     with tab2:
         drop_columns()
@@ -341,6 +650,12 @@ def custom_preprocessing():
         reset_index()
 
     with tab5:
+        encode_keys()
+
+    with tab6:
+        pipeline_section()
+
+    with tab7:
         download_section()
     
 
@@ -348,7 +663,9 @@ def run_page():
     page_intro()
     if fm.are_there_dataframes():
         dataframe_info()
+        undo_container = st.empty()
         custom_preprocessing()
+        undo_section(undo_container)
     else:
         no_dataframe_yet()
 
@@ -0,0 +1,153 @@
+"""
+Content-addressed cache of parsed uploads.
+
+Each parsed dataframe is stored as an lz4 compressed Feather (Arrow IPC) file, 
+named after the hash of the raw file content plus the import parameters.
+The modification time of a file is its last access, used for LRU eviction.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .settings import CACHE_DIR, CACHE_MAX_BYTES
+from . import exporter
+
+DATA_SUFFIX = '.feather'
+JSON_SUFFIX = '.json'
+
+
+def file_digest(_file) -> str:
+    """Returns the blake2b hex digest of an uploaded file / binary buffer content."""
+    h = hashlib.blake2b(digest_size=20)
+    if hasattr(_file, 'getbuffer'):
+        h.update(_file.getbuffer())
+    else:
+        _file.seek(0)
+        for block in iter(lambda: _file.read(1 << 20), b''):
+            h.update(block)
+        _file.seek(0)
+    return h.hexdigest()
+
+def stat_digest(path: str) -> str:
+    """Cheap digest of a server file from its path, size and modification time."""
+    stat = os.stat(path)
+    payload = f'{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+def cache_key(digest: str, params: dict, ignore: tuple = ()) -> str:
+    """Combines file digest and import parameters into the cache key.
+
+    Args:
+        digest (str): File content digest, see file_digest.
+        params (dict): Import parameters (sheets, sep, decimal, ...).
+        ignore (tuple): Parameters not affecting the parsed result (e.g. chunksize).
+    """
+    relevant = {k: v for k, v in params.items() if k not in ignore}
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(digest.encode())
+    h.update(payload.encode())
+    return h.hexdigest()
+
+def _path(key: str, suffix: str = DATA_SUFFIX) -> str:
+    return os.path.join(CACHE_DIR, f'{key}{suffix}')
+
+def _touch(path: str):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _atomic_write(path: str, write):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load(key: str):
+    """Returns the cached dataframe for key, None if missing."""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = feather.read_table(path).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+    _touch(path)
+    return df
+
+def _write_feather(dataframe: pd.DataFrame, path: str):
+    # Written one record batch at a time: the dataframe is never converted to Arrow as a whole
+    with open(path, 'wb') as f:
+        exporter.write_feather(dataframe, f)
+
+def store(key: str, dataframe: pd.DataFrame) -> bool:
+    """Stores dataframe under key and evicts least recently used entries above the size cap.
+
+    Returns:
+        bool: False if the dataframe cannot be represented in Arrow (e.g. mixed type columns).
+    """
+    try:
+        _atomic_write(_path(key), lambda path: _write_feather(dataframe, path))
+    except (OSError, ValueError, TypeError, pa.ArrowException):
+        return False
+    evict()
+    return True
+
+def load_json(key: str):
+    """Returns small metadata (sheet names, headers, ...) cached under key, None if missing."""
+    path = _path(key, JSON_SUFFIX)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        value = json.load(f)
+    _touch(path)
+    return value
+
+def store_json(key: str, value):
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump(value, f, default=str)
+    try:
+        _atomic_write(_path(key, JSON_SUFFIX), write)
+    except OSError:
+        pass
+
+def _entries():
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+def cache_size() -> int:
+    return sum(size for _, size, _ in _entries())
+
+def evict(max_bytes: int = CACHE_MAX_BYTES):
+    """Removes least recently used entries until the cache fits in max_bytes."""
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def clear():
+    evict(max_bytes=0)
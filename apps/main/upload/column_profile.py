@@ -0,0 +1,154 @@
+"""
+Single-pass column profile, built chunk by chunk while a file is parsed.
+
+For each column it keeps null counts, min / max, a K-Minimum-Values sketch
+(the K smallest distinct value hashes) to estimate the number of distinct values,
+and bounded counts of the most frequent values. The state of a column never grows
+with the number of rows, so profiling adds no memory to a streaming import.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .dtypes import MAX_UNIQUE_RATIO
+
+KMV_SIZE = 1024  # Hashes kept per column: ~3% standard error on the distinct count
+TOP_CAPACITY = 1000  # Value counts kept per column between chunks
+N_TOP_VALUES = 5  # Most frequent values shown per column
+HASH_SPACE = 2.0**64
+
+
+def new_profile() -> dict:
+    """Returns an empty profile, to be filled with update_profile."""
+    return dict()
+
+def _new_column_state() -> dict:
+    return {
+        'dtypes': [],
+        'count': 0,
+        'nulls': 0,
+        'min': None,
+        'max': None,
+        'hashes': np.empty(0, dtype=np.uint64),
+        'top': pd.Series(dtype='float64'),
+    }
+
+def _has_order(series: pd.Series) -> bool:
+    return (
+        pd.api.types.is_numeric_dtype(series.dtype)
+        or pd.api.types.is_datetime64_any_dtype(series.dtype)
+    ) and not isinstance(series.dtype, pd.CategoricalDtype)
+
+def _update_min_max(state: dict, values: pd.Series):
+    if values.empty or not _has_order(values):
+        return
+    chunk_min, chunk_max = values.min(), values.max()
+    state['min'] = chunk_min if state['min'] is None else min(state['min'], chunk_min)
+    state['max'] = chunk_max if state['max'] is None else max(state['max'], chunk_max)
+
+def _update_hashes(state: dict, distinct_values: pd.Index):
+    """Keeps the KMV_SIZE smallest distinct hashes seen so far."""
+    hashes = pd.util.hash_pandas_object(distinct_values, index=False).to_numpy()
+    if len(state['hashes']) == KMV_SIZE:
+        # Only hashes below the current K-th smallest can enter the sketch
+        hashes = hashes[hashes < state['hashes'][-1]]
+    elif len(hashes) > KMV_SIZE:
+        hashes = np.partition(hashes, KMV_SIZE)[:KMV_SIZE]
+    state['hashes'] = np.unique(np.concatenate([state['hashes'], hashes]))[:KMV_SIZE]
+
+def _update_top(state: dict, counts: pd.Series):
+    """Merges the chunk most frequent values into the TOP_CAPACITY most frequent values so far.
+    Counts of values dropped from a chunk or from the merge are underestimated, the heavy hitters are not."""
+    counts = counts.iloc[:TOP_CAPACITY]
+    if not state['top'].empty:
+        counts = pd.concat([state['top'], counts]).groupby(level=0, sort=False).sum()
+        counts = counts.nlargest(TOP_CAPACITY)
+    state['top'] = counts
+
+def update_profile(profile: dict, chunk: pd.DataFrame):
+    """Adds a chunk of rows to the profile.
+
+    Args:
+        profile (dict): Profile returned by new_profile, updated in place.
+        chunk (pd.DataFrame): Rows to add, with the columns of the previous chunks.
+    """
+    for i, col in enumerate(chunk.columns):
+        series = chunk.iloc[:, i]
+        state = profile.setdefault(col, _new_column_state())
+        dtype = str(series.dtype)
+        if dtype not in state['dtypes']:
+            state['dtypes'].append(dtype)
+        values = series.dropna()
+        state['count'] += len(series)
+        state['nulls'] += len(series) - len(values)
+        if values.empty:
+            continue
+        _update_min_max(state, values)
+        # Value counts give both the distinct values to hash and the most frequent ones
+        counts = values.value_counts()
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Categories absent from the chunk are counted as 0
+            counts = counts[counts > 0]
+        _update_hashes(state, counts.index)
+        _update_top(state, counts)
+
+def reset_columns(profile: dict, columns: list):
+    """Empties the state of the columns, to profile them again (e.g. read again with another type)."""
+    for col in columns:
+        profile[col] = _new_column_state()
+
+def estimate_distinct(hashes: np.ndarray) -> int:
+    """K-Minimum-Values estimate: exact below KMV_SIZE distinct values."""
+    if len(hashes) < KMV_SIZE:
+        return len(hashes)
+    return int(round((KMV_SIZE - 1) / (float(hashes[KMV_SIZE - 1]) / HASH_SPACE)))
+
+def guess_type(dtype: str, non_null: int, distinct: int) -> str:
+    """Guesses the role of a column from its data type and cardinality."""
+    if non_null == 0:
+        return 'empty'
+    if distinct == 1:
+        return 'constant'
+    if dtype.startswith('bool'):
+        return 'boolean'
+    if dtype.startswith('datetime'):
+        return 'datetime'
+    # The distinct count is an estimate above KMV_SIZE: allow for its error
+    is_unique = distinct >= 0.95 * non_null
+    if dtype.startswith(('int', 'uint', 'Int', 'UInt')):
+        return 'identifier' if is_unique else 'integer'
+    if dtype.startswith(('float', 'Float')):
+        return 'float'
+    if is_unique:
+        return 'identifier'
+    if distinct <= MAX_UNIQUE_RATIO * non_null:
+        return 'category / key'
+    return 'text'
+
+def finalize_profile(profile: dict) -> pd.DataFrame:
+    """Returns the profile as a dataframe, one row per column."""
+    rows = []
+    for col, state in profile.items():
+        non_null = state['count'] - state['nulls']
+        distinct = estimate_distinct(state['hashes'])
+        dtype = ' / '.join(state['dtypes'])
+        top = state['top'].nlargest(N_TOP_VALUES)
+        rows.append({
+            'Column': str(col),
+            'Data Type': dtype,
+            'Type Guess': guess_type(state['dtypes'][-1], non_null, distinct),
+            'Non-Null': non_null,
+            'Nulls': state['nulls'],
+            'Null %': round(100 * state['nulls'] / state['count'], 2) if state['count'] else 0.0,
+            'Distinct (est.)': distinct,
+            'Min': None if state['min'] is None else str(state['min']),
+            'Max': None if state['max'] is None else str(state['max']),
+            'Top Values': ', '.join(f'{value} ({int(n):,})' for value, n in top.items()),
+        })
+    return pd.DataFrame(rows)
+
+def profile_dataframe(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Profiles a whole dataframe in one pass."""
+    profile = new_profile()
+    update_profile(profile, dataframe)
+    return finalize_profile(profile)
@@ -0,0 +1,115 @@
+"""
+Fast datetime conversion.
+
+Timestamps repeat heavily in order line extracts (one per order, shift or day), 
+so instead of parsing every row:
+ 1. the format is inferred once from a sample of distinct values and locked,
+ 2. only the distinct values are parsed, with that format,
+ 3. the parsed values are mapped back to the rows through their codes.
+
+Values not matching the format become NaT and are reported instead of failing the whole conversion.
+"""
+
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from . import sniffer
+
+N_SAMPLE = 1000  # Distinct values used to infer the format
+N_GUESSES = 50  # Distinct values pandas guesses the format of, if no common format matches them all
+N_UNPARSEABLE_SHOWN = 10
+
+DatetimeReport = namedtuple(
+    'DatetimeReport', 
+    ['format', 'n_rows', 'n_unique', 'n_unparseable', 'unparseable_values', 'seconds'],
+)
+
+
+def infer_format(uniques: pd.Index, dayfirst: bool = False):
+    """Infers a strftime format from a sample of distinct values. Returns None if none is found."""
+    sample = pd.Series(uniques[:N_SAMPLE]).astype(str)
+    fmt = sniffer.detect_datetime_format(sample, dayfirst=dayfirst)
+    if fmt is None and len(sample):
+        # Not every sampled value matches a common format: keep the format pandas guesses most often
+        guesses = pd.Series([guess_datetime_format(value, dayfirst=dayfirst) for value in sample.iloc[:N_GUESSES]])
+        guesses = guesses.dropna()
+        if not guesses.empty:
+            fmt = guesses.mode().iloc[0]
+    return fmt
+
+def parse_datetime(
+                series: pd.Series, 
+                format: str = None, 
+                dayfirst: bool = False, 
+                yearfirst: bool = False,
+            ):
+    """Converts a column to datetime parsing each distinct value once.
+
+    Args:
+        series (pd.Series): Column to convert.
+        format (str, optional): strftime format. Inferred from the data if not set.
+        dayfirst (bool): Prefer day first formats when inferring the format, e.g. 10/11/12 is 10 November.
+        yearfirst (bool): Used only if no format can be inferred, see pd.to_datetime.
+
+    Returns:
+        tuple: (converted series, DatetimeReport).
+    """
+    start = time.perf_counter()
+    n_rows = series.shape[0]
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series, DatetimeReport(None, n_rows, None, 0, [], time.perf_counter() - start)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = pd.Index(uniques)
+    fmt = format or infer_format(uniques, dayfirst)
+    if fmt:
+        if not pd.api.types.is_string_dtype(uniques.dtype):
+            # E.g. dates read as integers: 20240131
+            uniques = uniques.astype(str)
+        parsed = pd.to_datetime(uniques, format=fmt, errors='coerce')
+    else:
+        parsed = pd.to_datetime(uniques, errors='coerce', dayfirst=dayfirst, yearfirst=yearfirst)
+    parsed = pd.DatetimeIndex(parsed)
+    values = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    result = pd.Series(values, index=series.index, name=series.name)
+    # Distinct values that could not be parsed, and the number of rows holding them
+    failed = np.asarray(parsed.isna())
+    n_unparseable = int(failed[codes[codes >= 0]].sum()) if failed.any() else 0
+    unparseable_values = [str(v) for v in uniques[failed][:N_UNPARSEABLE_SHOWN]]
+    report = DatetimeReport(fmt, n_rows, len(uniques), n_unparseable, unparseable_values, time.perf_counter() - start)
+    return result, report
+
+def merge_reports(reports: list):
+    """Sums the reports of the chunks of a column."""
+    if not reports:
+        return None
+    unparseable_values = []
+    for report in reports:
+        for value in report.unparseable_values:
+            if value not in unparseable_values and len(unparseable_values) < N_UNPARSEABLE_SHOWN:
+                unparseable_values.append(value)
+    return DatetimeReport(
+        format=reports[0].format,
+        n_rows=sum(report.n_rows for report in reports),
+        n_unique=max(report.n_unique or 0 for report in reports),
+        n_unparseable=sum(report.n_unparseable for report in reports),
+        unparseable_values=unparseable_values,
+        seconds=sum(report.seconds for report in reports),
+    )
+
+def describe_report(column: str, report: DatetimeReport) -> str:
+    """One line summary of a conversion, shown to the user."""
+    if report.format is None and report.n_unique is None:
+        return f'{column} is already a datetime column.'
+    throughput = report.n_rows / max(report.seconds, 1e-9)
+    fmt = f'`{report.format}`' if report.format else 'inferred by pandas'
+    text = (
+        f'{column}: {report.n_rows:,} rows ({report.n_unique:,} distinct values) parsed with format {fmt} '
+        f'in {report.seconds:,.2f} s - {throughput:,.0f} rows/s.'
+    )
+    if report.n_unparseable:
+        text += f' {report.n_unparseable:,} rows could not be parsed and are set to NaT, e.g.: {", ".join(report.unparseable_values)}'
+    return text
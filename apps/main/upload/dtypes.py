@@ -0,0 +1,74 @@
+"""
+Import-time data type optimisation.
+
+- Repetitive string columns (order ids, SKU codes, ...) are dictionary encoded as categoricals.
+- Integer columns, and float columns holding whole numbers only, are downcast to the smallest integer type.
+- Remaining string columns can optionally be stored as Arrow-backed strings.
+"""
+
+import numpy as np
+import pandas as pd
+
+MAX_UNIQUE_RATIO = 0.5  # Encode string columns with less than 50% unique values
+MAX_EXACT_FLOAT_INT = 2**53  # Floats are exact integers below this magnitude only
+
+
+def memory_usage(dataframe: pd.DataFrame) -> int:
+    """Returns the dataframe memory footprint in bytes, index and string contents included."""
+    return int(dataframe.memory_usage(deep=True, index=True).sum())
+
+def is_string_column(series: pd.Series) -> bool:
+    if isinstance(series.dtype, pd.StringDtype):
+        return True
+    return series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'string'
+
+def downcast_numeric(series: pd.Series) -> pd.Series:
+    """Downcasts integer columns, and float columns with whole numbers only, to the smallest integer type.
+    Floats with decimals or missing values are left untouched to avoid losing precision on sums,
+    as are floats whose magnitude reaches 2**53: they are not exact integers anymore and may not fit in int64."""
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series):
+        values = series.to_numpy()
+        if series.hasnans or not np.isfinite(values).all() or not (values == values.round()).all():
+            return series
+        if len(values) and np.abs(values).max() >= MAX_EXACT_FLOAT_INT:
+            return series
+        return pd.to_numeric(series.astype('int64'), downcast='integer')
+    return series
+
+def encode_strings(series: pd.Series, max_unique_ratio: float = MAX_UNIQUE_RATIO, arrow_strings: bool = False) -> pd.Series:
+    """Dictionary encodes a repetitive string column. 
+    High cardinality columns become Arrow-backed strings if arrow_strings is set."""
+    n_rows = series.shape[0]
+    if n_rows == 0:
+        return series
+    if series.nunique(dropna=True) / n_rows <= max_unique_ratio:
+        return series.astype('category')
+    if arrow_strings:
+        return series.astype('string[pyarrow]')
+    return series
+
+def optimise_series(series: pd.Series, max_unique_ratio: float = MAX_UNIQUE_RATIO, arrow_strings: bool = False) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(series):
+        return downcast_numeric(series)
+    if is_string_column(series):
+        return encode_strings(series, max_unique_ratio, arrow_strings)
+    return series
+
+def optimise_dtypes(dataframe: pd.DataFrame, max_unique_ratio: float = MAX_UNIQUE_RATIO, arrow_strings: bool = False) -> pd.DataFrame:
+    """Returns a copy of the dataframe with compact data types, see module description.
+
+    Untouched columns are shared with the original dataframe, not copied.
+
+    Args:
+        dataframe (pd.DataFrame): Freshly imported dataframe.
+        max_unique_ratio (float): String columns with a lower unique values / rows ratio become categoricals.
+        arrow_strings (bool): Store the remaining string columns as Arrow-backed strings.
+    """
+    optimised = dataframe.copy(deep=False)
+    for i in range(dataframe.shape[1]):
+        optimised.isetitem(i, optimise_series(dataframe.iloc[:, i], max_unique_ratio, arrow_strings))
+    return optimised
@@ -0,0 +1,123 @@
+"""
+Parallel excel import.
+
+The selected sheets of a workbook are parsed concurrently, one worker process per sheet,
+with the fastest installed engine (calamine, then openpyxl or xlrd), and stacked in a single concatenation.
+Workers read the workbook from disk: uploaded buffers are written once to a temporary file.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+
+import pandas as pd
+
+AUTO_ENGINE = 'Auto'
+# Excel engine: (python module, supported extensions)
+ENGINES = {
+    'calamine': ('python_calamine', ('.xlsx', '.xls', '.xlsm', '.xlsb', '.ods')),  # Rust-backed, fastest
+    'openpyxl': ('openpyxl', ('.xlsx', '.xlsm')),  # Pure Python, opened in read-only streaming mode by pandas
+    'xlrd': ('xlrd', ('.xls',)),
+}
+
+
+def _pandas_supports_calamine():
+    major, minor = (int(x) for x in pd.__version__.split('.')[:2])
+    return (major, minor) >= (2, 2)
+
+def available_engines(file_name: str):
+    """Returns the installed engines able to read file_name, fastest first."""
+    engines = []
+    for engine, (module, extensions) in ENGINES.items():
+        if engine == 'calamine' and not _pandas_supports_calamine():
+            continue
+        if file_name.lower().endswith(extensions) and find_spec(module) is not None:
+            engines.append(engine)
+    return engines
+
+def select_engine(file_name: str, size: int, min_bytes: int, choice: str = AUTO_ENGINE):
+    """Resolves the engine used to read an excel file.
+
+    Auto picks the fastest installed engine for files above min_bytes, 
+    and openpyxl (pandas default, most faithful cell types) for smaller .xlsx files.
+
+    Returns:
+        str: Engine name, None to let pandas decide.
+    """
+    engines = available_engines(file_name)
+    if choice != AUTO_ENGINE:
+        return choice
+    if not engines:
+        return None
+    if size is not None and size < min_bytes and 'openpyxl' in engines:
+        return 'openpyxl'
+    return engines[0]
+
+
+def parse_sheet(path: str, sheet_name: str, **kwargs):
+    """Parses a single excel sheet. Meant to run inside a worker process.
+
+    Returns:
+        tuple: (sheet_name, dataframe, elapsed seconds)
+    """
+    start = time.perf_counter()
+    df = pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+    return sheet_name, df, time.perf_counter() - start
+
+def _parse_sheets_from_path(path: str, sheet_names: list, max_workers: int, **kwargs):
+    n_workers = min(len(sheet_names), max_workers)
+    if n_workers <= 1:
+        return [parse_sheet(path, sheet_name, **kwargs) for sheet_name in sheet_names]
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(parse_sheet, path, sheet_name, **kwargs) for sheet_name in sheet_names]
+        return [future.result() for future in futures]
+
+def parse_sheets(_file, sheet_names: list, max_workers: int = 1, file_name: str = None, **kwargs):
+    """Parses the selected sheets of an excel file concurrently, one worker process per sheet.
+
+    Workers read the workbook from disk, so uploaded buffers are written to a temporary file first.
+    Results are returned in the same order as sheet_names.
+
+    Args:
+        _file: Path to the excel file, file opened from disk or uploaded file / binary buffer.
+        sheet_names (list): Sheets to parse.
+        max_workers (int): Maximum number of worker processes.
+        file_name (str, optional): Name of the uploaded file, its extension is kept on the temporary file.
+        **kwargs: pd.read_excel parameters.
+
+    Returns:
+        list: (sheet_name, dataframe, elapsed seconds) tuples.
+    """
+    if isinstance(_file, (str, os.PathLike)):
+        return _parse_sheets_from_path(_file, sheet_names, max_workers, **kwargs)
+    if isinstance(_file, io.BufferedReader):
+        # File opened from disk, workers can read it directly
+        return _parse_sheets_from_path(_file.name, sheet_names, max_workers, **kwargs)
+
+    # Engines and pandas format detection rely on the extension (.xls, .xlsb, .ods, ...)
+    suffix = os.path.splitext(file_name or getattr(_file, 'name', ''))[1] or '.xlsx'
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f'workbook{suffix}')
+        with open(path, 'wb') as f:
+            _file.seek(0)
+            # Copied by blocks, the workbook is not held twice in memory
+            shutil.copyfileobj(_file, f)
+        return _parse_sheets_from_path(path, sheet_names, max_workers, **kwargs)
+
+def concat_sheets(results: list):
+    """Stacks the parsed sheets in a single concatenation.
+
+    Returns:
+        pd.DataFrame, pd.DataFrame: Stacked dataframe and per-sheet timing table.
+    """
+    df = pd.concat([sheet_df for _, sheet_df, _ in results], ignore_index=True)
+    timing = pd.DataFrame(
+        [(sheet_name, sheet_df.shape[0], round(elapsed, 2)) for sheet_name, sheet_df, elapsed in results],
+        columns=['Sheet', 'N. Rows', 'Seconds'],
+    )
+    return df, timing
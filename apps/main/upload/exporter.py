@@ -0,0 +1,119 @@
+"""
+Chunked dataframe export.
+
+Dataframes are written chunk by chunk of rows to an in-memory file: the whole csv text is never built
+as a single string next to it. Download buttons need the file as bytes, so the peak memory of an export is
+about twice the exported file (the file and its bytes, while handing them over), plus one chunk of rows.
+Nothing is kept between downloads: the file is written when the download button is clicked (deferred download)
+and dropped once sent.
+"""
+
+import gzip
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from packaging.version import Version
+
+from .settings import (
+    CSV_FORMAT, CSV_GZIP_FORMAT, PARQUET_FORMAT, FEATHER_FORMAT,
+    EXPORT_CHUNK_ROWS,
+)
+
+CSV_OPTIONS = {'sep': '|', 'decimal': ','}
+# Deferred downloads (callable data) need streamlit 1.52 or later
+DEFERRED_DOWNLOADS = Version(st.__version__) >= Version('1.52.0')
+
+
+def _chunks(dataframe: pd.DataFrame, chunk_rows: int):
+    for start in range(0, max(dataframe.shape[0], 1), chunk_rows):
+        yield start, dataframe.iloc[start:start + chunk_rows]
+
+def write_csv(dataframe: pd.DataFrame, file, index: bool = False, chunk_rows: int = EXPORT_CHUNK_ROWS, **csv_options):
+    """Writes the dataframe as utf-8 csv to a binary file, one chunk of rows at a time."""
+    options = {**CSV_OPTIONS, **csv_options}
+    for start, chunk in _chunks(dataframe, chunk_rows):
+        text = chunk.to_csv(index=index, header=start == 0, **options)
+        file.write(text.encode('utf-8'))
+
+def _preserve_index(dataframe: pd.DataFrame) -> bool:
+    # A default index (unnamed 0, 1, 2, ...) is rebuilt on read, any other index is stored as a column
+    index = dataframe.index
+    is_default = (
+        isinstance(index, pd.RangeIndex) and index.name is None 
+        and index.start == 0 and index.step == 1
+    )
+    return not is_default
+
+def _arrow_batches(dataframe: pd.DataFrame, chunk_rows: int):
+    """Yields Arrow tables of chunk_rows rows, all cast to the schema of the whole dataframe
+    (a first chunk with only missing values would otherwise fix a null type).
+    Chunks are converted before the cast: from_pandas cannot look up non-string column names in a schema."""
+    preserve_index = _preserve_index(dataframe)
+    schema = pa.Schema.from_pandas(dataframe, preserve_index=preserve_index)
+    for _, chunk in _chunks(dataframe, chunk_rows):
+        yield pa.Table.from_pandas(chunk, preserve_index=preserve_index).cast(schema)
+
+def write_parquet(dataframe: pd.DataFrame, file, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Writes the dataframe as parquet, one row group per chunk of rows."""
+    writer = None
+    for table in _arrow_batches(dataframe, chunk_rows):
+        if writer is None:
+            writer = pq.ParquetWriter(file, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+def write_feather(dataframe: pd.DataFrame, file, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Writes the dataframe as lz4 compressed Feather V2 (Arrow IPC file), one record batch per chunk of rows."""
+    writer = None
+    options = pa.ipc.IpcWriteOptions(compression='lz4')
+    for table in _arrow_batches(dataframe, chunk_rows):
+        if writer is None:
+            writer = pa.ipc.new_file(file, table.schema, options=options)
+        writer.write_table(table)
+    writer.close()
+
+def export_dataframe(dataframe: pd.DataFrame, export_format: str, index: bool = False, **csv_options):
+    """Writes the dataframe in the export format to an in-memory file.
+
+    Args:
+        dataframe (pd.DataFrame): Dataframe to export.
+        export_format (str): One of EXPORT_FORMATS keys.
+        index (bool): Write the index to csv files. Columnar formats always keep a non default index.
+        **csv_options: pd.DataFrame.to_csv parameters, overriding CSV_OPTIONS.
+
+    Returns:
+        io.BytesIO: Exported file, rewound.
+    """
+    buffer = io.BytesIO()
+    if export_format == CSV_FORMAT:
+        write_csv(dataframe, buffer, index=index, **csv_options)
+    elif export_format == CSV_GZIP_FORMAT:
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6) as compressed:
+            write_csv(dataframe, compressed, index=index, **csv_options)
+    elif export_format == PARQUET_FORMAT:
+        write_parquet(dataframe, buffer)
+    elif export_format == FEATHER_FORMAT:
+        write_feather(dataframe, buffer)
+    else:
+        raise ValueError(f'Unknown export format: {export_format}')
+    buffer.seek(0)
+    return buffer
+
+def export_to_bytes(dataframe: pd.DataFrame, export_format: str, index: bool = False, **csv_options) -> bytes:
+    """The exported file as bytes. Peak memory: about twice the exported file, see module description."""
+    with export_dataframe(dataframe, export_format, index=index, **csv_options) as buffer:
+        return buffer.getvalue()
+
+def download_data(dataframe: pd.DataFrame, export_format: str, index: bool = False, **csv_options):
+    """Data for st.download_button.
+
+    Returns:
+        callable | bytes: A callable exporting the dataframe when the button is clicked,
+                          or the exported bytes on streamlit versions without deferred downloads.
+    """
+    if DEFERRED_DOWNLOADS:
+        return lambda: export_to_bytes(dataframe, export_format, index=index, **csv_options)
+    return export_to_bytes(dataframe, export_format, index=index, **csv_options)
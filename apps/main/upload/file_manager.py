@@ -1,10 +1,33 @@
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, ExitStack
+from importlib.util import find_spec
+from io import BufferedReader
 from random import random
 from typing import NamedTuple
 
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from .settings import *
+from . import excel_reader
+from . import cache
+from . import dtypes
+from . import sniffer
+from . import column_profile
+from . import datetime_parser
+from . import index_info
+
+# File stored on the server disk, used in place of an in-memory upload
+LocalFile = namedtuple('LocalFile', ['name', 'path', 'size'])
 
 def data_storage_initialize() -> None:
     """
@@ -33,6 +56,50 @@ def data_storage_initialize() -> None:
     if IMPORT_PARAMS not in st.session_state:
         st.session_state[IMPORT_PARAMS] = dict()
 
+    if MEMORY_USAGE not in st.session_state:
+        # Dataframe memory before / after data type optimisation
+        st.session_state[MEMORY_USAGE] = dict()
+
+    if PROFILE not in st.session_state:
+        # Column profile of each dataframe, computed at import
+        st.session_state[PROFILE] = dict()
+
+    if PIPELINE not in st.session_state:
+        # Preprocessing steps recorded for each dataframe
+        st.session_state[PIPELINE] = dict()
+
+    if HISTORY not in st.session_state:
+        # Previous versions of the preprocessed dataframes, for undo
+        st.session_state[HISTORY] = dict()
+
+    if KEY_DICTIONARY not in st.session_state:
+        # Shared dictionary (CategoricalDtype) of each key, e.g. SKU or order ids
+        st.session_state[KEY_DICTIONARY] = dict()
+
+    if INDEX_INFO not in st.session_state:
+        # Index metadata (sorted, unique, range) of each dataframe, with the index it describes
+        st.session_state[INDEX_INFO] = dict()
+
+    if DATAFRAME_VERSION not in st.session_state:
+        # Incremented whenever a dataframe is stored or changed in place, to invalidate what was derived from it
+        st.session_state[DATAFRAME_VERSION] = dict()
+
+    if JOIN_INDEX_CACHE not in st.session_state:
+        # Hash indexes on join keys, per (dataframe, key columns)
+        st.session_state[JOIN_INDEX_CACHE] = dict()
+
+    if MERGE_RESULTS not in st.session_state:
+        # Merged dataframes with the row positions of their join
+        st.session_state[MERGE_RESULTS] = dict()
+
+    if FILE_DIGEST not in st.session_state:
+        # Content digest of uploaded files, used as import cache key
+        st.session_state[FILE_DIGEST] = dict()
+
+    if UPLOADER_KEY not in st.session_state:
+        # Changing the file uploader key empties the widget and frees its buffers
+        st.session_state[UPLOADER_KEY] = 0
+
 def session_uploaded_keys():
     return st.session_state[UPLOADED].keys()
 
@@ -45,14 +112,50 @@ def session_dataframe_items():
 def session_dataframe_keys():
     return st.session_state[DATAFRAME].keys()
 
-def get_uploaded_file(file_name: str):
+@contextmanager
+def open_uploaded_file(file_name: str):
+    """Yields the uploaded file buffer, to use in a with statement. 
+    Files released to disk (see release_uploaded_file) are opened from there and closed on exit,
+    in-memory uploads stay open. A file no longer on disk is reported and dropped, and the run stops."""
     file = st.session_state[UPLOADED].get(file_name)
-    return file
+    if not isinstance(file, LocalFile):
+        yield file
+        return
+    try:
+        local_file = open(file.path, 'rb')
+    except FileNotFoundError:
+        st.session_state[UPLOADED].pop(file_name, None)
+        st.error(f'{file_name} is no longer on disk: please upload it again.')
+        st.stop()
+    with local_file:
+        _touch_spilled_file(file.path)
+        yield local_file
+
+def is_local_file(_file):
+    """True for files opened from the server disk, as opposed to in-memory uploads."""
+    return isinstance(_file, BufferedReader)
 
 def get_dataframe(df_name: str):
     df = st.session_state[DATAFRAME].get(df_name)
     return df
 
+def get_memory_usage(df_name: str):
+    return st.session_state[MEMORY_USAGE].get(df_name)
+
+def get_profile(df_name: str):
+    return st.session_state[PROFILE].get(df_name)
+
+def get_index_info(df_name: str, dataframe: pd.DataFrame = None):
+    """Returns the index metadata of a dataframe, computed once per index.
+    The stored metadata is reused as long as the dataframe keeps the index it was computed on."""
+    if dataframe is None:
+        dataframe = get_dataframe(df_name)
+    entry = st.session_state[INDEX_INFO].get(df_name)
+    if entry is None or entry[0] is not dataframe.index:
+        entry = (dataframe.index, index_info.describe_index(dataframe.index))
+        st.session_state[INDEX_INFO][df_name] = entry
+    return entry[1]
+
 def save_files_to_session_state(uploaded_files: list):
     """Save uploaded files to session state.
 
@@ -63,8 +166,120 @@ def save_files_to_session_state(uploaded_files: list):
         st.session_state[UPLOADED][uploaded_file.name] = uploaded_file
 
 
+def _touch_spilled_file(path: str):
+    # Spilled files are removed SPILL_MAX_AGE after their last use, not after they were written
+    if os.path.dirname(path) != SPILL_DIR:
+        return
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _held_local_paths() -> set:
+    """Paths of the files on disk registered in this session (released uploads, merge results, server files)."""
+    return {file.path for file in st.session_state[UPLOADED].values() if isinstance(file, LocalFile)}
+
+def _remove_old_spilled_files(max_age: int = SPILL_MAX_AGE, keep: set = frozenset()):
+    if not os.path.isdir(SPILL_DIR):
+        return
+    now = time.time()
+    for entry in os.scandir(SPILL_DIR):
+        if entry.path in keep:
+            continue
+        try:
+            if now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def new_spill_path(file_name: str):
+    """Returns a new path in SPILL_DIR for a file written by the app. 
+    Spilled files unused for SPILL_MAX_AGE are removed, except the ones this session still holds."""
+    _remove_old_spilled_files(keep=_held_local_paths())
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    return os.path.join(SPILL_DIR, f'{uuid.uuid4().hex}_{os.path.basename(file_name)}')
+
+def save_spilled_file_to_session_state(file_name: str, path: str):
+    """Registers a file written to SPILL_DIR (e.g. a merge result too large for memory) as an uploaded file,
+    so it can be imported like any other file, e.g. only some of its columns."""
+    st.session_state[UPLOADED][file_name] = LocalFile(file_name, path, os.path.getsize(path))
+
+def release_uploaded_file(file_name: str):
+    """Drops the in-memory copies of an uploaded file once its dataframe has been built.
+
+    The raw bytes are spilled to a temporary file, so the file can still be re-imported 
+    (e.g. with other parameters), the cached pd.ExcelFile is dropped and the file uploader 
+    widget is reset, which lets Streamlit free its own copy of the upload.
+    """
+    uploaded_file = st.session_state[UPLOADED].get(file_name)
+    st.session_state[XL_FILE].pop(file_name, None)
+    if uploaded_file is None or isinstance(uploaded_file, LocalFile):
+        return
+    path = new_spill_path(file_name)
+    uploaded_file.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(uploaded_file, f)
+    # Carry over the content digest, no need to hash the file again
+    digest = st.session_state[FILE_DIGEST].get(_digest_id(file_name, uploaded_file))
+    if digest is not None:
+        st.session_state[FILE_DIGEST][(file_name, path, None)] = digest
+    st.session_state[UPLOADED][file_name] = LocalFile(file_name, path, os.path.getsize(path))
+    st.session_state[UPLOADER_KEY] += 1
+
+def is_supported_file(file_name: str):
+    if not is_compression_available(file_name):
+        return False
+    return is_csv_file(file_name) or is_excel_file(file_name) or is_columnar_file(file_name)
+
+def supported_compressions():
+    """Returns the compression extensions (without dot) readable in this environment."""
+    return [ext[1:] for ext, (_, module) in COMPRESSION_EXTENSIONS.items() if find_spec(module) is not None]
+
+def is_allowed_server_path(path: str):
+    """Only files inside the configured DATA_DIRS can be loaded from the server."""
+    real_path = os.path.realpath(path)
+    for data_dir in DATA_DIRS:
+        root = os.path.join(os.path.realpath(data_dir), '')
+        if real_path.startswith(root):
+            return True
+    return False
+
+def list_server_files(directory: str):
+    """Lists the supported files of a server directory, most recent first.
+
+    Returns:
+        list: LocalFile tuples.
+    """
+    if not os.path.isdir(directory):
+        return []
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and is_supported_file(entry.name) and is_allowed_server_path(entry.path):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, LocalFile(entry.name, entry.path, stat.st_size)))
+    entries.sort(key=lambda x: x[0], reverse=True)
+    return [local_file for _, local_file in entries]
+
+def save_local_files_to_session_state(local_files: list):
+    """Registers server files as uploaded files: they go through the same import steps, 
+    but are read straight from disk."""
+    for local_file in local_files:
+        if is_allowed_server_path(local_file.path):
+            st.session_state[UPLOADED][local_file.name] = local_file
+
+def get_dataframe_version(df_name: str) -> int:
+    return st.session_state[DATAFRAME_VERSION].get(df_name, 0)
+
+def bump_dataframe_version(df_name: str):
+    """Marks a dataframe as changed: caches derived from a previous version (e.g. join indexes) are not reused."""
+    st.session_state[DATAFRAME_VERSION][df_name] = get_dataframe_version(df_name) + 1
+
 def save_dataframe_to_session_state(id:str, dataframe: pd.DataFrame):
     st.session_state[DATAFRAME][id] = dataframe
+    bump_dataframe_version(id)
+
+def save_profile_to_session_state(id: str, profile: pd.DataFrame):
+    st.session_state[PROFILE][id] = profile
 
 def are_there_uploaded_files():
     _return = False
@@ -78,15 +293,115 @@ def are_there_dataframes():
         _return = True
     return _return
 
+def _digest_id(file_name: str, _file):
+    # Uploaded files with the same name are told apart by their id, local files by their path
+    file_id = getattr(_file, 'file_id', None) or getattr(_file, 'name', None)
+    return (file_name, file_id, getattr(_file, 'size', None))
+
+def get_file_digest(file_name: str, _file):
+    digest_id = _digest_id(file_name, _file)
+    digests = st.session_state[FILE_DIGEST]
+    if digest_id not in digests:
+        if is_local_file(_file):
+            # Server files are not hashed, path, size and modification time identify them
+            digests[digest_id] = cache.stat_digest(_file.name)
+        else:
+            digests[digest_id] = cache.file_digest(_file)
+    return digests[digest_id]
+
+def read_with_cache(file_name: str, _file, params: dict, parse):
+    """Returns the parsed dataframe from the import cache, 
+    calling parse() and caching its result on a miss.
+
+    The cache key is the file content digest plus the import parameters,
+    so the same file imported with other parameters is parsed again.
+    """
+    digest = get_file_digest(file_name, _file)
+    key = cache.cache_key(digest, params, ignore=(CHUNK_SIZE, 'low_memory'))
+    df = cache.load(key)
+    if df is not None:
+        st.caption(f'{file_name} loaded from import cache.')
+        return df
+    df = parse()
+    cache.store(key, df)
+    return df
+
 def read_to_dataframe(file_name, filepath_or_buffer, **kwargs):
     func = select_read_function(file_name)
     return func(filepath_or_buffer, **kwargs)
 
+def split_compression(file_name: str):
+    """Splits the compression extension from a file name.
+
+    Returns:
+        tuple: (file name without compression extension, pandas compression or None).
+    """
+    root, extension = os.path.splitext(file_name)
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        compression, _ = COMPRESSION_EXTENSIONS[extension.lower()]
+        return root, compression
+    return file_name, None
+
+def get_compression(file_name: str):
+    return split_compression(file_name)[1]
+
+def is_compression_available(file_name: str):
+    """Built-in compressions are always available, zstd needs the zstandard package."""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in COMPRESSION_EXTENSIONS:
+        return True
+    _, module = COMPRESSION_EXTENSIONS[extension]
+    return find_spec(module) is not None
+
+def is_csv_file(file_name: str):
+    # Compressed files are supported for csv only, a bare .zip archive is expected to hold a csv file
+    root, compression = split_compression(file_name)
+    if compression == 'zip' and not os.path.splitext(root)[1]:
+        return True
+    return root.lower().endswith(CSV_EXTENSIONS)
+
+def archive_error(file_name: str):
+    """Returns why a compressed file cannot be imported, None if it can or is not compressed.
+    Compressed files must hold a single csv file, named after it (e.g. orders.csv.gz): 
+    the content of a zip archive is checked from its list of files."""
+    root, compression = split_compression(file_name)
+    if compression is None:
+        return None
+    inner_name = root
+    if compression == 'zip':
+        with open_uploaded_file(file_name) as _file:
+            try:
+                members = zipfile.ZipFile(_file).namelist()
+            except zipfile.BadZipFile:
+                return f'{file_name} is not a valid zip archive.'
+            finally:
+                _file.seek(0)
+        if len(members) != 1:
+            return f'{file_name} holds {len(members)} files: a zip archive must hold a single csv file.'
+        inner_name = members[0]
+    extension = os.path.splitext(inner_name)[1].lower()
+    if not extension:
+        compression_extension = os.path.splitext(file_name)[1]
+        return f'{file_name}: unknown compressed file type. If it is a csv file, name it {root}.csv{compression_extension}.'
+    if extension not in CSV_EXTENSIONS:
+        return f'{file_name}: compressed {extension} files are not supported, only compressed csv files.'
+    return None
+
+def is_excel_file(file_name: str):
+    return file_name.lower().endswith(EXCEL_EXTENSIONS)
+
+def is_columnar_file(file_name: str):
+    return file_name.lower().endswith(PARQUET_EXTENSIONS + FEATHER_EXTENSIONS)
+
 def select_read_function(file_name):
-    if file_name.lower().endswith('.xlsx'):
+    if file_name.lower().endswith(EXCEL_EXTENSIONS):
         return pd.read_excel
-    elif file_name.lower().endswith('.csv'):
+    elif is_csv_file(file_name):
         return pd.read_csv
+    elif file_name.lower().endswith(PARQUET_EXTENSIONS):
+        return pd.read_parquet
+    elif file_name.lower().endswith(FEATHER_EXTENSIONS):
+        return pd.read_feather
 
 def select_dataframe(label = 'Please select dataframe to manipulate'):
     file_list = session_dataframe_keys()
@@ -98,6 +413,8 @@ def display_dataframe(
                 dataframe: pd.DataFrame,
                 file_name: str,
                 container: NamedTuple, 
+                memory: tuple = None,
+                profile: pd.DataFrame = None,
             ):
     # Display dataframe
     n_rows, n_cols = dataframe.shape
@@ -105,55 +422,576 @@ def display_dataframe(
     ##### {file_name} - Preview
     N. Rows: {n_rows} - N. Columns: {n_cols}
     """
+    if memory is not None:
+        before, after = memory
+        text += f"""
+    Memory: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB after data type optimisation
+    """
     container.name.info(text)
-    container.location.dataframe(dataframe.iloc[:N_ROWS])
+    if profile is None:
+        container.location.dataframe(dataframe.iloc[:N_ROWS])
+        return
+    with container.location.container():
+        preview_tab, profile_tab = st.tabs(['Preview', 'Column Profile'])
+        preview_tab.dataframe(dataframe.iloc[:N_ROWS])
+        profile_tab.caption('Computed at import. Distinct counts above 1,024 values are estimates.')
+        profile_tab.dataframe(profile, hide_index=True)
+
+def select_columns_to_import(file_name: str, columns: list):
+    """Lets the user pick the columns to import, read from the file header.
+
+    Returns:
+        list: Positions of the selected columns, to be used as usecols. 
+              None if all columns are selected.
+    """
+    _help = """
+    Only the selected columns are parsed and kept in memory.
+    Leave out the columns not needed for the analysis to speed up the import.
+    """
+    selected = st.multiselect(
+                        label='Select Column(s) To Import:', 
+                        options=columns, 
+                        default=columns, 
+                        help=_help,
+                        key=f'{file_name}_usecols')
+    if not selected or len(selected) == len(columns):
+        return None
+    st.caption(f'{len(selected)} of {len(columns)} columns will be imported.')
+    selected = set(selected)
+    return [i for i, col in enumerate(columns) if col in selected]
+
+def sniff_csv_file(file_name: str, _file):
+    """Returns the csv dialect (encoding, separator, decimal mark and datetime formats) 
+    sniffed from the first bytes of the file. Cached by file digest."""
+    digest = get_file_digest(file_name, _file)
+    key = cache.cache_key(digest, {'metadata': 'csv_dialect', 'n_bytes': sniffer.SNIFF_BYTES})
+    dialect = cache.load_json(key)
+    if dialect is None:
+        dialect = sniffer.sniff_csv(sniffer.read_sample(_file, compression=get_compression(file_name)))
+        cache.store_json(key, dialect)
+    return dialect
+
+def read_csv_header(_file, sep: str, encoding: str = None, compression: str = None):
+    """Returns the column names of a csv file, reading its header only."""
+    _file.seek(0)
+    try:
+        columns = list(pd.read_csv(_file, sep=sep, encoding=encoding, compression=compression, nrows=0).columns)
+    except (ValueError, UnicodeDecodeError, EOFError, OSError, pd.errors.ParserError):
+        columns = []
+    _file.seek(0)
+    return columns
+
+def select_datetime_columns(file_name: str, columns: list, datetime_formats: dict):
+    """Lets the user pick the columns to parse as datetime at import, 
+    pre-selecting the ones with a sniffed format.
+
+    Returns:
+        dict: {column: strftime format} of the selected columns.
+    """
+    _help = """
+    Selected columns are converted to datetime while reading the file, 
+    with the format detected from the first rows. Each distinct timestamp is parsed only once.
+    """
+    detected = [col for col in columns if col in datetime_formats]
+    selected = st.multiselect(
+                        label='Parse As Datetime:', 
+                        options=detected, 
+                        default=detected, 
+                        help=_help,
+                        key=f'{file_name}_parse_dates')
+    if selected:
+        st.caption(', '.join(f'{col}: `{datetime_formats[col]}`' for col in selected))
+    return {col: datetime_formats[col] for col in selected}
 
 def prepare_csv_file(file_name: str):
     st.markdown('##### Set Parameters:')
+    compression = get_compression(file_name)
+    if compression is not None:
+        st.caption(f'{compression} compressed file, decompressed on the fly while reading.')
+    with open_uploaded_file(file_name) as _file:
+        dialect = sniff_csv_file(file_name, _file)
     # CSV Separator 
+    _help = """
+    Detected from the first rows of the file. Use \\t for tabs."""
     sep = st.text_input(
         label='CSV Column Separator:',
-        value=';',
+        value=dialect['sep'].replace('\t', '\\t'),
         max_chars=3,
         placeholder='E.g.: |',
+        help=_help,
         key=f'{file_name}_sep',
     )
+    sep = sep.replace('\\t', '\t')
     # Decimal Point 
     _help = """
-    Character to recognize as decimal point (e.g. use ‘,’ for European data)."""
+    Character to recognize as decimal point (e.g. use ‘,’ for European data).
+    Detected from the first rows of the file."""
     dec = st.text_input(
         label='Decimal Point:',
-        value=',',
+        value=dialect['decimal'],
         max_chars=1,
         placeholder='E.g.: .',
         help=_help,
         key=f'{file_name}_dec',
     )
+    # Encoding
+    _help = """
+    Text encoding of the file (e.g. utf-8, cp1252, latin-1). Detected from the first bytes of the file."""
+    encoding = st.text_input(
+        label='Encoding:',
+        value=dialect['encoding'],
+        placeholder='E.g.: utf-8',
+        help=_help,
+        key=f'{file_name}_encoding',
+    )
+    # Streaming
+    _help = """
+    Read the file in chunks of rows instead of all at once. 
+    Recommended for large files: memory usage stays bounded and the progress is reported while reading.
+    """
+    streaming = st.checkbox(
+        label='Stream File In Chunks',
+        value=True,
+        help=_help,
+        key=f'{file_name}_streaming',
+    )
+    chunksize = st.number_input(
+        label='Rows Per Chunk:',
+        min_value=10_000,
+        value=DEFAULT_CHUNK_SIZE,
+        step=50_000,
+        disabled=not streaming,
+        key=f'{file_name}_chunksize',
+    )
+    # Column projection
+    with open_uploaded_file(file_name) as _file:
+        columns = read_csv_header(_file, sep, encoding or None, compression)
+    usecols = select_columns_to_import(file_name, columns)
+    # Datetime columns
+    imported = columns if usecols is None else [columns[i] for i in usecols]
+    date_formats = select_datetime_columns(file_name, imported, dialect['datetime_formats'])
     params = {}
     params['sep'] = sep
     params['decimal'] = dec
     params['low_memory'] = False
+    if encoding:
+        params['encoding'] = encoding
+    if compression is not None:
+        params['compression'] = compression
+    if usecols is not None:
+        params['usecols'] = usecols
+    if date_formats:
+        params[DATETIME_FORMATS] = date_formats
+    if streaming:
+        params[CHUNK_SIZE] = int(chunksize)
     st.session_state[IMPORT_PARAMS][file_name] = params
     st.markdown('---')
 
+def _buffer_size(filepath_or_buffer) -> int:
+    """Returns the size in bytes of an uploaded file or buffer."""
+    size = getattr(filepath_or_buffer, 'size', None)
+    if size is None:
+        position = filepath_or_buffer.tell()
+        size = filepath_or_buffer.seek(0, 2)
+        filepath_or_buffer.seek(position)
+    return size
+
+def split_datetime_params(params: dict):
+    """Separates the datetime formats from the pd.read_csv parameters. 
+    Datetime columns are read as text, then converted by datetime_parser.
+
+    Returns:
+        tuple: (pd.read_csv parameters, {column: strftime format}).
+    """
+    params = dict(params)
+    date_formats = params.pop(DATETIME_FORMATS, None) or dict()
+    if date_formats:
+        params['dtype'] = {**params.get('dtype', dict()), **{col: str for col in date_formats}}
+    return params, date_formats
+
+def convert_datetime_columns(dataframe: pd.DataFrame, date_formats: dict, reports: dict = None):
+    """Converts the columns to datetime in place, with their locked format.
+
+    Args:
+        reports (dict, optional): {column: [DatetimeReport, ...]}, appended with the report of each conversion.
+    """
+    for col, fmt in date_formats.items():
+        if col not in dataframe.columns:
+            continue
+        dataframe[col], report = datetime_parser.parse_datetime(dataframe[col], format=fmt)
+        if reports is not None:
+            reports.setdefault(col, []).append(report)
+    return dataframe
+
+def _assemble_columns(columns: list, pieces: list) -> pd.DataFrame:
+    """Concatenates the pieces of each column, releasing them as soon as the column is assembled.
+    Peak memory is the dataframe plus one column, instead of all the chunks plus the dataframe."""
+    assembled = dict()
+    for i in range(len(columns)):
+        assembled[i] = pd.concat(pieces[i], ignore_index=True)
+        pieces[i] = None
+    # Columns are set by position: duplicated column names (imported by position) are kept
+    df = pd.DataFrame(assembled, copy=False)
+    df.columns = columns
+    return df
+
+def _mixed_type_columns(pieces: list) -> list:
+    """Positions of the columns parsed as text in some chunks and as another type (e.g. int) in others.
+    The parser infers the type of each chunk on its own, a whole file read gives a text column."""
+    mixed = []
+    for i, column_pieces in enumerate(pieces):
+        if len({piece.dtype for piece in column_pieces}) < 2:
+            continue
+        if any(dtypes.is_string_column(piece) for piece in column_pieces):
+            mixed.append(i)
+    return mixed
+
+def _read_columns_as_text(filepath_or_buffer, columns: list, positions: list, profile: dict = None, **kwargs) -> list:
+    """Reads the columns at the given positions again, as text, in chunks of rows.
+    Values keep their text as in the file (e.g. leading zeros), as a whole file read would.
+
+    Returns:
+        list: Pieces of each column, in the positions order.
+    """
+    usecols = kwargs.get('usecols')
+    # Imported columns are in the file order, whatever the order of usecols
+    file_positions = [sorted(usecols)[i] if usecols is not None else i for i in positions]
+    names = [columns[i] for i in positions]
+    params = dict(kwargs, usecols=file_positions, dtype={**kwargs.get('dtype', dict()), **{name: str for name in names}})
+    if profile is not None:
+        column_profile.reset_columns(profile, names)
+    pieces = [[] for _ in positions]
+    filepath_or_buffer.seek(0)
+    with pd.read_csv(filepath_or_buffer, **params) as reader:
+        for chunk in reader:
+            for i in range(chunk.shape[1]):
+                pieces[i].append(chunk.iloc[:, i].copy())
+            if profile is not None:
+                column_profile.update_profile(profile, chunk)
+    return pieces
+
+def read_csv_in_chunks(filepath_or_buffer, progress=None, profile: dict = None, transform=None, **kwargs):
+    """Reads a csv file in chunks of rows and assembles them into a single dataframe.
+
+    Each chunk is split into its columns as it is read (the parser stores same type columns in a single block,
+    which could not be released column by column), and the columns are assembled one at a time at the end
+    (see _assemble_columns): the whole text is never parsed in one go, and peak memory stays at the dataframe
+    plus one column and one chunk. Columns whose inferred type changes between chunks (e.g. numbers, then text)
+    are read again as text, as pd.read_csv would read them at once.
+
+    Args:
+        filepath_or_buffer: Uploaded file or any readable binary buffer.
+        progress (callable, optional): Called after each chunk as progress(n_rows, n_bytes, total_bytes).
+        profile (dict, optional): Column profile updated with each chunk, see column_profile.new_profile.
+        transform (callable, optional): Applied to each chunk as it is read, e.g. datetime conversion.
+        **kwargs: pd.read_csv parameters, 'chunksize' included.
+
+    Returns:
+        pd.DataFrame: The assembled dataframe.
+    """
+    total_bytes = _buffer_size(filepath_or_buffer)
+    columns = None
+    pieces = []
+    n_rows = 0
+    with pd.read_csv(filepath_or_buffer, **kwargs) as reader:
+        for chunk in reader:
+            if transform is not None:
+                chunk = transform(chunk)
+            if columns is None:
+                columns = chunk.columns
+                pieces = [[] for _ in range(chunk.shape[1])]
+            for i in range(chunk.shape[1]):
+                pieces[i].append(chunk.iloc[:, i].copy())
+            n_rows += chunk.shape[0]
+            if profile is not None:
+                column_profile.update_profile(profile, chunk)
+            if progress is not None:
+                n_bytes = min(filepath_or_buffer.tell(), total_bytes)
+                progress(n_rows, n_bytes, total_bytes)
+    if columns is None:
+        # Header only file
+        filepath_or_buffer.seek(0)
+        kwargs.pop(CHUNK_SIZE, None)
+        df = pd.read_csv(filepath_or_buffer, **kwargs)
+        return df if transform is None else transform(df)
+    # The last chunk is still referenced by the loop variable
+    del chunk
+    mixed = _mixed_type_columns(pieces)
+    if mixed:
+        for i in mixed:
+            pieces[i] = None
+        text_pieces = _read_columns_as_text(filepath_or_buffer, columns, mixed, profile, **kwargs)
+        for i, column_pieces in zip(mixed, text_pieces):
+            pieces[i] = column_pieces
+    return _assemble_columns(columns, pieces)
+
+def parse_csv_file(file_name: str, _file, params: dict, profile: dict = None):
+    _file.seek(0)
+    params, date_formats = split_datetime_params(params)
+    reports = dict()
+    if params.get(CHUNK_SIZE):
+        progress_bar = st.progress(0.0, text=f'Reading {file_name}...')
+
+        def progress(n_rows, n_bytes, total_bytes):
+            text = f'Reading {file_name}: {n_rows:,} rows - {n_bytes / 1e6:,.1f} / {total_bytes / 1e6:,.1f} MB'
+            progress_bar.progress(n_bytes / max(total_bytes, 1), text=text)
+
+        def transform(chunk):
+            return convert_datetime_columns(chunk, date_formats, reports)
+
+        df = read_csv_in_chunks(
+                    _file, 
+                    progress=progress, 
+                    profile=profile, 
+                    transform=transform if date_formats else None, 
+                    **params)
+        progress_bar.empty()
+    elif is_local_file(_file) and 'compression' not in params:
+        # Read straight from disk through a memory map
+        df = pd.read_csv(_file.name, memory_map=True, **params)
+    else:
+        df = pd.read_csv(_file, **params)
+    if date_formats and not params.get(CHUNK_SIZE):
+        convert_datetime_columns(df, date_formats, reports)
+    for col, col_reports in reports.items():
+        st.caption(datetime_parser.describe_report(col, datetime_parser.merge_reports(col_reports)))
+    return df
+
 def process_csv_file(file_name: str, _file):
     params = st.session_state[IMPORT_PARAMS].get(file_name)
-    df = pd.read_csv(_file, **params)
+    profile = column_profile.new_profile()
+    df = read_with_cache(file_name, _file, params, lambda: parse_csv_file(file_name, _file, params, profile))
+    if not profile:
+        # Loaded from the import cache or read at once: profile the whole dataframe
+        column_profile.update_profile(profile, df)
     save_dataframe_to_session_state(file_name, df)
+    save_profile_to_session_state(file_name, column_profile.finalize_profile(profile))
     return df
 
-@st.cache_data
-def dataframe_to_csv(dataframe: pd.DataFrame):
-    return dataframe.to_csv(sep='|', decimal=',', index=False).encode('utf-8')
+def export_file_name(file_name: str, export_format: str):
+    extension, _ = EXPORT_FORMATS[export_format]
+    return f'{file_name}.{extension}'
+
+def export_mime_type(export_format: str):
+    _, mime = EXPORT_FORMATS[export_format]
+    return mime
+
+def read_columnar_schema(file_name: str, _file):
+    """Reads the schema of a parquet / feather file without loading its data.
+
+    Returns:
+        pd.DataFrame: One row per column, with its Arrow data type.
+    """
+    _file.seek(0)
+    if file_name.lower().endswith(PARQUET_EXTENSIONS):
+        schema = pq.read_schema(_file)
+    else:
+        schema = pa.ipc.open_file(_file).schema
+    _file.seek(0)
+    schema_df = pd.DataFrame({
+        'Column': schema.names,
+        'Data Type': [str(t) for t in schema.types],
+    })
+    return schema_df
+
+def prepare_columnar_file(file_name: str):
+    st.markdown('##### File Schema:')
+    st.caption('Columnar files keep their data types and index, no parameter needs setting.')
+    with open_uploaded_file(file_name) as _file:
+        schema_df = read_columnar_schema(file_name, _file)
+    st.dataframe(schema_df, hide_index=True)
+    st.session_state[IMPORT_PARAMS][file_name] = dict()
+    st.markdown('---')
+
+def process_columnar_file(file_name: str, _file):
+    params = st.session_state[IMPORT_PARAMS].get(file_name)
+    _file.seek(0)
+    if is_local_file(_file):
+        # Let Arrow memory map the file instead of reading it through Python
+        df = read_to_dataframe(file_name, _file.name, **params)
+    else:
+        df = read_to_dataframe(file_name, _file, **params)
+    save_dataframe_to_session_state(file_name, df)
+    save_profile_to_session_state(file_name, column_profile.profile_dataframe(df))
+    return df
+
+def is_concatenable_file(file_name: str):
+    """Csv and columnar files can be assembled into a single dataset, unless they are unsupported archives."""
+    return (is_csv_file(file_name) and archive_error(file_name) is None) or is_columnar_file(file_name)
+
+def import_columns(file_name: str, _file):
+    """Returns the columns a file is imported with, read from its header or schema only."""
+    params = st.session_state[IMPORT_PARAMS].get(file_name, {})
+    if is_csv_file(file_name):
+        columns = read_csv_header(_file, params.get('sep', ','), params.get('encoding'), params.get('compression'))
+        usecols = params.get('usecols')
+        if usecols is not None:
+            columns = [columns[i] for i in usecols if i < len(columns)]
+        return columns
+    return list(read_columnar_schema(file_name, _file)['Column'])
+
+def check_schema_compatibility(file_names: list):
+    """Compares the columns of the files with the columns of the first one. 
+    Columns may come in another order: they are put in the order of the first file when concatenated.
+
+    Returns:
+        tuple: (columns of the first file, 
+                {file_name: (missing columns, unexpected columns)} for the files not matching, 
+                empty if all files share the same columns).
+    """
+    reference = None
+    mismatches = dict()
+    for file_name in file_names:
+        with open_uploaded_file(file_name) as _file:
+            columns = import_columns(file_name, _file)
+        if reference is None:
+            reference = columns
+            continue
+        if set(columns) != set(reference):
+            missing = [col for col in reference if col not in columns]
+            unexpected = [col for col in columns if col not in reference]
+            mismatches[file_name] = (missing, unexpected)
+    return reference, mismatches
+
+def _parse_file(file_name: str, _file, params: dict):
+    """Parses a csv or columnar file without any streamlit call, so it can run in a worker thread."""
+    _file.seek(0)
+    source = _file.name if is_local_file(_file) else _file
+    if is_csv_file(file_name):
+        # Each file is read at once: the chunks would be copied again by the final concatenation
+        params, date_formats = split_datetime_params(params)
+        params.pop(CHUNK_SIZE, None)
+        return convert_datetime_columns(pd.read_csv(source, **params), date_formats)
+    return read_to_dataframe(file_name, source, **params)
+
+def read_files_in_parallel(file_names: list, max_workers: int = CONCAT_MAX_WORKERS):
+    """Reads files concurrently with their import parameters. 
+
+    Csv files found in the import cache are loaded from it, the others are parsed 
+    in a thread pool (the pandas csv parser and Arrow readers release the GIL) and cached.
+
+    Returns:
+        list: Dataframes, in the same order as file_names.
+    """
+    dataframes = dict()
+    pending = dict()
+    # Files opened from disk are closed once every file is read
+    with ExitStack() as open_files:
+        for file_name in file_names:
+            _file = open_files.enter_context(open_uploaded_file(file_name))
+            params = st.session_state[IMPORT_PARAMS].get(file_name, {})
+            key = None
+            if is_csv_file(file_name):
+                digest = get_file_digest(file_name, _file)
+                key = cache.cache_key(digest, params, ignore=(CHUNK_SIZE, 'low_memory'))
+                df = cache.load(key)
+                if df is not None:
+                    dataframes[file_name] = df
+                    continue
+            pending[file_name] = (_file, params, key)
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+                futures = {
+                    executor.submit(_parse_file, file_name, _file, params): file_name 
+                    for file_name, (_file, params, _) in pending.items()
+                }
+                for future in as_completed(futures):
+                    file_name = futures[future]
+                    df = future.result()
+                    key = pending[file_name][2]
+                    if key is not None:
+                        cache.store(key, df)
+                    dataframes[file_name] = df
+    return [dataframes[file_name] for file_name in file_names]
+
+def concat_dataframes(dataframes: list, names: list, source_column: str = None):
+    """Concatenates same schema dataframes in a single allocation, 
+    with the columns in the order of the first dataframe.
+
+    Args:
+        dataframes (list): Dataframes to concatenate.
+        names (list): Source name of each dataframe.
+        source_column (str, optional): If set, a categorical column with the source name of each row is added.
+            Raises a ValueError if the dataframes already have a column with that name.
+
+    Returns:
+        tuple: (concatenated dataframe, {column: distinct data types} for the columns 
+               whose data type differs between the dataframes).
+    """
+    columns = dataframes[0].columns
+    if source_column and source_column in columns:
+        raise ValueError(f'{source_column} is already a column of the dataframes')
+    dataframes = [df if df.columns.equals(columns) else df[columns] for df in dataframes]
+    dtype_conflicts = dict()
+    for col in dataframes[0].columns:
+        col_dtypes = {str(df[col].dtype) for df in dataframes if col in df.columns}
+        if len(col_dtypes) > 1:
+            dtype_conflicts[col] = sorted(col_dtypes)
+    # Keep the index of columnar files (e.g. a DatetimeIndex), renumber the default ones
+    ignore_index = all(isinstance(df.index, pd.RangeIndex) for df in dataframes)
+    df = pd.concat(dataframes, ignore_index=ignore_index)
+    if source_column:
+        lengths = [len(frame) for frame in dataframes]
+        codes = np.repeat(np.arange(len(names), dtype=np.int32), lengths)
+        df.insert(0, source_column, pd.Categorical.from_codes(codes, categories=names))
+    return df, dtype_conflicts
+
+def optimise_dataframe(file_name: str, arrow_strings: bool = False):
+    """Replaces the stored dataframe with its data type optimised version, 
+    recording the memory usage before and after."""
+    df = get_dataframe(file_name)
+    before = dtypes.memory_usage(df)
+    df = dtypes.optimise_dtypes(df, arrow_strings=arrow_strings)
+    after = dtypes.memory_usage(df)
+    save_dataframe_to_session_state(file_name, df)
+    st.session_state[MEMORY_USAGE][file_name] = (before, after)
+    return df
+
+def select_excel_engine(file_name: str, _file):
+    engines = excel_reader.available_engines(file_name)
+    options = [excel_reader.AUTO_ENGINE] + engines
+    _help = """
+    Library used to read the workbook. 
+    - **calamine**: Rust-backed reader, by far the fastest. 
+    - **openpyxl**: pure Python reader, slower on large files.
+    - **xlrd**: legacy .xls reader.
+
+    Auto picks the fastest available engine for large files.
+    """
+    choice = st.selectbox('Excel Engine:', options, help=_help, key=f'{file_name}_engine')
+    engine = excel_reader.select_engine(file_name, _buffer_size(_file), EXCEL_FAST_ENGINE_MIN_BYTES, choice)
+    if choice == excel_reader.AUTO_ENGINE and engine is not None:
+        st.caption(f'Using {engine} engine.')
+    return engine
+
+def read_excel_header(_file, digest: str, sheet_name: str, engine: str = None):
+    """Returns the column names of an excel sheet, reading its header only. Cached by file digest."""
+    key = cache.cache_key(digest, {'metadata': 'header', 'sheet_name': sheet_name})
+    columns = cache.load_json(key)
+    if columns is None:
+        with st.spinner(f'Reading {sheet_name} header...'):
+            _file.seek(0)
+            columns = [str(col) for col in pd.read_excel(_file, sheet_name=sheet_name, nrows=0, engine=engine).columns]
+            _file.seek(0)
+        cache.store_json(key, columns)
+    return columns
 
 def prepare_excel_file(file_name: str):
     st.markdown('##### Set Parameters:')
-    with st.spinner('Previewing Excel File...'):
-        xl_file = get_uploaded_file(file_name)
-        xl = pd.ExcelFile(xl_file)
+    with open_uploaded_file(file_name) as xl_file:
+        engine = select_excel_engine(file_name, xl_file)
+        digest = get_file_digest(file_name, xl_file)
+        sheet_names = cache.load_json(cache.cache_key(digest, {'metadata': 'sheet_names'}))
+        if sheet_names is None:
+            with st.spinner('Previewing Excel File...'):
+                xl_file.seek(0)
+                xl = pd.ExcelFile(xl_file, engine=engine)
+                sheet_names = xl.sheet_names
+            cache.store_json(cache.cache_key(digest, {'metadata': 'sheet_names'}), sheet_names)
+            st.session_state[XL_FILE][file_name] = xl
     # Select Column(s) to import
     label = 'Please Select Sheet(s) To Import:'
-    options = xl.sheet_names
+    options = sheet_names
     _help = f"""
     If you select more than one, all the columns will be stacked on top of each other.
     """
@@ -164,18 +1002,32 @@ def prepare_excel_file(file_name: str):
                             help=_help)
     params = {}
     params[SELECTED_SHEETS] = selected_sheets
+    params[EXCEL_ENGINE] = engine
+    # Column projection, based on the first selected sheet header
+    if selected_sheets:
+        with open_uploaded_file(file_name) as xl_file:
+            columns = read_excel_header(xl_file, digest, selected_sheets[0], engine)
+        usecols = select_columns_to_import(file_name, columns)
+        if usecols is not None:
+            params['usecols'] = usecols
     st.session_state[IMPORT_PARAMS][file_name] = params
-    st.session_state[XL_FILE][file_name] = xl
     st.markdown('---')
 
+def parse_excel_file(file_name: str, _file, params: dict):
+    params = dict(params)
+    selected_sheets = params.pop(SELECTED_SHEETS)
+    # Sheets are parsed concurrently and stacked once
+    with st.spinner(f'Reading {len(selected_sheets)} sheet(s)...'):
+        results = excel_reader.parse_sheets(
+                        _file, selected_sheets, max_workers=EXCEL_MAX_WORKERS, file_name=file_name, **params)
+        df, timing = excel_reader.concat_sheets(results)
+    with st.expander('Sheet Timing'):
+        st.dataframe(timing, hide_index=True)
+    return df
+
 def process_excel_file(file_name: str, _file):
-    selected_sheets = st.session_state[IMPORT_PARAMS][file_name].get(SELECTED_SHEETS)
     params = st.session_state[IMPORT_PARAMS].get(file_name)
-    # Parse loop
-    df = pd.DataFrame()
-    for i, sheet_name in enumerate(selected_sheets, 1):
-        with st.spinner(f'Reading {sheet_name}'):
-            tmp_df = _file.parse(sheet_name, **params)
-            df = pd.concat([df, tmp_df], ignore_index=True)
+    df = read_with_cache(file_name, _file, params, lambda: parse_excel_file(file_name, _file, params))
     save_dataframe_to_session_state(file_name, df)
+    save_profile_to_session_state(file_name, column_profile.profile_dataframe(df))
     return df
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Index metadata of stored dataframes.
+
+Records whether the index is sorted and unique, and the range it spans,
+so that tools can skip sorting an already sorted index
+and slice a time range by binary search instead of scanning every row.
+Pandas indexes are immutable: the metadata of an index stays valid as long as the dataframe keeps that index object.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+IndexInfo = namedtuple(
+    'IndexInfo',
+    ['name', 'dtype', 'length', 'monotonic_increasing', 'monotonic_decreasing', 'unique', 'start', 'end'],
+)
+
+
+def _has_order(index: pd.Index) -> bool:
+    return (
+        pd.api.types.is_numeric_dtype(index.dtype)
+        or pd.api.types.is_datetime64_any_dtype(index.dtype)
+    ) and not isinstance(index.dtype, pd.CategoricalDtype)
+
+def describe_index(index: pd.Index) -> IndexInfo:
+    """Computes the index metadata: one pass for each property, each cached by pandas on the index."""
+    increasing = index.is_monotonic_increasing
+    decreasing = index.is_monotonic_decreasing
+    start = end = None
+    if len(index) and _has_order(index):
+        if increasing:
+            start, end = index[0], index[-1]
+        elif decreasing:
+            start, end = index[-1], index[0]
+        else:
+            start, end = index.min(), index.max()
+    return IndexInfo(
+        name=index.name,
+        dtype=str(index.dtype),
+        length=len(index),
+        monotonic_increasing=increasing,
+        monotonic_decreasing=decreasing,
+        unique=index.is_unique,
+        start=start,
+        end=end,
+    )
+
+def is_datetime(info: IndexInfo) -> bool:
+    return info.dtype.startswith('datetime64')
+
+def time_slice(dataframe: pd.DataFrame, start=None, end=None, info: IndexInfo = None) -> pd.DataFrame:
+    """Rows of the dataframe whose index is within [start, end), e.g. whole days with end the day after.
+
+    On a sorted index the bounds are found by binary search and the slice is a view,
+    otherwise every row is compared to the bounds.
+
+    Args:
+        start, end (optional): Bounds, start included and end excluded. None for an open bound.
+        info (IndexInfo, optional): Metadata of the dataframe index, computed if not given.
+    """
+    index = dataframe.index
+    info = info or describe_index(index)
+    if info.monotonic_increasing:
+        i = index.searchsorted(start, side='left') if start is not None else 0
+        j = index.searchsorted(end, side='left') if end is not None else len(index)
+        return dataframe.iloc[i:j]
+    mask = np.ones(len(index), dtype=bool)
+    if start is not None:
+        mask &= index >= start
+    if end is not None:
+        mask &= index < end
+    return dataframe[mask]
+
+def describe_info(info: IndexInfo) -> str:
+    """One line summary of the index metadata."""
+    name = info.name if info.name is not None else 'default'
+    order = 'sorted' if info.monotonic_increasing else 'sorted descending' if info.monotonic_decreasing else 'not sorted'
+    text = f'Index: {name} ({info.dtype}) - {order}, {"unique" if info.unique else "with duplicates"}'
+    if info.start is not None:
+        text += f', from {info.start} to {info.end}'
+    return text
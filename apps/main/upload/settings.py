@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 UPLOADED = 'uploaded_data'
 DATAFRAME = 'dataframe'
 XL_FILE = 'excel_files'
@@ -5,6 +8,72 @@ MERGED = 'merged_dataframe'
 # Import parameters 
 IMPORT_PARAMS = 'import_parameters'
 SELECTED_SHEETS = 'selected_sheets'
+EXCEL_ENGINE = 'engine'
 PROCESS_FILE = 'process_file'
+FILE_DIGEST = 'file_digest'
+MEMORY_USAGE = 'memory_usage'
+PROFILE = 'column_profile'
+PIPELINE = 'preprocess_pipeline'
+HISTORY = 'preprocess_history'
+KEY_DICTIONARY = 'key_dictionary'
+INDEX_INFO = 'index_info'
+DATAFRAME_VERSION = 'dataframe_version'
+JOIN_INDEX_CACHE = 'join_index_cache'
+MERGE_RESULTS = 'merge_results'
+UPLOADER_KEY = 'uploader_key'
+CHUNK_SIZE = 'chunksize'
+DATETIME_FORMATS = 'datetime_formats'  # {column: strftime format} of the columns parsed as datetime at import
+# File formats
+CSV_EXTENSIONS = ('.csv',)
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow')
+# Compressed csv files: extension -> (pandas compression, module needed)
+COMPRESSION_EXTENSIONS = {
+    '.gz': ('gzip', 'gzip'),
+    '.zip': ('zip', 'zipfile'),
+    '.zst': ('zstd', 'zstandard'),
+    '.bz2': ('bz2', 'bz2'),
+    '.xz': ('xz', 'lzma'),
+}
+# Export formats: (file extension, mime type)
+CSV_FORMAT = 'CSV'
+CSV_GZIP_FORMAT = 'CSV (gzip)'
+PARQUET_FORMAT = 'Parquet'
+FEATHER_FORMAT = 'Feather / Arrow IPC'
+EXPORT_FORMATS = {
+    CSV_FORMAT: ('csv', 'text/csv'),
+    CSV_GZIP_FORMAT: ('csv.gz', 'application/gzip'),
+    PARQUET_FORMAT: ('parquet', 'application/vnd.apache.parquet'),
+    FEATHER_FORMAT: ('feather', 'application/vnd.apache.arrow.file'),
+}
+EXPORT_CHUNK_ROWS = 100_000  # Rows written per chunk when exporting a dataframe
 
-N_ROWS = 300  # Number of rows shown on dataframe preview
\ No newline at end of file
+N_ROWS = 300  # Number of rows shown on dataframe preview
+HISTORY_MAX_VERSIONS = 10  # Previous versions of a preprocessed dataframe kept for undo
+CONVERSION_MAX_WORKERS = min(8, os.cpu_count() or 1)  # Worker threads converting columns concurrently
+DEFAULT_CHUNK_SIZE = 250_000  # Rows read per chunk when streaming csv files
+EXCEL_MAX_WORKERS = min(8, os.cpu_count() or 1)  # Worker processes parsing excel sheets concurrently
+CONCAT_MAX_WORKERS = min(8, os.cpu_count() or 1)  # Worker threads reading files of a concatenated dataset
+SOURCE_COLUMN = 'SOURCE_FILE'  # Default name of the source file column of a concatenated dataset
+EXCEL_FAST_ENGINE_MIN_BYTES = 5 * 1024**2  # Above this size, Auto picks the fastest available excel engine
+# Merges whose estimated output exceeds this memory are blocked
+MERGE_MAX_BYTES = int(os.environ.get('TFL_MERGE_MAX_BYTES', 4 * 1024**3))
+MERGE_CHUNK_ROWS = 500_000  # Left rows joined per block by chunked merges
+MERGE_IN_MEMORY = 'In Memory'
+MERGE_TO_DISK = 'Chunked To Disk (Parquet)'
+MERGE_MODES = [MERGE_IN_MEMORY, MERGE_TO_DISK]
+# Join types: label -> pd.merge how
+JOIN_ASOF = 'As-of'
+JOIN_TYPES = {'Left': 'left', 'Inner': 'inner', 'Outer': 'outer', JOIN_ASOF: 'asof'}
+MAX_ADDITIONAL_JOINS = 5  # Dataframes joined in one operation, besides the left and right ones
+JOIN_INDEX_CACHE_SIZE = 8  # Join indexes kept across reruns, least recently used dropped first
+MERGE_POSITIONS_CACHE_SIZE = 4  # Merge results keeping their join row positions, oldest dropped first
+# On-disk cache of parsed uploads
+CACHE_DIR = os.environ.get('TFL_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'tools-for-logistics-cache'))
+CACHE_MAX_BYTES = int(os.environ.get('TFL_CACHE_MAX_BYTES', 5 * 1024**3))  # LRU eviction above this size
+# Raw uploads spilled to disk once processed
+SPILL_DIR = os.environ.get('TFL_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'tools-for-logistics-uploads'))
+SPILL_MAX_AGE = 24 * 3600  # Seconds a spilled file can stay unused before it is removed
+# Server-side directories files can be loaded from, without uploading them (os.pathsep separated)
+DATA_DIRS = [d for d in os.environ.get('TFL_DATA_DIRS', '').split(os.pathsep) if d]
\ No newline at end of file
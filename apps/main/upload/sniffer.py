@@ -0,0 +1,152 @@
+"""
+Cheap csv dialect and datetime sniffing, run on the first few hundred KB of a file 
+so the full parse runs once, with the right parameters.
+"""
+
+import bz2
+import csv
+import gzip
+import lzma
+import re
+import zipfile
+from io import StringIO
+
+import pandas as pd
+
+SNIFF_BYTES = 256 * 1024
+DELIMITERS = ';,|\t'
+ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+DATE_FORMATS = [
+    '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d.%m.%Y', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%y', '%m/%d/%y', '%Y%m%d',
+]
+TIME_FORMATS = ['', ' %H:%M', ' %H:%M:%S', ' %H:%M:%S.%f', 'T%H:%M', 'T%H:%M:%S', 'T%H:%M:%S.%f']
+N_VALUES = 200  # Distinct values tested per column
+# Column names suggesting a date, for columns of 8 digit numbers (20240131 or an id?)
+DATE_NAME = re.compile(r'date|day|time|period|(^|[^a-z])dt([^a-z]|$)', re.IGNORECASE)
+
+DECIMAL_COMMA = re.compile(r'^[-+]?\d+,\d+$')
+DECIMAL_POINT = re.compile(r'^[-+]?\d+\.\d+$')
+
+
+def open_decompressed(_file, compression: str):
+    """Returns a readable stream decompressing the file on the fly."""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=_file, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(_file, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(_file, mode='rb')
+    if compression == 'zip':
+        archive = zipfile.ZipFile(_file)
+        return archive.open(archive.namelist()[0])
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(_file)
+    raise ValueError(f'Unsupported compression: {compression}')
+
+def read_sample(_file, n_bytes: int = SNIFF_BYTES, compression: str = None) -> bytes:
+    """Reads the first n_bytes of a file / buffer, leaving it at the start. 
+    Compressed files are decompressed up to n_bytes only."""
+    _file.seek(0)
+    if compression is None:
+        sample = _file.read(n_bytes)
+    else:
+        try:
+            sample = open_decompressed(_file, compression).read(n_bytes)
+        except (OSError, EOFError, IndexError, zipfile.BadZipFile):
+            sample = b''
+    _file.seek(0)
+    return sample
+
+def detect_encoding(sample: bytes) -> str:
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    # The sample may end in the middle of a multi-byte character
+    trimmed = sample[:sample.rfind(b'\n') + 1] or sample
+    for encoding in ENCODINGS:
+        try:
+            trimmed.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+def complete_lines(sample: bytes, encoding: str) -> str:
+    """Decodes the sample, dropping the last (probably truncated) line."""
+    text = sample.decode(encoding, errors='replace')
+    last_newline = text.rfind('\n')
+    if 0 < last_newline < len(text) - 1:
+        text = text[:last_newline + 1]
+    return text
+
+def detect_delimiter(text: str) -> str:
+    try:
+        return csv.Sniffer().sniff(text[:64 * 1024], delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        # Fall back on the delimiter appearing most consistently in the first lines
+        lines = [line for line in text.splitlines()[:50] if line]
+        counts = {d: [line.count(d) for line in lines] for d in DELIMITERS}
+        consistent = {d: c[0] for d, c in counts.items() if c and c[0] > 0 and len(set(c)) == 1}
+        if consistent:
+            return max(consistent, key=consistent.get)
+        return max(counts, key=lambda d: sum(counts[d]))
+
+def detect_decimal(sample_df: pd.DataFrame, sep: str) -> str:
+    if sep == ',':
+        return '.'
+    values = pd.Series(sample_df.to_numpy().ravel()).dropna().astype(str)
+    commas = values.str.match(DECIMAL_COMMA).sum()
+    points = values.str.match(DECIMAL_POINT).sum()
+    return ',' if commas > points else '.'
+
+def _date_formats(dayfirst: bool = True) -> list:
+    if dayfirst:
+        return DATE_FORMATS
+    # Month first formats before day first ones
+    return sorted(DATE_FORMATS, key=lambda fmt: fmt.startswith('%d'))
+
+def detect_datetime_format(values: pd.Series, dayfirst: bool = True, compact_dates: bool = True):
+    """Returns the first candidate strftime format parsing every value, None if none does.
+    Day first formats are tried before month first ones, unless dayfirst is False.
+    Columns of 8 digit numbers are only detected as %Y%m%d dates if compact_dates is set."""
+    values = values.dropna().astype(str).str.strip()
+    values = values[values != ''].drop_duplicates().iloc[:N_VALUES]
+    if values.empty or not values.str.contains(r'\d', regex=True).all():
+        return None
+    if values.str.fullmatch(r'[-+]?\d+([.,]\d+)?').all():
+        if not (compact_dates and values.str.fullmatch(r'\d{8}').all()):
+            return None  # Plain numbers
+    for date_format in _date_formats(dayfirst):
+        for time_format in TIME_FORMATS:
+            fmt = date_format + time_format
+            parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+            if parsed.notna().all():
+                return fmt
+    return None
+
+def sniff_csv(sample: bytes):
+    """Sniffs encoding, delimiter, decimal mark and datetime columns from a file sample.
+
+    Returns:
+        dict: 'encoding', 'sep', 'decimal' and 'datetime_formats' ({column: strftime format}).
+    """
+    encoding = detect_encoding(sample)
+    text = complete_lines(sample, encoding)
+    sep = detect_delimiter(text)
+    try:
+        sample_df = pd.read_csv(StringIO(text), sep=sep, dtype=str, keep_default_na=True)
+    except (ValueError, pd.errors.ParserError):
+        sample_df = pd.DataFrame()
+    decimal = detect_decimal(sample_df, sep)
+    datetime_formats = {}
+    for col in sample_df.columns:
+        # 8 digit ids (SKU codes, order numbers) also parse as %Y%m%d: only the column name tells them apart
+        fmt = detect_datetime_format(sample_df[col], compact_dates=DATE_NAME.search(str(col)) is not None)
+        if fmt is not None:
+            datetime_formats[col] = fmt
+    return {
+        'encoding': encoding,
+        'sep': sep,
+        'decimal': decimal,
+        'datetime_formats': datetime_formats,
+    }
@@ -4,6 +4,9 @@ import streamlit as st
 import pandas as pd
 
 import apps.main.upload.file_manager as fm
+from . import cache
+from . import column_profile
+from apps.main.merge import join_cache
 from .settings import *
 
 DISPLAY_DATAFRAME = dict()
@@ -20,24 +23,27 @@ def page_intro():
 
         Limitations:
         - Max file size: 2Gb.
-        - File format  : .csv, .xls, .xlsx
+        - File format  : .csv, .xls, .xlsx, .parquet, .feather / .arrow
         """
         st.markdown(text)
 
 def upload_multiple_files():
     label = 'Choose a file'
-    filetype = ['csv', 'xls', 'xlsx']
+    filetype = ['csv', 'xls', 'xlsx', 'parquet', 'pq', 'feather', 'arrow'] + fm.supported_compressions()
     help_tip = """
-    Currently .csv, .xls and .xlsx files are supported.
-    Parquet format will be soon available.
+    Currently .csv, .xls, .xlsx, .parquet and .feather / .arrow (Arrow IPC) files are supported.
+    Compressed csv files (.csv.gz, .zip, .csv.zst, .csv.bz2, .csv.xz) are decompressed on the fly while reading.
 
-    For faster upload / read operations, opt for .csv files.
+    For faster upload / read operations, opt for .parquet or .feather files: 
+    data types and datetime index are kept, no parsing needed.
+    Excel files are read faster with the calamine engine (python-calamine package).
     """
     uploaded_files = st.file_uploader(
                             label, 
                             type=filetype, 
                             help=help_tip, 
-                            accept_multiple_files=True
+                            accept_multiple_files=True,
+                            key=f'file_uploader_{st.session_state[UPLOADER_KEY]}',
                             )
     
     # Save files to session state
@@ -45,6 +51,39 @@ def upload_multiple_files():
     st.markdown('---')
 
 
+def load_from_server():
+    """Lets the user pick files already stored on the server (TFL_DATA_DIRS), 
+    skipping the browser upload. Files are registered like uploaded files and read straight from disk.
+    """
+    if not DATA_DIRS:
+        return
+    st.markdown('### Load From Server')
+    with st.expander('More Info'):
+        text = """
+        Large extracts already stored on the analytics server can be loaded from the watched directories below.
+        
+        Nothing goes through the browser: files are read directly from disk, in chunks or memory mapped.
+        """
+        st.markdown(text)
+    directory = st.selectbox('Watched Directory:', DATA_DIRS)
+    local_files = fm.list_server_files(directory)
+    if not local_files:
+        st.markdown('**No supported file in this directory.**')
+        st.button('Refresh')
+        st.markdown('---')
+        return
+    files = {local_file.path: local_file for local_file in local_files}
+    selected = st.multiselect(
+                    'Select File(s) To Load:', 
+                    options=list(files.keys()), 
+                    format_func=lambda path: f'{files[path].name} - {files[path].size / 1e6:,.1f} MB')
+    col1, col2, _ = st.columns([2, 1, 5])
+    if col1.button('Load Selected', disabled=not selected):
+        fm.save_local_files_to_session_state([files[path] for path in selected])
+    col2.button('Refresh')
+    st.markdown('---')
+
+
 def show_uploaded_files():
     """It shows an overview of all uploaded files. 
     While it is capable of handling multiple files, currently only a single file upload is supported.
@@ -60,13 +99,19 @@ def show_uploaded_files():
         st.markdown('### Uploaded File(s)')
         # Loop through uploaded files and set import parameters
         for i, file_name in enumerate(fm.session_uploaded_keys(), 1):
-            is_excel = file_name.lower().endswith(('.xlsx', '.xls'))
-            is_csv = file_name.lower().endswith('.csv')
+            is_excel = fm.is_excel_file(file_name)
+            is_csv = fm.is_csv_file(file_name)
+            is_columnar = fm.is_columnar_file(file_name)
             st.markdown(f'#### {i}. {file_name}')
-            if is_excel:
+            error = fm.archive_error(file_name)
+            if error:
+                st.error(error)
+            elif is_excel:
                 fm.prepare_excel_file(file_name)
             elif is_csv:
                 fm.prepare_csv_file(file_name)
+            elif is_columnar:
+                fm.prepare_columnar_file(file_name)
     else:
         st.markdown('**No File Yet.** Please Upload Some Data.')
 
@@ -81,6 +126,26 @@ def select_files_to_process():
         st.session_state[PROCESS_FILE][file_name] = process_file
 
 
+def dtype_optimisation_options():
+    """Data type optimisation settings applied right after import.
+
+    Returns:
+        - tuple: (optimise, arrow_strings) booleans.
+    """
+    st.markdown('#### Data Type Optimisation')
+    _help = """
+    Repetitive text columns (e.g. order and SKU codes) are stored as categories, 
+    whole number columns are downcast to the smallest integer type.
+    This reduces memory usage and speeds up the reports.
+    """
+    optimise = st.checkbox('Optimise Data Types', value=True, help=_help)
+    _help = """
+    Remaining text columns are stored as Apache Arrow strings, more compact than Python strings.
+    """
+    arrow_strings = st.checkbox('Use Arrow-backed Strings', value=False, disabled=not optimise, help=_help)
+    return optimise, arrow_strings
+
+
 def process_to_dataframe_section() -> None:
     """
     Displays a user interface that allows the user to process previously uploaded files into pandas dataframes. The user can specify the CSV column separator if needed. This function also displays a preview of the dataframe after processing.
@@ -106,6 +171,12 @@ def process_to_dataframe_section() -> None:
             st.markdown(text)
         
         select_files_to_process()
+        optimise, arrow_strings = dtype_optimisation_options()
+        _help = """
+        Once a file is processed, its raw content is moved from memory to a temporary file on disk.
+        The dataframe is then the only copy held in memory, the file can still be processed again.
+        """
+        release_files = st.checkbox('Release Raw Files From Memory After Processing', value=True, help=_help)
         process_button =  st.button('Process Selected', type='primary')
         st.markdown('---')
 
@@ -117,7 +188,13 @@ def process_to_dataframe_section() -> None:
             DISPLAY_DATAFRAME[file_name] = container
             if file_name in st.session_state[DATAFRAME].keys():
                 dataframe = fm.get_dataframe(file_name)
-                fm.display_dataframe(dataframe, f'{i}. {file_name}', DISPLAY_DATAFRAME[file_name])
+                fm.display_dataframe(
+                    dataframe, 
+                    f'{i}. {file_name}', 
+                    DISPLAY_DATAFRAME[file_name], 
+                    memory=fm.get_memory_usage(file_name),
+                    profile=fm.get_profile(file_name),
+                )
 
         # if st.button('Process Selected', type='primary'):
         if process_button:
@@ -126,28 +203,136 @@ def process_to_dataframe_section() -> None:
 
                 with st.spinner(f'Processing {file_name}...'):
                     # file type selector
-                    is_excel = file_name.lower().endswith(('.xlsx', '.xls'))
-                    is_csv = file_name.lower().endswith('.csv')
-                    process_file = st.session_state[PROCESS_FILE][file_name]
+                    is_excel = fm.is_excel_file(file_name)
+                    is_csv = fm.is_csv_file(file_name)
+                    is_columnar = fm.is_columnar_file(file_name)
+                    # Unsupported archives are reported with the uploaded files
+                    process_file = st.session_state[PROCESS_FILE][file_name] and fm.archive_error(file_name) is None
                     # Select csv or excel read function
                     if is_excel and process_file:
-                        _file = st.session_state[XL_FILE].get(file_name)
-                        dataframe = fm.process_excel_file(file_name, _file)
+                        with fm.open_uploaded_file(file_name) as uploaded_file:
+                            dataframe = fm.process_excel_file(file_name, uploaded_file)
                         st.success(f'{file_name} processed successfully.')
                     elif is_csv and process_file:
-                        uploaded_file = fm.get_uploaded_file(file_name)
-                        dataframe = fm.process_csv_file(file_name, uploaded_file)
+                        with fm.open_uploaded_file(file_name) as uploaded_file:
+                            dataframe = fm.process_csv_file(file_name, uploaded_file)
                         st.success(f'{file_name} processed successfully.')
+                    elif is_columnar and process_file:
+                        with fm.open_uploaded_file(file_name) as uploaded_file:
+                            dataframe = fm.process_columnar_file(file_name, uploaded_file)
+                        st.success(f'{file_name} processed successfully.')
+
+                    if process_file and optimise and file_name in fm.session_dataframe_keys():
+                        with st.spinner(f'Optimising {file_name} data types...'):
+                            fm.optimise_dataframe(file_name, arrow_strings)
+
+                    if process_file and release_files and file_name in fm.session_dataframe_keys():
+                        fm.release_uploaded_file(file_name)
         
         for i, file_name in enumerate(fm.session_uploaded_keys(), 1):
             if file_name in fm.session_dataframe_keys():
                 dataframe = fm.get_dataframe(file_name)
-                fm.display_dataframe(dataframe, f'{i}. {file_name}', DISPLAY_DATAFRAME[file_name])
+                fm.display_dataframe(
+                    dataframe, 
+                    f'{i}. {file_name}', 
+                    DISPLAY_DATAFRAME[file_name], 
+                    memory=fm.get_memory_usage(file_name),
+                    profile=fm.get_profile(file_name),
+                )
         
 
 
+def concatenate_files_section():
+    """Assembles several uploaded files sharing the same columns (e.g. one file per day or per site) 
+    into a single dataframe, read in parallel."""
+    candidates = [file_name for file_name in fm.session_uploaded_keys() if fm.is_concatenable_file(file_name)]
+    if len(candidates) < 2:
+        return
+    st.markdown('### Concatenate Files As One Dataset')
+    with st.expander('More Info'):
+        text = """
+        Csv, parquet and feather files with the same columns are read in parallel, 
+        with the import parameters set above, and stacked into a single dataframe.
+
+        Columns are checked from the file headers before anything is read. 
+        They can come in any order: the dataset keeps the order of the first selected file.
+        A source file column can be added to keep track of where each row comes from.
+        """
+        st.markdown(text)
+    selected = st.multiselect('Select Files To Concatenate:', candidates, key='concat_files')
+    dataset_name = st.text_input('Dataset Name:', value='dataset', key='concat_name')
+    add_source = st.checkbox('Add Source File Column', value=True, key='concat_add_source')
+    source_column = st.text_input(
+                            'Source File Column Name:', 
+                            value=SOURCE_COLUMN, 
+                            disabled=not add_source, 
+                            key='concat_source_column')
+    optimise = st.checkbox('Optimise Data Types', value=True, key='concat_optimise')
+    concat_button = st.button('Concatenate Selected', disabled=len(selected) < 2 or not dataset_name)
+
+    if concat_button:
+        if dataset_name in fm.session_uploaded_keys():
+            st.error(f'{dataset_name} is already the name of an uploaded file, please pick another name.')
+            return
+        columns, mismatches = fm.check_schema_compatibility(selected)
+        if mismatches:
+            text = f'Files do not share the columns of {selected[0]}:\n'
+            for file_name, (missing, unexpected) in mismatches.items():
+                text += f'\n- **{file_name}**: missing {missing}, unexpected {unexpected}'
+            st.error(text)
+            return
+        if add_source and source_column in columns:
+            st.error(f'{source_column} is already a column of the files, please pick another source file column name.')
+            return
+        with st.spinner(f'Reading {len(selected)} files...'):
+            dataframes = fm.read_files_in_parallel(selected)
+        df, dtype_conflicts = fm.concat_dataframes(
+                                    dataframes, 
+                                    selected, 
+                                    source_column=source_column if add_source else None)
+        del dataframes
+        if dtype_conflicts:
+            conflicts = ', '.join(f'{col} ({" / ".join(types)})' for col, types in dtype_conflicts.items())
+            st.warning(f'Data types differ between files, the common type is kept for: {conflicts}')
+        fm.save_dataframe_to_session_state(dataset_name, df)
+        join_cache.forget_result(dataset_name)
+        fm.save_profile_to_session_state(dataset_name, column_profile.profile_dataframe(df))
+        st.session_state[MEMORY_USAGE].pop(dataset_name, None)
+        if optimise:
+            with st.spinner(f'Optimising {dataset_name} data types...'):
+                fm.optimise_dataframe(dataset_name)
+        st.success(f'{len(selected)} files concatenated into {dataset_name}.')
+
+    for dataset_name in fm.session_dataframe_keys():
+        if dataset_name not in fm.session_uploaded_keys() and not join_cache.is_merge_result(dataset_name):
+            fm.display_dataframe(
+                fm.get_dataframe(dataset_name), 
+                dataset_name, 
+                DisplayData(st.empty(), st.empty()), 
+                memory=fm.get_memory_usage(dataset_name),
+                profile=fm.get_profile(dataset_name),
+            )
+
+
+def import_cache_section():
+    """Shows the size of the import cache and lets the user clear it."""
+    with st.expander('Import Cache'):
+        text = """
+        Parsed files are cached on disk, keyed by file content and import parameters. 
+        Importing the same file with the same parameters again skips parsing altogether.
+        """
+        st.markdown(text)
+        st.caption(f'Cache size: {cache.cache_size() / 1e6:,.1f} MB - Limit: {CACHE_MAX_BYTES / 1e6:,.0f} MB')
+        if st.button('Clear Import Cache'):
+            cache.clear()
+            st.success('Import cache cleared.')
+
+
 def upload_page():
     page_intro()
     upload_multiple_files()
+    load_from_server()
     show_uploaded_files()
-    process_to_dataframe_section()
\ No newline at end of file
+    process_to_dataframe_section()
+    concatenate_files_section()
+    import_cache_section()
\ No newline at end of file
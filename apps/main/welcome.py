@@ -13,7 +13,7 @@ def welcome_page():
     The tool streamlines the process of data analysis, allowing users to focus on insights rather than repetitive tasks.
 
     #### Key Features:
-    1. **Upload Data**: Supports CSV, XLS, and XLSX file formats up to 2GB.
+    1. **Upload Data**: Supports CSV (plain or gzip, zip, zstd, bz2, xz compressed), XLS, XLSX, Parquet and Feather (Arrow IPC) file formats up to 2GB.
     2. **Merge and Preprocess**: Convert data types, drop unnecessary columns, and set datetime indexes.
     3. **Select Report**: Choose from various report types tailored for logistics analysis.
     4. **Set Parameters and Create Dashboards**: Customize report parameters and generate interactive dashboards.
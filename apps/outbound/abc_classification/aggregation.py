@@ -0,0 +1,57 @@
+"""
+Single-pass aggregation of orderlines per SKU.
+
+Order and SKU ids are factorised once into integer codes, combined into one (SKU, order) code per row.
+The sorted codes give the distinct (SKU, order) pairs, i.e. the orderlines, counted per SKU with np.bincount;
+quantities are summed per SKU code with np.bincount as well, without sorting them.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _quantities(series: pd.Series) -> np.ndarray:
+    """Quantities as a numpy array, missing values counted as 0 (as pandas sums skip them)."""
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype):
+        return series.to_numpy(dtype=np.int64, na_value=0)
+    return series.to_numpy(dtype=np.float64, na_value=0.0)
+
+def _sum_per_code(codes: np.ndarray, values: np.ndarray, n_codes: int) -> np.ndarray:
+    """Sum of the values of each code. Integer sums stay exact (bincount adds in float64, exact below 2**53)."""
+    if values.dtype.kind == 'f':
+        return np.bincount(codes, weights=values, minlength=n_codes)
+    if len(values) == 0 or int(np.abs(values).max()) * len(values) < 2**53:
+        return np.bincount(codes, weights=values, minlength=n_codes).astype(np.int64)
+    sums = np.zeros(n_codes, dtype=np.int64)
+    np.add.at(sums, codes, values)
+    return sums
+
+def sku_orderlines(order_ids: pd.Series, sku_ids: pd.Series, quantities: pd.Series) -> tuple:
+    """Orderlines (distinct orders) and total quantity of each SKU.
+    Rows with a missing order or SKU id are ignored, as in pandas groupby / pivot_table.
+
+    Args:
+        order_ids, sku_ids, quantities (pd.Series): Columns of the orderlines dataframe.
+
+    Returns:
+        tuple: (SKU ids (pd.Index, sorted as groupby sorts them), orderlines per SKU, quantity per SKU).
+    """
+    order_codes, order_uniques = pd.factorize(order_ids)
+    sku_codes, sku_uniques = pd.factorize(sku_ids, sort=True)
+    qty = _quantities(quantities)
+    valid = (order_codes >= 0) & (sku_codes >= 0)
+    if not valid.all():
+        order_codes, sku_codes, qty = order_codes[valid], sku_codes[valid], qty[valid]
+    n_orders = max(len(order_uniques), 1)
+    pairs = np.sort(sku_codes.astype(np.int64) * n_orders + order_codes)
+    # One orderline per distinct (SKU, order) pair
+    first_of_pair = np.concatenate([[True], pairs[1:] != pairs[:-1]])[:len(pairs)]
+    orderlines = np.bincount(pairs[first_of_pair] // n_orders, minlength=len(sku_uniques))
+    sku_quantities = _sum_per_code(sku_codes, qty, len(sku_uniques))
+    # SKUs whose rows all have a missing order id are left out
+    observed = np.flatnonzero(orderlines)
+    skus = sku_uniques[observed]
+    # Object ids are typed as groupby types its keys (e.g. str)
+    if skus.dtype == object:
+        skus = skus.infer_objects()
+    return skus, orderlines[observed], sku_quantities[observed]
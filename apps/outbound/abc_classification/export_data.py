@@ -4,18 +4,17 @@ import pandas as pd
 from .settings import *
 from . import utils as ut
 from .report_dashboard import no_report_yet
+from apps.main.upload import file_manager as fm
+from apps.main.upload import exporter
+from apps.widgets import dtframe
 
 
-@st.cache_data
-def dataframe_to_csv(dataframe: pd.DataFrame):
-    return dataframe.to_csv(sep='|', decimal=',').encode('utf-8')
-
 def export_data_page():
     """
     Exports a dataframe as a csv and provides a download button for the file
     
     This function is used to export a dataframe as a csv file and display it on the front-end. It uses the function 'ut.get_df(FULL_REPORT)' to retrieve the dataframe to be exported.
-    The function then converts the dataframe to csv using 'dataframe_to_csv(full_report)' and displays a preview of the dataframe.
+    The function then converts the dataframe to the selected format (csv, parquet or feather) using 'exporter.download_data' and displays a preview of the dataframe.
     It also provides a download button for the file so that users can download the exported dataframe. If there is no dataframe yet, it calls another function 'no_report_yet()'
     
     Returns:
@@ -28,10 +27,11 @@ def export_data_page():
 
     if pick_report_exists and qty_report_exists:
         st.markdown('### Select Dataframe To Export')
+        export_format = dtframe.select_export_format(ABC_CLASS)
 
         with st.spinner('Preparing data for download...'):
             full_report = ut.get_df(FULL_REPORT_ORDERLINES)
-            full_report_csv = dataframe_to_csv(full_report)
+            full_report_csv = exporter.download_data(full_report, export_format, index=True)
 
 
         st.info('Pick-line Report - Preview')
@@ -39,14 +39,14 @@ def export_data_page():
         st.download_button(
         label="Download Table",
         data=full_report_csv,
-        file_name='pickline report.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('pickline report', export_format),
+        mime=fm.export_mime_type(export_format),
         )
         st.markdown('---')
 
         with st.spinner('Preparing data for download...'):
             qty_report = ut.get_df(FULL_REPORT_QTY)
-            qty_report_csv = dataframe_to_csv(qty_report)
+            qty_report_csv = exporter.download_data(qty_report, export_format, index=True)
 
 
         st.info('Quantity Report - Preview')
@@ -54,8 +54,8 @@ def export_data_page():
         st.download_button(
         label="Download Table",
         data=qty_report_csv,
-        file_name='quantity report.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('quantity report', export_format),
+        mime=fm.export_mime_type(export_format),
         )
         st.markdown('---')
 
@@ -3,18 +3,18 @@ import pandas as pd
 
 from .settings import *
 from . import utils as ut
+from . import aggregation
 
 def first_pivot(dataframe: pd.DataFrame, selected_cols: dict):
     """Creates the first table to be used later to compute ABC classification.
 
-    This function takes a pandas DataFrame and a dictionary of selected columns as inputs. It groups the data in the input dataframe
-    by order ID and SKU ID, counts the number of pick-lines and sums up the quantities picked for each unique order-SKU combination.
-    It then creates a new pivot table with columns for number of orders, number of picklines, and total quantity picked, indexed
-    by the SKU ID. It then drops the multi-level columns, renames columns according to the selected_cols dictionary, 
-    Computes the percentage of SKU and picklines and 
-    computes total number of picklines and quantity picked per SKU, counts the unique number of order IDs per SKU.
+    This function takes a pandas DataFrame and a dictionary of selected columns as inputs. It factorises order and SKU ids once
+    and aggregates the orderlines in a single pass (see aggregation.sku_orderlines): for each SKU, it counts the number of 
+    pick-lines (unique order-SKU combinations, i.e. the unique number of order IDs) and sums up the quantities picked.
+    It then creates a table with columns for number of orders, number of picklines, and total quantity picked, 
+    one row per SKU ID, sorted by SKU ID. Rows with a missing order or SKU ID are ignored.
     Finally, it converts the quantity column to integer values.
-    The final pivot table is then returned.
+    The final table is then returned.
 
     The output will be something like this:
 
@@ -41,27 +41,13 @@ def first_pivot(dataframe: pd.DataFrame, selected_cols: dict):
         pd.DataFrame: The final pivot table, with columns for number of orders, number of picklines, and total quantity picked, 
                       indexed by the SKU ID.
     """
-    # Group data by ORDER_ID and SKU_ID and count orderlines and sum up picked quantities
-    pt = dataframe.pivot_table(
-                index=[selected_cols[N_ORDERS], selected_cols[SKU_ID]], 
-                aggfunc={selected_cols[QTY]:'sum'}
-            )
-    pt[ORDERLINES] = 1
-    # Drop multilevel column
-    pt.reset_index(inplace=True)
-
-    # Rename columns
-    renaming_dict = ut.renaming_dict(selected_cols)
-    renaming_dict.update({'sum':QTY})
-    pt.rename(columns=renaming_dict, inplace=True)
-
-    # st.dataframe(pt.head())
-
-    # Sum up total pick-lines and quantity picked per sku, count unique order id per sku
-    pt = pt.pivot_table(index=SKU_ID, 
-                        aggfunc={   ORDERLINES:'sum', 
-                                    QTY:'sum', 
-                                    N_ORDERS:'nunique'}).reset_index()
+    skus, orderlines, quantities = aggregation.sku_orderlines(
+                                        dataframe[selected_cols[N_ORDERS]],
+                                        dataframe[selected_cols[SKU_ID]],
+                                        dataframe[selected_cols[QTY]],
+                                    )
+    # One pick-line per order-SKU combination: the number of orders of a SKU is its number of pick-lines
+    pt = pd.DataFrame({SKU_ID: skus, N_ORDERS: orderlines, ORDERLINES: orderlines, QTY: quantities})
     # Quantity column to Integer
     pt[QTY] = pt[QTY].astype(int)
     return pt
@@ -4,23 +4,23 @@ import pandas as pd
 from .settings import *
 from . import utils as ut
 from .report_dashboard import no_report_yet
+from apps.main.upload import file_manager as fm
+from apps.main.upload import exporter
+from apps.widgets import dtframe
 
 
-@st.cache_data
-def dataframe_to_csv(dataframe: pd.DataFrame):
-    return dataframe.to_csv(sep='|', decimal=',', index=False).encode('utf-8')
-
 def export_data_page():
 
     if not ut.get_df(DAILY_REPORT) is None:
         st.markdown('### Select Dataframe To Export')
+        export_format = dtframe.select_export_format(GENERAL_PROFILE)
 
         with st.spinner('Preparing data for dowmload...'):
             daily_report = ut.get_df(DAILY_REPORT)
-            daily_report_csv = dataframe_to_csv(daily_report)
+            daily_report_csv = exporter.download_data(daily_report, export_format, index=False)
 
             business_report = ut.get_df(BUSINESS_DAILY_REPORT)
-            business_report_csv = dataframe_to_csv(business_report)
+            business_report_csv = exporter.download_data(business_report, export_format, index=False)
 
 
         st.info('Dataframe Preview - Daily')
@@ -28,8 +28,8 @@ def export_data_page():
         st.download_button(
         label="Download Daily Table",
         data=daily_report_csv,
-        file_name='daily_report.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('daily_report', export_format),
+        mime=fm.export_mime_type(export_format),
         )
 
         st.info('Dataframe Preview - Business Days')
@@ -37,8 +37,8 @@ def export_data_page():
         st.download_button(
         label="Download Business Days Table",
         data=business_report_csv,
-        file_name='daily_report.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('business_report', export_format),
+        mime=fm.export_mime_type(export_format),
         )
 
         st.markdown('---')
@@ -11,6 +11,8 @@ from .report_generator import dataset_report
 from .report_dashboard import general_outbound_dashboard
 from .export_data import export_data_page
 from apps.widgets import dtframe
+from apps.main.upload import file_manager as fm
+from apps.main.upload import index_info
 # Constants
 from .settings import *
 
@@ -44,11 +46,36 @@ def select_orderline_relevant_columns():
     st.markdown('---')
     return selected_cols
 
-def main_section(selected_cols: dict):
+def select_date_range():
+    """Date range of the reports. Returns the rows of the selected dataframe within the range.
+    The bounds come from the stored index metadata, and a sorted index is sliced by binary search."""
+    info = fm.get_index_info(file_name, df)
+    if not index_info.is_datetime(info) or info.start is None:
+        return df
+    st.markdown('### Select Date Range')
+    _help = """
+    Reports only include the orders within the selected dates (both included).
+    Set a sorted datetime index in the *Preprocess* section for the fastest selection.
+    """
+    first_day, last_day = info.start.date(), info.end.date()
+    dates = st.date_input(
+                    'Report Dates:',
+                    value=(first_day, last_day),
+                    min_value=first_day,
+                    max_value=last_day,
+                    help=_help)
+    st.markdown('---')
+    if len(dates) != 2 or tuple(dates) == (first_day, last_day):
+        return df
+    start = pd.Timestamp(dates[0], tz=info.start.tz)
+    end = pd.Timestamp(dates[1], tz=info.start.tz) + pd.Timedelta(days=1)
+    return index_info.time_slice(df, start, end, info)
+
+def main_section(selected_cols: dict, dataframe: pd.DataFrame):
     tab1, tab2, tab3 = st.tabs(['Generate Report(s)', 'Dashboard', 'Export Data'])
 
     with tab1:
-        dataset_report(df, selected_cols)
+        dataset_report(dataframe, selected_cols)
 
     with tab2:
         general_outbound_dashboard()
@@ -81,6 +108,7 @@ def general_outbound_page():
     if are_there_dataframes():
         select_outbound_dataframe()
         selected_cols = select_orderline_relevant_columns()
-        main_section(selected_cols)
+        dataframe = select_date_range()
+        main_section(selected_cols, dataframe)
     else:
         no_dataframe_yet()
\ No newline at end of file
@@ -43,7 +43,8 @@ def pivot_on_datetime(dataframe: pd.DataFrame, selected_cols: dict, freq: str):
                         aggfunc={
                             selected_cols[QTY]:'sum', 
                             selected_cols[N_OLS]:'nunique'
-                            }
+                            },
+                        observed=True,  # Categorical order ids: skip unobserved categories
                     )
     pt.reset_index(-1, inplace=True)
 
@@ -76,7 +77,8 @@ def overall_outbound_stats(dataframe: pd.DataFrame, selected_cols: dict):
     stats[N_ORDERS] = dataframe[selected_cols[N_ORDERS]].nunique()
     # Total N Orderlines
     pt = dataframe.pivot_table( index=selected_cols[N_ORDERS],
-                                aggfunc={selected_cols[N_OLS]:'nunique'})
+                                aggfunc={selected_cols[N_OLS]:'nunique'},
+                                observed=True)
     stats[N_OLS] = pt[selected_cols[N_OLS]].sum()
     # Total N SKUs
     stats[SKU_ID] = dataframe[selected_cols[N_OLS]].nunique()
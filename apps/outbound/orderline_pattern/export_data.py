@@ -4,34 +4,34 @@ import pandas as pd
 from .settings import *
 from . import utils as ut
 from .report_dashboard import no_report_yet
+from apps.main.upload import file_manager as fm
+from apps.main.upload import exporter
+from apps.widgets import dtframe
 
 
-@st.cache_data
-def dataframe_to_csv(dataframe: pd.DataFrame):
-    return dataframe.to_csv(sep='|', decimal=',', index=False).encode('utf-8')
-
 def export_data_page():
 
     if not ut.get_df(FIRST_PT) is None:
         st.markdown('### Select Dataframe To Export')
+        export_format = dtframe.select_export_format(OL_PATTERN)
 
         with st.spinner('Preparing data for dowmload...'):
             first_pt = ut.get_df(FIRST_PT)
-            first_csv = dataframe_to_csv(first_pt)
+            first_csv = exporter.download_data(first_pt, export_format, index=False)
 
             qty_report = ut.get_df(QTY_REPORT)
-            qty_csv = dataframe_to_csv(qty_report)
+            qty_csv = exporter.download_data(qty_report, export_format, index=False)
 
             ol_report = ut.get_df(OL_REPORT)
-            ol_csv = dataframe_to_csv(ol_report)
+            ol_csv = exporter.download_data(ol_report, export_format, index=False)
 
         st.info('Dataframe Preview')
         st.table(first_pt.head())
         st.download_button(
         label="Download Table",
         data=first_csv,
-        file_name='first_pivot.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('first_pivot', export_format),
+        mime=fm.export_mime_type(export_format),
         )
         st.markdown('---')
 
@@ -40,8 +40,8 @@ def export_data_page():
         st.download_button(
         label="Download Table",
         data=qty_csv,
-        file_name='quantity report.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('quantity report', export_format),
+        mime=fm.export_mime_type(export_format),
         )
         st.markdown('---')
 
@@ -50,8 +50,8 @@ def export_data_page():
         st.download_button(
         label="Download Table",
         data=ol_csv,
-        file_name='orderline report.csv',
-        mime='text/csv',
+        file_name=fm.export_file_name('orderline report', export_format),
+        mime=fm.export_mime_type(export_format),
         )
         st.markdown('---')
 
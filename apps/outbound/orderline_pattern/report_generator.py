@@ -37,7 +37,8 @@ def create_first_pivot_table(dataframe: pd.DataFrame, selected_cols: dict):
                         aggfunc={
                             selected_cols[QTY]:'sum', 
                             selected_cols[N_OLS]:'nunique'
-                            }
+                            },
+                        observed=True,  # Categorical order ids: skip unobserved categories
                     )
     pt.reset_index(inplace=True)
 
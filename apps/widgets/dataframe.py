@@ -53,6 +53,21 @@ def display_dataframe(
     st.info(text)
     st.dataframe(dataframe.iloc[:N_ROWS])
 
+def select_export_format(key: str = ''):
+    """Export format selector. Returns one of EXPORT_FORMATS keys."""
+    _help = """
+    Parquet and Feather / Arrow IPC files keep data types and index, 
+    and can be uploaded again without any parsing.
+    CSV (gzip) is a compressed csv file, usually several times smaller.
+    Files are written in chunks of rows, so large dataframes are exported without doubling memory usage.
+    """
+    export_format = st.selectbox(
+                        'Select Export Format:', 
+                        options=list(EXPORT_FORMATS.keys()), 
+                        key=f'{key}_export_format',
+                        help=_help)
+    return export_format
+
 def is_index_datetime(df: pd.DataFrame):
     """Check if dataframe index is datetime."""
     return isinstance(df.index, pd.DatetimeIndex)
@@ -0,0 +1,76 @@
+"""
+Compares the excel engines available to the upload page on a generated orderline workbook.
+
+Usage:
+    python benchmarks/excel_engines.py --rows 500000
+    python benchmarks/excel_engines.py --file path/to/workbook.xlsx
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apps.main.upload.excel_reader import available_engines
+
+
+def create_workbook(path: str, n_rows: int, seed: int = 0):
+    """Writes an orderline-like sheet: order, SKU, quantity, timestamp and location columns."""
+    rng = np.random.default_rng(seed)
+    orders = rng.integers(1, n_rows // 3 + 2, n_rows)
+    skus = rng.integers(1, 20_000, n_rows)
+    qty = rng.integers(1, 50, n_rows)
+    start = pd.Timestamp('2024-01-01').to_pydatetime()
+    minutes = np.sort(rng.integers(0, 365 * 24 * 60, n_rows))
+    timestamps = start + pd.to_timedelta(minutes, unit='min').to_pytimedelta()
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('orderlines')
+    ws.append(['ORDER_ID', 'SKU_ID', 'QTY', 'SHIPPED_AT', 'LOCATION'])
+    for i in range(n_rows):
+        ws.append([f'ORD{orders[i]:08d}', f'SKU-{skus[i]:06d}', int(qty[i]), timestamps[i], f'A{skus[i] % 40:02d}-{skus[i] % 7}'])
+    wb.save(path)
+
+def time_engine(path: str, engine: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = pd.read_excel(path, engine=engine)
+        timings.append(time.perf_counter() - start)
+    return min(timings), df.shape[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500_000, help='Rows of the generated workbook.')
+    parser.add_argument('--file', help='Benchmark an existing workbook instead of generating one.')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per engine, the best one is reported.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp_dir, 'orderlines.xlsx')
+            print(f'Generating {args.rows:,} rows workbook...')
+            start = time.perf_counter()
+            create_workbook(path, args.rows)
+            print(f'Done in {time.perf_counter() - start:,.1f} s - {os.path.getsize(path) / 1e6:,.1f} MB')
+
+        results = []
+        for engine in available_engines(path):
+            print(f'Reading with {engine}...')
+            seconds, n_rows = time_engine(path, engine, args.repeat)
+            results.append((engine, n_rows, seconds))
+
+    report = pd.DataFrame(results, columns=['Engine', 'N. Rows', 'Seconds'])
+    report['Rows / s'] = (report['N. Rows'] / report['Seconds']).round().astype(int)
+    report['Speed-up'] = (report['Seconds'].max() / report['Seconds']).round(1)
+    print(report.sort_values('Seconds').to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
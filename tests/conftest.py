@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_orderlines(n_rows: int = 200, seed: int = 1) -> pd.DataFrame:
+    """Orderlines with missing SKU ids and locations, one row id per line."""
+    rng = np.random.default_rng(seed)
+    orderlines = pd.DataFrame({
+        'line': np.arange(n_rows),
+        'sku': pd.Series(rng.choice(['a', 'b', 'c', 'e'], n_rows)).where(rng.random(n_rows) > 0.1),
+        'loc': rng.integers(0, 3, n_rows).astype(float),
+        'qty': rng.integers(1, 9, n_rows),
+    })
+    orderlines.loc[::7, 'loc'] = np.nan
+    return orderlines
+
+def make_sku_master() -> pd.DataFrame:
+    """SKU master with duplicated keys, a missing key and a key absent from the orderlines."""
+    return pd.DataFrame({
+        'sku': ['a', 'a', 'b', None, 'd', 'b', 'c'],
+        'loc': [0., 1., 0., np.nan, 2., 0., np.nan],
+        'name': ['u', 'v', 'w', 'x', 'y', 'z', 'zz'],
+        'weight': [1, 2, 3, 4, 5, 6, 7],
+        'fragile': [True, False, True, False, True, True, False],
+    })
+
+@pytest.fixture(params=['str', 'category', 'empty_left', 'empty_right'])
+def frames(request):
+    """(orderlines, SKU master): string or categorical keys (with other categories on each side), or an empty side."""
+    left, right = make_orderlines(), make_sku_master()
+    if request.param == 'category':
+        left['sku'] = left['sku'].astype('category')
+        right['sku'] = right['sku'].astype('category')
+    elif request.param == 'empty_left':
+        left = left.iloc[:0]
+    elif request.param == 'empty_right':
+        right = right.iloc[:0]
+    return left, right
@@ -0,0 +1,24 @@
+import pandas as pd
+
+
+def expected_join(left: pd.DataFrame, right: pd.DataFrame, keys: list, how: str, dedupe_right: bool = False) -> pd.DataFrame:
+    """pd.merge of the conftest frames, in the row order and key data types of the position-based joins."""
+    joined = right.drop_duplicates(keys) if dedupe_right else right
+    expected = left.merge(joined, how=how, on=keys)
+    for key in keys:
+        # Key columns are taken from the left dataframe and keep its categories,
+        # where pd.merge converts categorical keys whose categories differ on each side
+        if isinstance(left[key].dtype, pd.CategoricalDtype):
+            expected[key] = expected[key].astype(left[key].dtype)
+    if how == 'inner':
+        # Joined rows follow the left rows (then the right ones, in their order), as in left joins:
+        # pd.merge groups multi-column inner joins by key instead
+        expected = expected.sort_values(['line', 'name'], kind='stable', ignore_index=True)
+    return expected
+
+def as_read_back(expected: pd.DataFrame) -> pd.DataFrame:
+    """Missing values of object columns (e.g. bool columns with unmatched rows) are read back from parquet as None."""
+    expected = expected.copy()
+    for col in expected.columns[expected.dtypes == object]:
+        expected[col] = expected[col].where(expected[col].notna(), None)
+    return expected
@@ -0,0 +1,88 @@
+import apps.main  # Loads apps.outbound through the app, as its pages import each other
+import numpy as np
+import pandas as pd
+import pytest
+
+from apps.outbound.abc_classification import aggregation
+from apps.outbound.abc_classification import report_generator
+from apps.outbound.abc_classification import utils as ut
+from apps.outbound.abc_classification.settings import N_ORDERS, SKU_ID, QTY, ORDERLINES
+
+SELECTED_COLS = {N_ORDERS: 'ORDER', SKU_ID: 'SKU', QTY: 'UNITS'}
+
+
+def baseline_first_pivot(dataframe: pd.DataFrame, selected_cols: dict) -> pd.DataFrame:
+    """first_pivot before the single-pass aggregation: a pivot table per order-SKU, then per SKU."""
+    pt = dataframe.pivot_table(
+                index=[selected_cols[N_ORDERS], selected_cols[SKU_ID]],
+                aggfunc={selected_cols[QTY]: 'sum'}
+            )
+    pt[ORDERLINES] = 1
+    pt.reset_index(inplace=True)
+    renaming_dict = ut.renaming_dict(selected_cols)
+    renaming_dict.update({'sum': QTY})
+    pt.rename(columns=renaming_dict, inplace=True)
+    pt = pt.pivot_table(index=SKU_ID,
+                        aggfunc={ORDERLINES: 'sum',
+                                 QTY: 'sum',
+                                 N_ORDERS: 'nunique'}).reset_index()
+    pt[QTY] = pt[QTY].astype(int)
+    return pt
+
+def make_orderlines(sku_kind: str, order_kind: str, qty_kind: str, missing: bool, n_rows: int = 3000) -> pd.DataFrame:
+    """Orderlines with several lines per order-SKU combination."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'ORDER': rng.integers(0, n_rows // 3, n_rows),
+        'SKU': rng.integers(0, 200, n_rows),
+        'UNITS': rng.integers(0, 50, n_rows),
+    })
+    if sku_kind == 'str':
+        df['SKU'] = df['SKU'].map(lambda sku: f'S{sku:04d}')
+    elif sku_kind == 'object':
+        df['SKU'] = df['SKU'].map(lambda sku: f'S{sku}').astype(object)
+    elif sku_kind == 'category':
+        # Categories in another order than the ids, some never used
+        df['SKU'] = pd.Categorical(df['SKU'].map(lambda sku: f'S{sku}'), categories=[f'S{sku}' for sku in range(300)][::-1])
+    if order_kind == 'str':
+        df['ORDER'] = df['ORDER'].astype(str)
+    elif order_kind == 'category':
+        df['ORDER'] = df['ORDER'].astype('category')
+    if qty_kind == 'float':
+        df['UNITS'] = df['UNITS'] * 0.5
+    elif qty_kind == 'Int64':
+        df['UNITS'] = df['UNITS'].astype('Int64')
+    if missing:
+        rows = rng.choice(n_rows, n_rows // 10, replace=False)
+        if order_kind == 'int':
+            df['ORDER'] = df['ORDER'].astype(float)
+        df.loc[rows[0::3], 'ORDER'] = None
+        df.loc[rows[1::3], 'SKU'] = None
+        if qty_kind != 'int':
+            df.loc[rows[2::3], 'UNITS'] = None
+    return df
+
+@pytest.mark.parametrize('sku_kind', ['int', 'str', 'object', 'category'])
+@pytest.mark.parametrize('order_kind', ['int', 'str', 'category'])
+@pytest.mark.parametrize('qty_kind', ['int', 'float', 'Int64'])
+@pytest.mark.parametrize('missing', [False, True])
+def test_first_pivot_matches_baseline(sku_kind, order_kind, qty_kind, missing):
+    orderlines = make_orderlines(sku_kind, order_kind, qty_kind, missing)
+    pd.testing.assert_frame_equal(
+        report_generator.first_pivot(orderlines, SELECTED_COLS),
+        baseline_first_pivot(orderlines, SELECTED_COLS),
+    )
+
+def test_first_pivot_of_empty_orderlines():
+    # The baseline raises a KeyError (no quantity column after the first pivot table): an empty table is expected
+    orderlines = make_orderlines('str', 'int', 'int', False).iloc[:0]
+    pt = report_generator.first_pivot(orderlines, SELECTED_COLS)
+    assert pt.empty
+    assert list(pt.columns) == [SKU_ID, N_ORDERS, ORDERLINES, QTY]
+
+def test_large_integer_quantities_stay_exact():
+    skus, orderlines, quantities = aggregation.sku_orderlines(
+                                        pd.Series([1, 2, 1, 1]), pd.Series(['b', 'b', 'a', 'a']), pd.Series([2**60, 1, 2**60, 3]))
+    assert skus.tolist() == ['a', 'b']
+    assert orderlines.tolist() == [1, 2]
+    assert quantities.tolist() == [2**60 + 3, 2**60 + 1]
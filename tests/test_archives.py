@@ -0,0 +1,51 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+import streamlit as st
+
+from apps.main.upload import file_manager as fm
+from apps.main.upload.settings import UPLOADED
+
+CSV = b'sku,qty\na,1\n'
+
+
+def zip_archive(members: list) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in members:
+            archive.writestr(name, CSV)
+    return buffer.getvalue()
+
+@pytest.fixture
+def upload():
+    """Registers an in-memory upload, as the file uploader does."""
+    fm.data_storage_initialize()
+    def _upload(file_name: str, content: bytes):
+        st.session_state[UPLOADED][file_name] = io.BytesIO(content)
+        return file_name
+    yield _upload
+    st.session_state[UPLOADED].clear()
+
+@pytest.mark.parametrize('file_name, content', [
+    ('orders.csv', CSV),
+    ('orders.csv.gz', gzip.compress(CSV)),
+    ('orders.zip', zip_archive(['orders.csv'])),
+    ('orders.csv.zip', zip_archive(['export.csv'])),
+])
+def test_supported_files(upload, file_name, content):
+    assert fm.archive_error(upload(file_name, content)) is None
+
+@pytest.mark.parametrize('file_name, content, message', [
+    ('orders.gz', gzip.compress(CSV), 'unknown compressed file type'),
+    ('orders.xlsx.gz', gzip.compress(CSV), 'compressed .xlsx files are not supported'),
+    ('orders.zip', zip_archive(['a.csv', 'b.csv']), 'holds 2 files'),
+    ('orders.zip', zip_archive([]), 'holds 0 files'),
+    ('orders.zip', zip_archive(['orders.xlsx']), 'compressed .xlsx files are not supported'),
+    ('orders.zip', CSV, 'not a valid zip archive'),
+])
+def test_unsupported_archives_are_reported(upload, file_name, content, message):
+    file_name = upload(file_name, content)
+    assert message in fm.archive_error(file_name)
+    assert not fm.is_concatenable_file(file_name)
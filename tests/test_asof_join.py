@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from apps.main.merge import asof_join
+
+PRICES = pd.DataFrame({
+    'sku': ['a', 'b', 'a', 'c', None, 'b', 'a'],
+    'time': pd.to_datetime(['2024-01-02', '2024-01-01', '2024-01-05', '2024-01-03', '2024-01-02', '2024-01-04', '2024-01-05']),
+    'price': [1., 2., 3., 4., 5., 6., 7.],
+})
+
+
+def key_values(frame: pd.DataFrame) -> pd.DataFrame:
+    """Categorical SKU ids as their values, to be matched with the string ids of PRICES by pd.merge_asof."""
+    if isinstance(frame['sku'].dtype, pd.CategoricalDtype):
+        return frame.astype({'sku': frame['sku'].dtype.categories.dtype})
+    return frame
+
+@pytest.fixture
+def orderlines(frames):
+    """Orderlines of the frames fixture, with unsorted order times."""
+    left, _ = frames
+    rng = np.random.default_rng(3)
+    return left.assign(time=pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 10_000, len(left)), unit='min'))
+
+@pytest.mark.parametrize('by', [None, ['sku']])
+@pytest.mark.parametrize('direction', asof_join.DIRECTIONS)
+@pytest.mark.parametrize('tolerance', [None, '2D'])
+def test_matches_merge_asof_of_sorted_frames(orderlines, by, direction, tolerance):
+    merged, resorted = asof_join.asof_join(orderlines, PRICES, 'time', 'time', by, by, direction, tolerance)
+    left = key_values(orderlines) if by else orderlines
+    expected = pd.merge_asof(
+                    left.sort_values('time', kind='stable'), PRICES.sort_values('time', kind='stable'),
+                    on='time', by=by, direction=direction,
+                    tolerance=None if tolerance is None else pd.Timedelta(tolerance))
+    pd.testing.assert_frame_equal(merged, expected)
+    assert resorted == (['left', 'right'] if len(orderlines) > 1 else ['right'])
+
+def test_sorted_frames_are_not_sorted_again(orderlines):
+    left = orderlines.sort_values('time').set_index('time')
+    right = PRICES.sort_values('time')
+    merged, resorted = asof_join.asof_join(left, right, asof_join.INDEX, 'time', ['sku'], ['sku'], left_sorted=True)
+    expected = pd.merge_asof(key_values(left), right, left_index=True, right_on='time', by='sku')
+    pd.testing.assert_frame_equal(merged, expected)
+    assert resorted == []
+
+def test_categorical_keys_with_other_categories(orderlines):
+    left, right = orderlines.astype({'sku': 'category'}), PRICES.astype({'sku': 'category'})
+    merged, _ = asof_join.asof_join(left, right, 'time', 'time', ['sku'], ['sku'])
+    expected, _ = asof_join.asof_join(orderlines, PRICES, 'time', 'time', ['sku'], ['sku'])
+    assert isinstance(merged['sku'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(merged.astype({'sku': expected['sku'].dtype}), expected)
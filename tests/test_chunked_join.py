@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from apps.main.merge import chunked_join
+from apps.main.merge import join_index
+from merge_checks import expected_join, as_read_back
+
+KEYS = [['sku'], ['sku', 'loc']]
+
+
+@pytest.mark.parametrize('keys', KEYS)
+@pytest.mark.parametrize('how', ['left', 'inner'])
+@pytest.mark.parametrize('dedupe_right', [False, True])
+def test_join_indexer_matches_pd_merge(frames, keys, how, dedupe_right):
+    left, right = frames
+    index = join_index.build_join_index(right[keys])
+    left_positions, right_positions = join_index.join_indexer(
+                                            index, join_index.encode_left(index.encoder, left[keys]), how, dedupe_right)
+    expected = expected_join(left, right, keys, how, dedupe_right)
+    np.testing.assert_array_equal(left['line'].to_numpy()[left_positions], expected['line'].to_numpy())
+    # Position -1 (unmatched left row) takes the last name: none
+    names = np.append(right['name'].to_numpy(dtype=object), '')
+    assert names[right_positions].tolist() == expected['name'].fillna('').tolist()
+
+@pytest.mark.parametrize('keys', KEYS)
+@pytest.mark.parametrize('how', ['left', 'inner'])
+@pytest.mark.parametrize('dedupe_right', [False, True])
+@pytest.mark.parametrize('chunk_rows', [37, 1000])
+def test_chunked_join_matches_pd_merge(frames, tmp_path, keys, how, dedupe_right, chunk_rows):
+    left, right = frames
+    path = tmp_path / 'merged.parquet'
+    n_rows = chunked_join.chunked_join(
+                    left, right, keys, keys, list(left.columns), list(right.columns), path,
+                    how=how, dedupe_right=dedupe_right, chunk_rows=chunk_rows)
+    expected = as_read_back(expected_join(left, right, keys, how, dedupe_right))
+    assert n_rows == len(expected)
+    pd.testing.assert_frame_equal(pd.read_parquet(path), expected)
+
+def test_output_columns_follow_pd_merge():
+    left = pd.DataFrame({'sku': ['a'], 'site': ['x'], 'qty': [1]})
+    right = pd.DataFrame({'code': ['a'], 'sku': ['b'], 'site': ['y'], 'weight': [2]})
+    expected = left.merge(right, left_on=['sku', 'site'], right_on=['code', 'site'])
+    left_names, right_kept, right_names = join_index.output_columns(
+                                                list(left.columns), list(right.columns), ['sku', 'site'], ['code', 'site'])
+    assert left_names + right_names == list(expected.columns)
+    assert right_kept == ['code', 'sku', 'weight']
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from apps.main.upload import file_manager as fm
+
+
+def test_columns_follow_the_first_dataframe():
+    first = pd.DataFrame({'sku': ['a', 'b'], 'qty': [1, 2]})
+    second = pd.DataFrame({'qty': [3.5], 'sku': ['c']})
+    df, dtype_conflicts = fm.concat_dataframes([first, second], ['first.csv', 'second.csv'], source_column='source')
+    expected = pd.DataFrame({
+        'source': pd.Categorical.from_codes(np.array([0, 0, 1], dtype=np.int32), categories=['first.csv', 'second.csv']),
+        'sku': ['a', 'b', 'c'],
+        'qty': [1., 2., 3.5],
+    })
+    pd.testing.assert_frame_equal(df, expected)
+    assert dtype_conflicts == {'qty': ['float64', 'int64']}
+
+def test_source_column_already_in_the_dataframes():
+    frames = [pd.DataFrame({'source': ['x'], 'qty': [1]})] * 2
+    with pytest.raises(ValueError):
+        fm.concat_dataframes(frames, ['a.csv', 'b.csv'], source_column='source')
@@ -0,0 +1,29 @@
+import pytest
+
+from apps.main.merge import join_analysis
+
+KEYS = [['sku'], ['sku', 'loc']]
+
+
+@pytest.mark.parametrize('keys', KEYS)
+@pytest.mark.parametrize('how', ['left', 'inner', 'outer'])
+@pytest.mark.parametrize('dedupe_right', [False, True])
+def test_estimated_rows_match_pd_merge(frames, keys, how, dedupe_right):
+    left, right = frames
+    analysis = join_analysis.analyse_join(left[keys], right[keys], dedupe_right=dedupe_right, how=how)
+    joined = right.drop_duplicates(keys) if dedupe_right else right
+    assert analysis.estimated_rows == len(left.merge(joined, how=how, on=keys))
+
+@pytest.mark.parametrize('keys', KEYS)
+def test_key_statistics(frames, keys):
+    left, right = frames
+    analysis = join_analysis.analyse_join(left[keys], right[keys])
+    distinct = right[keys].drop_duplicates()
+    matched = left[keys].merge(distinct, how='inner', on=keys)
+    assert analysis.left_rows == len(left)
+    assert analysis.right_rows == len(right)
+    assert analysis.right_distinct == len(distinct)
+    assert analysis.right_duplicate_rows == int(right.duplicated(keys).sum())
+    assert analysis.right_duplicate_keys == len(right[right.duplicated(keys, keep=False)].drop_duplicates(keys))
+    assert analysis.matched_left_rows == len(matched)
+    assert analysis.matched_keys == len(matched.drop_duplicates())
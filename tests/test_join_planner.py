@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from apps.main.merge import join_planner
+from merge_checks import expected_join
+
+LOCATIONS = pd.DataFrame({'loc': [0., 1., 1., np.nan], 'zone': ['p', 'q', 'r', 's']})
+
+
+def run_joins(left: pd.DataFrame, steps: list, planned: list, how: str, dedupe_right: bool = False) -> pd.DataFrame:
+    left_positions, step_positions = join_planner.join_positions(left, planned, how, dedupe_right)
+    return join_planner.assemble(left, list(left.columns), steps, left_positions, step_positions)
+
+@pytest.mark.parametrize('keys', [['sku'], ['sku', 'loc']])
+@pytest.mark.parametrize('how', ['left', 'inner'])
+@pytest.mark.parametrize('dedupe_right', [False, True])
+def test_single_join_matches_pd_merge(frames, keys, how, dedupe_right):
+    left, right = frames
+    steps = [join_planner.JoinStep('skus', right, keys, keys, list(right.columns))]
+    planned = join_planner.plan_joins(left, steps, how, dedupe_right)
+    merged = run_joins(left, steps, planned, how, dedupe_right)
+    pd.testing.assert_frame_equal(merged, expected_join(left, right, keys, how, dedupe_right))
+
+@pytest.mark.parametrize('how', ['left', 'inner'])
+def test_joins_match_successive_pd_merges_in_any_order(frames, how):
+    left, right = frames
+    skus = right[['sku', 'name', 'weight']]
+    steps = [
+        join_planner.JoinStep('skus', skus, ['sku'], ['sku'], list(skus.columns)),
+        join_planner.JoinStep('locations', LOCATIONS, ['loc'], ['loc'], list(LOCATIONS.columns)),
+    ]
+    expected = expected_join(left, skus, ['sku'], how).merge(LOCATIONS, how=how, on='loc')
+    planned = join_planner.plan_joins(left, steps, how)
+    for execution_order in (planned, planned[::-1]):
+        pd.testing.assert_frame_equal(run_joins(left, steps, execution_order, how), expected)
+
+def test_most_selective_join_runs_first():
+    left = pd.DataFrame({'sku': ['a', 'a', 'b', 'c'], 'loc': [0., 1., 1., 2.]})
+    steps = [
+        join_planner.JoinStep('locations', LOCATIONS, ['loc'], ['loc'], ['zone']),
+        join_planner.JoinStep('rare', pd.DataFrame({'sku': ['c']}), ['sku'], ['sku'], []),
+    ]
+    planned = join_planner.plan_joins(left, steps, how='inner')
+    assert [planned_step.step.name for planned_step in planned] == ['rare', 'locations']
+    assert [planned_step.position for planned_step in planned] == [1, 0]
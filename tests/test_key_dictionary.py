@@ -0,0 +1,40 @@
+import apps.main  # Loads apps.main.preprocess through the app, as its pages import each other
+import numpy as np
+import pandas as pd
+import pytest
+
+from apps.main.preprocess import key_dictionary
+from apps.main.preprocess import pipeline
+
+
+@pytest.mark.parametrize('values, labels', [
+    ([1.0, np.nan, 2.0], ['1', '2']),
+    ([1.0, np.inf, -np.inf], ['1', 'inf', '-inf']),
+    ([1e20, 3.0], ['1e+20', '3']),
+    ([2.0**53, 2.0**53 - 1], ['9007199254740992.0', '9007199254740991']),
+    ([1.5, 2.0], ['1.5', '2']),
+])
+def test_float_labels(values, labels):
+    encoded, dtype = key_dictionary.encode(pd.Series(values))
+    assert dtype.categories.tolist() == labels
+    assert encoded.isna().sum() == pd.isna(values).sum()
+
+def test_integer_labels_match_float_labels():
+    # Integers read with missing values are floats: they get the same codes as integers
+    _, dtype = key_dictionary.encode(pd.Series([3, 1]))
+    encoded, extended = key_dictionary.encode(pd.Series([1.0, np.nan, 3.0]), dtype)
+    assert extended is dtype
+    assert encoded.cat.codes.tolist() == [1, -1, 0]
+
+def test_replayed_encode_steps_extend_the_dictionaries():
+    skus = pd.DataFrame({'sku': ['a', 'b', 'a'], 'parent': ['c', 'a', 'a']})
+    steps = [pipeline.encode_step('sku', 'SKU'), pipeline.encode_step('parent', 'SKU')]
+    dictionaries = {}
+    replayed = pipeline.run_pipeline(skus, steps, dictionaries=dictionaries)
+    assert dictionaries['SKU'].categories.tolist() == ['a', 'b', 'c']
+    # The column encoded first is moved to the dictionary extended by the second step
+    assert key_dictionary.encoded_columns(replayed, dictionaries['SKU']) == ['sku', 'parent']
+    assert replayed.astype(str).equals(skus)
+    assert pipeline.changed_columns(steps) == ['sku', 'parent']
+    with pytest.raises(ValueError):
+        pipeline.run_pipeline(skus, steps)
@@ -0,0 +1,59 @@
+import apps.main  # Loads apps.main.preprocess through the app, as its pages import each other
+import pandas as pd
+import pytest
+
+from apps.main.preprocess import pipeline
+
+DROP_A = pipeline.drop_columns_step(['a'])
+DROP_B = pipeline.drop_columns_step(['b'])
+A_TO_FLOAT = pipeline.convert_step('a', 'Float')
+A_TO_STRING = pipeline.convert_step('a', 'String')
+B_TO_INTEGER = pipeline.convert_step('b', 'Integer')
+D_TO_DATETIME = pipeline.convert_step('d', 'Datetime')
+
+
+def make_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'a': [1, 2, 3],
+        'b': [1.0, 2.0, 3.0],
+        'c': ['x', 'y', 'z'],
+        'd': ['2024-01-03', '2024-01-01', '2024-01-02'],
+    })
+
+def run_sequentially(dataframe: pd.DataFrame, steps: list) -> pd.DataFrame:
+    """Reference replay: the steps applied one by one, without fusion."""
+    df = dataframe.copy()
+    for step in steps:
+        pipeline.apply_step(df, step)
+    return df
+
+@pytest.mark.parametrize('steps', [
+    [A_TO_FLOAT, DROP_A],
+    [A_TO_FLOAT, A_TO_STRING],
+    [A_TO_FLOAT, A_TO_FLOAT, B_TO_INTEGER],
+    [DROP_B, A_TO_FLOAT, D_TO_DATETIME],
+    [A_TO_STRING, DROP_B, pipeline.convert_step('a', 'Integer')],
+    [D_TO_DATETIME, pipeline.set_index_step('d'), A_TO_FLOAT, DROP_B],
+    [DROP_B, pipeline.reset_index_step(), A_TO_STRING],
+])
+def test_fused_replay_matches_sequential_replay(steps):
+    frame = make_frame()
+    pd.testing.assert_frame_equal(pipeline.run_pipeline(frame, steps, max_workers=2), run_sequentially(frame, steps))
+    pd.testing.assert_frame_equal(frame, make_frame())
+
+@pytest.mark.parametrize('steps', [
+    [DROP_A, A_TO_FLOAT],
+    [DROP_A, DROP_A],
+    [DROP_A, B_TO_INTEGER, pipeline.drop_columns_step(['b', 'a'])],
+    [pipeline.convert_step('e', 'Float')],
+])
+def test_steps_on_dropped_columns_fail_as_in_sequential_replay(steps):
+    frame = make_frame()
+    with pytest.raises(KeyError):
+        run_sequentially(frame, steps)
+    with pytest.raises(KeyError):
+        pipeline.run_pipeline(frame, steps)
+
+def test_consecutive_column_steps_run_in_one_pass():
+    steps = [DROP_B, A_TO_FLOAT, pipeline.set_index_step('c'), A_TO_STRING, D_TO_DATETIME]
+    assert [kind for kind, _ in pipeline.plan_pipeline(steps)] == ['columns', 'index', 'columns']
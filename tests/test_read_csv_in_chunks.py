@@ -0,0 +1,39 @@
+import io
+
+import pandas as pd
+import pytest
+
+from apps.main.upload import column_profile
+from apps.main.upload import file_manager as fm
+
+N_ROWS = 50_000
+CHUNK_ROWS = 10_000
+
+
+def make_csv() -> bytes:
+    """Columns whose inferred type changes between chunks of CHUNK_ROWS rows, and a duplicated column name."""
+    lines = ['sku,qty,note,weight,sku']
+    for i in range(N_ROWS):
+        # Numbers with leading zeros for 3 chunks, then text
+        sku = str(i).zfill(6) if i < 30_000 else f'S{i}'
+        # Only missing values in the 3rd chunk
+        note = '' if 20_000 <= i < 30_000 else f'n{i}'
+        # Whole numbers, then decimals
+        weight = i if i < 25_000 else i + 0.5
+        lines.append(f'{sku},{i},{note},{weight},{i % 7}')
+    return '\n'.join(lines).encode()
+
+@pytest.mark.parametrize('usecols', [None, [4, 0, 2, 3]])
+def test_chunked_read_matches_pd_read_csv(usecols):
+    data = make_csv()
+    params = {'low_memory': False} if usecols is None else {'low_memory': False, 'usecols': usecols}
+    profile = column_profile.new_profile()
+    chunked = fm.read_csv_in_chunks(io.BytesIO(data), profile=profile, chunksize=CHUNK_ROWS, **params)
+    pd.testing.assert_frame_equal(chunked, pd.read_csv(io.BytesIO(data), **params))
+    # Columns read again as text are profiled again
+    data_types = column_profile.finalize_profile(profile).set_index('Column')['Data Type']
+    assert data_types['sku'] == data_types['note'] == str(chunked['sku'].dtype)
+
+def test_header_only_file():
+    chunked = fm.read_csv_in_chunks(io.BytesIO(b'sku,qty\n'), chunksize=CHUNK_ROWS)
+    pd.testing.assert_frame_equal(chunked, pd.read_csv(io.BytesIO(b'sku,qty\n')))
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+
+from apps.main.upload import sniffer
+
+
+def sniffed_formats(columns: str, rows: list) -> dict:
+    sample = '\n'.join([columns] + rows).encode()
+    return sniffer.sniff_csv(sample)['datetime_formats']
+
+@pytest.mark.parametrize('column', ['ORDER_DATE', 'ship_dt', 'Day', 'DeliveryTime'])
+def test_compact_dates_in_date_columns(column):
+    assert sniffed_formats(f'{column},SKU', ['20240131,20240131', '20240201,20240201']) == {column: '%Y%m%d'}
+
+@pytest.mark.parametrize('column', ['SKU', 'ORDER_NUMBER', 'WIDTH'])
+def test_8_digit_ids_are_not_dates(column):
+    assert sniffed_formats(f'{column},QTY', ['20240131,1', '20240201,2']) == {}
+
+def test_dates_with_separators_are_detected_in_any_column():
+    assert sniffed_formats('SHIPPED,QTY', ['2024-01-31,1', '2024-02-01,2']) == {'SHIPPED': '%Y-%m-%d'}
+
+def test_explicit_conversions_keep_compact_dates():
+    assert sniffer.detect_datetime_format(pd.Series(['20240131', '20240201'])) == '%Y%m%d'